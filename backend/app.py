@@ -1,73 +1,46 @@
-from flask import Flask, send_from_directory, redirect, request, session, jsonify
+from flask import Flask, send_from_directory, send_file, redirect, request, session, jsonify, stream_with_context, g
 import os
-import requests
+import hmac
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+import io
 import json
-import time
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import tempfile
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import DateTime, func
+from github_client import GitHubClient, GitHubError
+from github_ratelimit import RateLimitExceeded, PRIORITY_HIGH
+from github_cache import hash_token
+from singleflight import SingleFlight
+from cache_utils import LRUCache
+from models import db, User, Repository, BugReport, DeviceProfile, repository_access, content_hash, write_counters
+from repository_sync import RepositoryFetchError
+from repository_worker import RepositorySyncWorker
+from repository_listing import parse_listing_args, user_repositories, ListingError
+from user_lookup import user_for_token, forget_token
+from write_behind import WriteBehindBuffer
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import joinedload
+from github_webhooks import WebhookProcessor
+from rate_limiter import create_rate_limiter
+from uploads import UploadRequest, UploadTooLarge, looks_dangerous
+from screenshot_store import (
+    LocalScreenshotStore, CONTENT_TYPE_EXTENSIONS, watch_screenshot_references, release_screenshots, key_digest
+)
+from screenshot_pipeline import ScreenshotPipeline
+from group_commit import GroupCommitWriter, PendingInsert
+from duplicate_index import DuplicateIndex, signature, watch_deleted_reports
+from device_profiles import encode_device_info, device_profile_ids
+from schema import upgrade_schema
+from werkzeug.exceptions import RequestEntityTooLarge
 
 app = Flask(__name__, static_folder="../frontend/build", static_url_path="/")
+app.request_class = UploadRequest
 CORS(app)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'dev-secret')
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///alphatest.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
-
-# Database Models
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    github_id = db.Column(db.Integer, unique=True, nullable=False)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), nullable=True)
-    avatar_url = db.Column(db.String(255), nullable=True)
-    access_token = db.Column(db.String(255), nullable=True)
-    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = db.Column(DateTime(timezone=True), onupdate=func.now())
-    
-    # Relationships
-    repositories = db.relationship('Repository', backref='user', lazy=True)
-    bug_reports = db.relationship('BugReport', backref='user', lazy=True)
-
-class Repository(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    github_id = db.Column(db.Integer, unique=True, nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    full_name = db.Column(db.String(150), nullable=False)
-    description = db.Column(db.Text, nullable=True)
-    html_url = db.Column(db.String(255), nullable=False)
-    clone_url = db.Column(db.String(255), nullable=True)
-    language = db.Column(db.String(50), nullable=True)
-    is_private = db.Column(db.Boolean, default=False)
-    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = db.Column(DateTime(timezone=True), onupdate=func.now())
-    
-    # Foreign Keys
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    
-    # Relationships
-    bug_reports = db.relationship('BugReport', backref='repository', lazy=True)
-
-class BugReport(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=False)
-    device_info = db.Column(db.Text, nullable=True)
-    screenshot_path = db.Column(db.String(255), nullable=True)
-    status = db.Column(db.String(20), default='open')  # open, closed, in_progress
-    priority = db.Column(db.String(10), default='medium')  # low, medium, high, critical
-    client_ip = db.Column(db.String(45), nullable=True)
-    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = db.Column(DateTime(timezone=True), onupdate=func.now())
-    
-    # Foreign Keys
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    repository_id = db.Column(db.Integer, db.ForeignKey('repository.id'), nullable=True)
+db.init_app(app)
 
 # GitHub OAuth configuration
 GITHUB_CLIENT_ID = os.environ.get('GITHUB_CLIENT_ID', 'your_client_id')
@@ -81,18 +54,162 @@ GITHUB_REDIRECT_URI = os.environ.get(
 )
 
 GITHUB_OAUTH_AUTHORIZE_URL = 'https://github.com/login/oauth/authorize'
-GITHUB_OAUTH_TOKEN_URL = 'https://github.com/login/oauth/access_token'
+GITHUB_OAUTH_TOKEN_URL = os.environ.get(
+    'GITHUB_OAUTH_TOKEN_URL',
+    'https://github.com/login/oauth/access_token'
+)
+
+# Offline load testing: send every GitHub call to a local fake_github_server.py
+FAKE_GITHUB_URL = os.environ.get('FAKE_GITHUB_URL')
+if FAKE_GITHUB_URL:
+    FAKE_GITHUB_URL = FAKE_GITHUB_URL.rstrip('/')
+    GITHUB_OAUTH_AUTHORIZE_URL = f"{FAKE_GITHUB_URL}/login/oauth/authorize"
+    GITHUB_OAUTH_TOKEN_URL = f"{FAKE_GITHUB_URL}/login/oauth/access_token"
+
+# Shared, connection-pooled client used by every GitHub-backed route
+github = GitHubClient.from_env(api_url=FAKE_GITHUB_URL)
+
+# Coalesces concurrent identical GitHub-backed requests per (route, token)
+github_calls = SingleFlight(grace=float(os.environ.get('GITHUB_COALESCE_GRACE', 0.25)))
+
+# GitHub profiles per session token; profiles change rarely, so /me and
+# /api/user answer from here (or a recently written User row) while fresh
+PROFILE_CACHE_TTL = int(os.environ.get('PROFILE_CACHE_TTL', 300))
+profile_cache = LRUCache(
+    maxsize=int(os.environ.get('PROFILE_CACHE_MAX_ENTRIES', 10000)),
+    ttl=PROFILE_CACHE_TTL
+)
+
+# /api/metrics/* expose per-token budgets and worker internals: they answer
+# only requests with "Authorization: Bearer $METRICS_TOKEN", and 404 without it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Repository webhooks (POST /api/webhooks/github), verified with this secret
+GITHUB_WEBHOOK_SECRET = os.environ.get('GITHUB_WEBHOOK_SECRET')
+WEBHOOK_MAX_BYTES = 25 * 1024 * 1024  # GitHub caps payloads at 25MB
+webhooks = WebhookProcessor(
+    app, GITHUB_WEBHOOK_SECRET,
+    maxsize=int(os.environ.get('GITHUB_WEBHOOK_QUEUE_SIZE', 1000)),
+    max_bytes=int(os.environ.get('GITHUB_WEBHOOK_QUEUE_BYTES', 64 * 1024 * 1024))
+)
+
+# Profile refreshes for existing users are written behind the response,
+# coalesced per github_id and flushed in one transaction per interval
+PROFILE_COLUMNS = ('username', 'email', 'avatar_url', 'access_token', 'access_token_hash', 'content_hash')
+profile_writes = WriteBehindBuffer(
+    app, lambda batch: apply_profile_updates(batch),
+    flush_interval=float(os.environ.get('PROFILE_WRITE_INTERVAL', 1.0)),
+    max_pending=int(os.environ.get('PROFILE_WRITE_MAX_PENDING', 500)),
+    name='profile-writes'
+)
+
+# Background repository sync; REPO_SYNC_INTERVAL=0 turns it off (e.g. when
+# several processes share one database and only one of them should run it).
+# With webhooks delivering changes the poll is only a safety net.
+REPO_SYNC_INTERVAL = int(os.environ.get('REPO_SYNC_INTERVAL', 21600 if GITHUB_WEBHOOK_SECRET else 300))
+repository_worker = RepositorySyncWorker(
+    app, github,
+    interval=REPO_SYNC_INTERVAL,
+    max_concurrency=int(os.environ.get('REPO_SYNC_CONCURRENCY', 4))
+)
 
 # Configure file uploads
-UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'bug_reports')
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(tempfile.gettempdir(), 'bug_reports'))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+# Whole bug report request: the screenshot plus the text fields and multipart framing
+MAX_BUG_REPORT_REQUEST_SIZE = MAX_FILE_SIZE + 1024 * 1024
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_FILE_SIZE'] = MAX_FILE_SIZE
 
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Rate limiting storage (in production, use Redis or database)
-submission_history = {}
+# Screenshots are stored once per content hash, sharded under UPLOAD_FOLDER
+screenshots = LocalScreenshotStore(UPLOAD_FOLDER)
+watch_screenshot_references(screenshots)
+# WebP copies and thumbnails are rendered in worker processes after submission
+screenshot_pipeline = ScreenshotPipeline(
+    app,
+    screenshots,
+    max_workers=int(os.environ.get('SCREENSHOT_WORKERS', 2)),
+    thumbnail_size=int(os.environ.get('SCREENSHOT_THUMBNAIL_SIZE', 320))
+)
+# Let a front proxy stream screenshot bytes: 'x-accel-redirect' (nginx, with an
+# internal location at SCREENSHOT_ACCEL_PREFIX aliased to UPLOAD_FOLDER) or
+# 'x-sendfile' (Apache, lighttpd); unset serves them from Flask with sendfile
+SCREENSHOT_OFFLOAD = os.environ.get('SCREENSHOT_OFFLOAD', '').lower()
+SCREENSHOT_ACCEL_PREFIX = os.environ.get('SCREENSHOT_ACCEL_PREFIX', '/protected-screenshots/')
+SCREENSHOT_MAX_AGE = 365 * 24 * 3600
+app.config['USE_X_SENDFILE'] = SCREENSHOT_OFFLOAD == 'x-sendfile'
+SCREENSHOT_TYPES = {extension: content_type for content_type, extension in CONTENT_TYPE_EXTENSIONS.items()}
+SCREENSHOT_TYPES['jpeg'] = 'image/jpeg'
+
+# Bug report rate limiting: a few counters per client IP, bounded in size.
+# RATE_LIMIT_BACKEND=sqlite:///path/ratelimit.db shares them between workers.
+BUG_REPORT_LIMIT = int(os.environ.get('BUG_REPORT_LIMIT', 5))
+BUG_REPORT_WINDOW = int(os.environ.get('BUG_REPORT_WINDOW', 3600))
+submission_limiter = create_rate_limiter(
+    os.environ.get('RATE_LIMIT_BACKEND', 'memory'),
+    BUG_REPORT_LIMIT,
+    BUG_REPORT_WINDOW,
+    max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+)
+
+# Bulk ingestion from test harnesses: one authenticated NDJSON request per run
+BULK_MAX_RECORDS = int(os.environ.get('BULK_MAX_RECORDS', 10000))
+BULK_MAX_BYTES = int(os.environ.get('BULK_MAX_BYTES', 64 * 1024 * 1024))
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 500))
+BULK_MAX_LINE = 64 * 1024
+
+# Optional group commit: bug reports from concurrent requests share one
+# transaction, collected for up to BUG_REPORT_COMMIT_DELAY_MS milliseconds
+BUG_REPORT_GROUP_COMMIT = os.environ.get('BUG_REPORT_GROUP_COMMIT', 'false').lower() == 'true'
+bug_report_writer = GroupCommitWriter(
+    app,
+    BugReport,
+    max_delay=float(os.environ.get('BUG_REPORT_COMMIT_DELAY_MS', 5)) / 1000,
+    max_batch=int(os.environ.get('BUG_REPORT_COMMIT_MAX_BATCH', 200)),
+    name='bug-report-writer'
+)
+
+# Near-duplicate detection: reports for the same repository whose title and
+# description overlap at least DUPLICATE_THRESHOLD (estimated Jaccard) are
+# linked to the closest earlier report. The index holds the most recent
+# DUPLICATE_INDEX_SIZE reports and is rebuilt from the database at startup;
+# each worker picks up reports filed through the others every
+# DUPLICATE_REFRESH_INTERVAL seconds.
+duplicates = DuplicateIndex(
+    threshold=float(os.environ.get('DUPLICATE_THRESHOLD', 0.5)),
+    max_reports=int(os.environ.get('DUPLICATE_INDEX_SIZE', 50000)),
+    refresh_interval=float(os.environ.get('DUPLICATE_REFRESH_INTERVAL', 2))
+)
+watch_deleted_reports(duplicates)
+
+def rate_limit_response(error):
+    """429 response for a GitHub call refused by the rate-limit scheduler"""
+    response = jsonify({"error": "GitHub rate limit exhausted, try again later"})
+    response.status_code = 429
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def start_background_workers():
+    if app.config.get('TESTING'):
+        return
+    profile_writes.start()
+    screenshot_pipeline.start()
+    if BUG_REPORT_GROUP_COMMIT:
+        bug_report_writer.start()
+    duplicates.start(app)
+    if REPO_SYNC_INTERVAL > 0:
+        repository_worker.start()
+    if GITHUB_WEBHOOK_SECRET:
+        webhooks.start()
+
+@app.before_request
+def ensure_background_workers():
+    start_background_workers()
 
 # Serve React frontend
 @app.route("/")
@@ -125,16 +242,19 @@ def github_callback():
     if not code:
         return redirect('/?error=missing_code')
 
-    token_resp = requests.post(
-        GITHUB_OAUTH_TOKEN_URL,
-        headers={'Accept': 'application/json'},
-        data={
-            'client_id': GITHUB_CLIENT_ID,
-            'client_secret': GITHUB_CLIENT_SECRET,
-            'code': code,
-            'redirect_uri': GITHUB_REDIRECT_URI  # optional but recommended to match
-        }
-    )
+    try:
+        token_resp = github.post(
+            GITHUB_OAUTH_TOKEN_URL,
+            headers={'Accept': 'application/json'},
+            data={
+                'client_id': GITHUB_CLIENT_ID,
+                'client_secret': GITHUB_CLIENT_SECRET,
+                'code': code,
+                'redirect_uri': GITHUB_REDIRECT_URI  # optional but recommended to match
+            }
+        )
+    except GitHubError:
+        return redirect('/?error=token_exchange_failed')
 
     token_json = token_resp.json()
     access_token = token_json.get('access_token')
@@ -142,9 +262,22 @@ def github_callback():
     if not access_token:
         return redirect('/?error=token_exchange_failed')
 
+    # Re-login: whatever was cached for the previous session token is stale
+    previous_token = session.get('github_token')
+    if previous_token:
+        invalidate_profile(previous_token)
+    invalidate_profile(access_token)
+
     session['github_token'] = access_token
     return redirect('/dashboard')
 
+@app.route("/logout")
+def logout():
+    token = session.pop('github_token', None)
+    if token:
+        invalidate_profile(token)
+    return redirect('/')
+
 # Protected route
 @app.route("/dashboard")
 def dashboard():
@@ -158,16 +291,137 @@ def get_user_info():
     if not token:
         return redirect('/login/github')
 
-    user_resp = requests.get(
-        "https://api.github.com/user",
-        headers={"Authorization": f"token {token}"}
-    )
+    cached = cached_profile(token)
+    if cached is not None:
+        return cached['profile']
 
-    if user_resp.status_code != 200:
+    try:
+        user_data = github_calls.do(('/me', hash_token(token)), lambda: fetch_github_profile(token))
+    except (GitHubError, RateLimitExceeded):
         return redirect('/?error=failed_to_fetch_user')
 
+    if user_data is None:
+        return redirect('/?error=failed_to_fetch_user')
+
+    profile_cache.set(hash_token(token), {'profile': user_data, 'stored': False})
+    return user_data
+
+def invalidate_profile(token):
+    """Forget everything cached for a session token"""
+    token_key = hash_token(token)
+    profile_cache.pop(token_key)
+    github_calls.forget(('/me', token_key))
+    github_calls.forget(('/api/user', token_key))
+
+def profile_from_user(user):
+    """GitHub-shaped profile built from a stored User row"""
+    return {
+        'id': user.github_id,
+        'login': user.username,
+        'email': user.email,
+        'avatar_url': user.avatar_url
+    }
+
+def _as_utc(value):
+    # SQLite hands back naive timestamps written by CURRENT_TIMESTAMP (UTC)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def cached_profile(token):
+    """Fresh profile for a token from memory or the User table, or None.
+
+    Returns a dict with the profile and whether it is already stored in the
+    User table.
+    """
+    token_key = hash_token(token)
+    entry = profile_cache.get(token_key)
+    if entry is not None:
+        return entry
+
+    user = user_for_token(token)
+    if user is None:
+        return None
+    written_at = user.updated_at or user.created_at
+    if written_at is None:
+        return None
+    if _as_utc(written_at) < datetime.now(timezone.utc) - timedelta(seconds=PROFILE_CACHE_TTL):
+        return None
+
+    entry = {'profile': profile_from_user(user), 'stored': True}
+    profile_cache.set(token_key, entry)
+    return entry
+
+def fetch_github_profile(token):
+    """Fetch the GitHub profile for a token, or None if GitHub refuses it"""
+    user_resp = github.get("/user", token=token)
+    if user_resp.status_code != 200:
+        return None
     return user_resp.json()
 
+def store_user_profile(user_data, token):
+    """Store or update the User row for a GitHub profile, skipping it when nothing changed.
+
+    New users and token changes are written immediately, since later requests
+    look the user up by token. Other profile changes go through the
+    write-behind buffer.
+    """
+    values = {
+        'username': user_data['login'],
+        'email': user_data.get('email'),
+        'avatar_url': user_data.get('avatar_url'),
+        'access_token': token
+    }
+    values['content_hash'] = content_hash(values)
+    # Not part of the content hash; rows stored before it existed still need it written
+    values['access_token_hash'] = hash_token(token)
+
+    pending = profile_writes.pending(user_data['id'])
+    if pending is not None and pending['content_hash'] == values['content_hash']:
+        write_counters.record('user', skipped=1)
+        return
+
+    user = User.query.filter_by(github_id=user_data['id']).first()
+    if (user and user.content_hash == values['content_hash']
+            and user.access_token_hash == values['access_token_hash']):
+        profile_writes.discard(user_data['id'])
+        write_counters.record('user', skipped=1)
+        return
+
+    if user and user.access_token == token:
+        profile_writes.put(user_data['id'], values)
+        write_counters.record('user', written=1)
+        return
+
+    if not user:
+        db.session.add(User(github_id=user_data['id'], **values))
+    else:
+        # Token rotated: the old token must no longer resolve to this user
+        forget_token(user.access_token)
+        for column, value in values.items():
+            setattr(user, column, value)
+    profile_writes.discard(user_data['id'])
+    db.session.commit()
+    write_counters.record('user', written=1)
+
+def apply_profile_updates(batch):
+    """Write buffered profile updates, keyed by github_id, as one batched UPDATE"""
+    user_table = User.__table__
+    statement = (
+        user_table.update()
+        .where(user_table.c.github_id == bindparam('b_github_id'))
+        .values({column: bindparam(column) for column in PROFILE_COLUMNS})
+    )
+    db.session.execute(statement, [dict(values, b_github_id=github_id) for github_id, values in batch.items()])
+
+def refresh_user_profile(token):
+    """Fetch the GitHub profile for a token and store or update its User row"""
+    user_data = fetch_github_profile(token)
+    if user_data is None:
+        return None
+
+    store_user_profile(user_data, token)
+    profile_cache.set(hash_token(token), {'profile': user_data, 'stored': True})
+    return user_data
+
 @app.route("/api/user")
 def get_current_user():
     """Get current authenticated user information"""
@@ -175,34 +429,28 @@ def get_current_user():
     if not token:
         return jsonify({"error": "Not authenticated"}), 401
 
-    user_resp = requests.get(
-        "https://api.github.com/user",
-        headers={"Authorization": f"token {token}"}
-    )
+    cached = cached_profile(token)
+    if cached is not None:
+        if not cached['stored']:
+            # Profile came from /me, which does not write the User row
+            store_user_profile(cached['profile'], token)
+            cached['stored'] = True
+        return jsonify({
+            "user": cached['profile'],
+            "access_token": token
+        })
 
-    if user_resp.status_code != 200:
-        return jsonify({"error": "Failed to fetch user data"}), 401
+    try:
+        # Concurrent calls for the same session share one fetch and upsert
+        user_data = github_calls.do(('/api/user', hash_token(token)), lambda: refresh_user_profile(token))
+    except RateLimitExceeded as e:
+        return rate_limit_response(e)
+    except GitHubError:
+        db.session.rollback()
+        return jsonify({"error": "GitHub is unavailable"}), 502
 
-    user_data = user_resp.json()
-    
-    # Store or update user in database
-    user = User.query.filter_by(github_id=user_data['id']).first()
-    if not user:
-        user = User(
-            github_id=user_data['id'],
-            username=user_data['login'],
-            email=user_data.get('email'),
-            avatar_url=user_data.get('avatar_url'),
-            access_token=token
-        )
-        db.session.add(user)
-    else:
-        user.username = user_data['login']
-        user.email = user_data.get('email')
-        user.avatar_url = user_data.get('avatar_url')
-        user.access_token = token
-    
-    db.session.commit()
+    if user_data is None:
+        return jsonify({"error": "Failed to fetch user data"}), 401
 
     return jsonify({
         "user": user_data,
@@ -211,63 +459,71 @@ def get_current_user():
 
 @app.route("/api/repositories")
 def get_user_repositories():
-    """Fetch and store user repositories from GitHub"""
+    """List the user's repositories from the database, syncing from GitHub on first use"""
     token = session.get('github_token')
     if not token:
         return jsonify({"error": "Not authenticated"}), 401
 
+    try:
+        listing = parse_listing_args(request.args)
+    except ListingError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Get current user
-    user = User.query.filter_by(access_token=token).first()
+    user = user_for_token(token)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    try:
-        # Fetch repositories from GitHub API
-        repos_resp = requests.get(
-            "https://api.github.com/user/repos?per_page=100&sort=updated",
-            headers={"Authorization": f"token {token}"}
-        )
-
-        if repos_resp.status_code != 200:
+    user_id = user.id
+    if user.repos_synced_at is None:
+        # Never synced: fetch inline once, the background worker keeps it fresh after that
+        try:
+            repository_worker.sync_user(user_id, priority=PRIORITY_HIGH)
+        except RepositoryFetchError:
+            db.session.rollback()
             return jsonify({"error": "Failed to fetch repositories"}), 500
+        except RateLimitExceeded as e:
+            db.session.rollback()
+            return rate_limit_response(e)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": f"Failed to process repositories: {str(e)}"}), 500
 
-        repos_data = repos_resp.json()
-        
-        # Store repositories in database
-        for repo_data in repos_data:
-            repo = Repository.query.filter_by(github_id=repo_data['id']).first()
-            if not repo:
-                repo = Repository(
-                    github_id=repo_data['id'],
-                    name=repo_data['name'],
-                    full_name=repo_data['full_name'],
-                    description=repo_data.get('description'),
-                    html_url=repo_data['html_url'],
-                    clone_url=repo_data.get('clone_url'),
-                    language=repo_data.get('language'),
-                    is_private=repo_data['private'],
-                    user_id=user.id
-                )
-                db.session.add(repo)
-            else:
-                # Update existing repository
-                repo.name = repo_data['name']
-                repo.full_name = repo_data['full_name']
-                repo.description = repo_data.get('description')
-                repo.html_url = repo_data['html_url']
-                repo.clone_url = repo_data.get('clone_url')
-                repo.language = repo_data.get('language')
-                repo.is_private = repo_data['private']
-        
-        db.session.commit()
+    repos_data, next_cursor = user_repositories(user_id, **listing)
+    return jsonify({
+        "repositories": repos_data,
+        "count": len(repos_data),
+        "next_cursor": next_cursor
+    })
 
-        return jsonify({
-            "repositories": repos_data,
-            "count": len(repos_data)
-        })
+@app.route("/api/webhooks/github", methods=['POST'])
+def github_webhook():
+    """Verify and queue a GitHub webhook delivery; it is applied off the request thread"""
+    if not webhooks.secret:
+        return jsonify({"error": "Webhooks are not configured"}), 404
 
-    except Exception as e:
-        return jsonify({"error": f"Failed to process repositories: {str(e)}"}), 500
+    if not request.headers.get('X-Hub-Signature-256'):
+        return jsonify({"error": "Missing signature"}), 401
+
+    if request.content_length is not None and request.content_length > WEBHOOK_MAX_BYTES:
+        return jsonify({"error": "Payload too large"}), 413
+
+    # Chunked bodies are cut off at the limit too (answered with 413)
+    request.max_content_length = WEBHOOK_MAX_BYTES
+    body = request.get_data()
+    # The HMAC is cheap; checking it here keeps forged bodies out of the queue
+    if not webhooks.verify(body, request.headers['X-Hub-Signature-256']):
+        return jsonify({"error": "Invalid signature"}), 401
+
+    accepted = webhooks.submit(
+        request.headers.get('X-GitHub-Event'),
+        request.headers.get('X-GitHub-Delivery'),
+        request.headers['X-Hub-Signature-256'],
+        body
+    )
+    if not accepted:
+        return jsonify({"error": "Webhook queue is full"}), 503
+    return jsonify({"status": "queued"}), 202
 
 def allowed_file(filename):
     if not filename or not filename.strip():
@@ -279,20 +535,38 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def is_rate_limited(client_ip):
-    """Simple rate limiting: max 5 submissions per hour per IP"""
-    current_time = time.time()
-    hour_ago = current_time - 3600
-    
-    if client_ip not in submission_history:
-        submission_history[client_ip] = []
-    
-    # Remove old submissions
-    submission_history[client_ip] = [
-        timestamp for timestamp in submission_history[client_ip] 
-        if timestamp > hour_ago
-    ]
-    
-    return len(submission_history[client_ip]) >= 5
+    """Rate limiting: max BUG_REPORT_LIMIT submissions per BUG_REPORT_WINDOW seconds per IP"""
+    return submission_limiter.is_limited(client_ip)
+
+def screenshot_error(file):
+    """Why an uploaded screenshot cannot be accepted, or None"""
+    if not allowed_file(file.filename):
+        return 'Invalid file type. Only image files are allowed.'
+    # Size was enforced while streaming; check what the bytes really are
+    if looks_dangerous(file.stream.header):
+        return 'Invalid file type. Only image files are allowed.'
+    if file.stream.size > MAX_FILE_SIZE:
+        return 'File size too large. Maximum size is 5MB.'
+    return None
+
+def save_screenshot(file):
+    """Store a validated upload by content hash; an identical screenshot is kept only once"""
+    extension = CONTENT_TYPE_EXTENSIONS.get(file.stream.content_type) or \
+        file.filename.rsplit('.', 1)[1].lower()
+    key = screenshots.put_upload(file.stream, extension)
+    g.setdefault('placed_screenshots', []).append(key)
+    return key
+
+@app.teardown_request
+def settle_screenshots(error=None):
+    """Release the store's hold on this request's screenshots once its reports are committed"""
+    keys = g.pop('placed_screenshots', None)
+    if keys:
+        screenshots.settle(keys)
+        # A report that failed to insert leaves its screenshot unreferenced;
+        # counted on a fresh connection, as this request's session may be mid-rollback
+        with db.engine.connect() as connection:
+            release_screenshots(screenshots, keys, connection)
 
 def validate_bug_report_data(data):
     """Validate bug report submission data"""
@@ -322,6 +596,8 @@ def validate_bug_report_data(data):
 def submit_bug_report():
     """Handle bug report submission with file upload"""
     client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', 'unknown'))
+    # Refuse oversized bodies from Content-Length before any of it is read
+    request.max_content_length = MAX_BUG_REPORT_REQUEST_SIZE
     
     # Check rate limiting
     if is_rate_limited(client_ip):
@@ -351,60 +627,60 @@ def submit_bug_report():
     user = None
     token = session.get('github_token')
     if token:
-        user = User.query.filter_by(access_token=token).first()
+        user = user_for_token(token)
     
     # Handle file upload
     screenshot_path = None
     if 'screenshot' in request.files:
         file = request.files['screenshot']
         if file and file.filename != '':
-            # Validate file
-            if not allowed_file(file.filename):
-                return jsonify({
-                    'error': 'Invalid file type. Only image files are allowed.'
-                }), 400
-            
-            # Check file size
-            file.seek(0, os.SEEK_END)
-            file_size = file.tell()
-            file.seek(0)
-            
-            if file_size > MAX_FILE_SIZE:
-                return jsonify({
-                    'error': 'File size too large. Maximum size is 5MB.'
-                }), 400
-            
-            # Save file
-            filename = secure_filename(file.filename)
-            timestamp = int(time.time())
-            unique_filename = f"{timestamp}_{filename}"
-            screenshot_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-            file.save(screenshot_path)
+            error = screenshot_error(file)
+            if error:
+                return jsonify({'error': error}), 400
+            screenshot_path = save_screenshot(file)
 
+    # An identical screenshot may already have been rendered for another report
+    rendered = screenshot_pipeline.rendered(screenshot_path) if screenshot_path else None
+    
     # Create bug report in database
     try:
-        bug_report = BugReport(
+        repository_id = int(repository_id) if repository_id and repository_id.isdigit() else None
+        text_signature = signature(title, description)
+        duplicate = duplicates.find(repository_id, text_signature)
+        values = dict(
             title=title,
             description=description,
-            device_info=device_info,
+            **encode_device_info(device_info),
             screenshot_path=screenshot_path,
+            screenshot_webp_path=rendered[0] if rendered else None,
+            thumbnail_path=rendered[1] if rendered else None,
             client_ip=client_ip,
             user_id=user.id if user else None,
-            repository_id=int(repository_id) if repository_id and repository_id.isdigit() else None
+            repository_id=repository_id,
+            duplicate_of_id=duplicate[0] if duplicate else None
         )
         
-        db.session.add(bug_report)
-        db.session.commit()
+        if BUG_REPORT_GROUP_COMMIT:
+            bug_report_id = bug_report_writer.insert(values)
+        else:
+            bug_report = BugReport(**values)
+            db.session.add(bug_report)
+            db.session.commit()
+            bug_report_id = bug_report.id
+        duplicates.add(bug_report_id, repository_id, text_signature)
         
         # Update rate limiting
-        if client_ip not in submission_history:
-            submission_history[client_ip] = []
-        submission_history[client_ip].append(time.time())
+        submission_limiter.hit(client_ip)
+        
+        if screenshot_path and not rendered:
+            screenshot_pipeline.submit(screenshot_path)
         
         return jsonify({
             'success': True,
             'message': 'Bug report submitted successfully',
-            'bug_report_id': bug_report.id
+            'bug_report_id': bug_report_id,
+            'duplicate_of': duplicate[0] if duplicate else None,
+            'similarity': duplicate[1] if duplicate else None
         }), 201
         
     except Exception as e:
@@ -416,11 +692,23 @@ def submit_bug_report():
 @app.route('/api/bug-reports', methods=['GET'])
 def get_bug_reports():
     """Get list of bug reports from database"""
+    # Version filters match on the major number: 17 and 17.4 both mean 17
+    majors = {}
+    for name in ('browser_version', 'os_version'):
+        value = request.args.get(name)
+        if value:
+            major = value.split('.')[0]
+            if not major.isdecimal():
+                return jsonify({'error': f'{name} must be a version number such as 17 or 17.4'}), 400
+            majors[name] = int(major)
+
     try:
         # Get optional filters
         user_id = request.args.get('user_id')
         repository_id = request.args.get('repository_id')
         status = request.args.get('status')
+        browser = request.args.get('browser')
+        os_name = request.args.get('os')
         page = int(request.args.get('page', 1))
         per_page = min(int(request.args.get('per_page', 10)), 100)
         
@@ -433,6 +721,18 @@ def get_bug_reports():
             query = query.filter_by(repository_id=repository_id)
         if status:
             query = query.filter_by(status=status)
+        # Device filters match on the indexed profile columns
+        if browser or os_name or majors:
+            query = query.join(BugReport.device_profile)
+            if browser:
+                query = query.filter(DeviceProfile.browser == browser)
+            if 'browser_version' in majors:
+                query = query.filter(DeviceProfile.browser_major == majors['browser_version'])
+            if os_name:
+                query = query.filter(DeviceProfile.os == os_name)
+            if 'os_version' in majors:
+                query = query.filter(DeviceProfile.os_major == majors['os_version'])
+        query = query.options(joinedload(BugReport.device_profile))
         
         # Order by created_at desc
         query = query.order_by(BugReport.created_at.desc())
@@ -451,7 +751,18 @@ def get_bug_reports():
                 'created_at': report.created_at.isoformat() if report.created_at else None,
                 'user': report.user.username if report.user else None,
                 'repository': report.repository.full_name if report.repository else None,
-                'has_screenshot': bool(report.screenshot_path)
+                'duplicate_of': report.duplicate_of_id,
+                'device': {
+                    'browser': report.device_profile.browser,
+                    'browser_version': report.device_profile.browser_version,
+                    'os': report.device_profile.os,
+                    'os_version': report.device_profile.os_version,
+                    'screen_resolution': report.device_profile.screen_resolution,
+                } if report.device_profile else None,
+                'has_screenshot': bool(report.screenshot_path),
+                'has_thumbnail': bool(report.thumbnail_path),
+                'screenshot_url': f'/api/bug-reports/{report.id}/screenshot' if report.screenshot_path else None,
+                'thumbnail_url': f'/api/bug-reports/{report.id}/thumbnail' if report.thumbnail_path else None
             })
         
         return jsonify({
@@ -465,7 +776,259 @@ def get_bug_reports():
     except Exception as e:
         return jsonify({'error': f'Failed to fetch bug reports: {str(e)}'}), 500
 
+def screenshot_response(key, etag):
+    """Serve a stored file with immutable caching, Range and If-None-Match"""
+    path = screenshots.local_path(key)
+    mimetype = SCREENSHOT_TYPES.get(key.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+    if SCREENSHOT_OFFLOAD == 'x-accel-redirect' and etag:
+        response = app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = SCREENSHOT_ACCEL_PREFIX.rstrip('/') + '/' + key
+        response.set_etag(etag)
+        response = response.make_conditional(request)
+    elif not os.path.exists(path):
+        return jsonify({'error': 'Screenshot not found'}), 404
+    else:
+        # conditional=True answers Range and If-None-Match; whole files go through wsgi.file_wrapper
+        response = send_file(path, mimetype=mimetype, etag=etag or True, conditional=True,
+                             max_age=SCREENSHOT_MAX_AGE)
+    # Content-addressed: the bytes behind this URL never change, but they are not public
+    response.headers['Cache-Control'] = f'private, max-age={SCREENSHOT_MAX_AGE}, immutable'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/api/bug-reports/<int:report_id>/<any("screenshot", "screenshot.webp", "thumbnail"):variant>',
+           methods=['GET'])
+def get_bug_report_screenshot(report_id, variant):
+    """Screenshot of a bug report, for its reporter or users its repository is listed for"""
+    user = user_for_token(session.get('github_token'))
+    if user is None:
+        return jsonify({"error": "Not authenticated"}), 401
+    report = db.session.get(BugReport, report_id)
+    allowed = report is not None and (
+        report.user_id == user.id or (report.repository_id is not None and db.session.execute(
+            select(repository_access.c.user_id).where(repository_access.c.user_id == user.id,
+                                                       repository_access.c.repository_id == report.repository_id)
+        ).first() is not None)
+    )
+    key = {
+        'screenshot': report.screenshot_path,
+        'screenshot.webp': report.screenshot_webp_path,
+        'thumbnail': report.thumbnail_path,
+    }[variant] if allowed else None
+    if not key:
+        return jsonify({'error': 'Screenshot not found'}), 404
+    digest = key_digest(key)
+    etag = None
+    if digest:
+        etag = digest if variant == 'screenshot' else f'{digest}-{variant}'
+    return screenshot_response(key, etag)
+
+@app.route('/api/bug-reports/bulk', methods=['POST'])
+def bulk_bug_reports():
+    """Ingest NDJSON bug reports, streaming back one result line per record"""
+    client_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', 'unknown'))
+    request.max_content_length = BULK_MAX_BYTES
+    request.max_file_size = BULK_MAX_BYTES  # screenshots are held to MAX_FILE_SIZE per record
+
+    auth = request.headers.get('Authorization', '')
+    token = auth[7:] if auth.startswith('Bearer ') else session.get('github_token')
+    user = user_for_token(token)
+    if user is None:
+        return jsonify({"error": "Not authenticated"}), 401
+    rate_key = f'bulk:{user.id}'
+    if submission_limiter.is_limited(rate_key):
+        return jsonify({
+            'error': f'Rate limit exceeded. Maximum {BUG_REPORT_LIMIT} bulk uploads per hour.'
+        }), 429
+
+    # Either a raw NDJSON body, or multipart with a 'reports' NDJSON file and
+    # screenshots attached as file fields named by each record's "screenshot"
+    if request.mimetype == 'multipart/form-data':
+        reports = request.files.get('reports')
+        if reports is None:
+            return jsonify({'error': "Missing 'reports' NDJSON part"}), 400
+        stream = reports.stream
+        stream.seek(0)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq'):
+        # The WSGI input stream reads a byte at a time for readline(); buffer it
+        stream = io.BufferedReader(request.stream, 64 * 1024)
+    else:
+        return jsonify({'error': 'Expected application/x-ndjson or multipart/form-data'}), 415
+    submission_limiter.hit(rate_key)
+
+    def records():
+        for number, raw in enumerate(iter(lambda: stream.readline(BULK_MAX_LINE + 1), b''), start=1):
+            if number > BULK_MAX_RECORDS:
+                yield number, None, [f'Too many records. Maximum is {BULK_MAX_RECORDS}.']
+                return
+            if len(raw) > BULK_MAX_LINE:
+                yield number, None, ['Record too long']
+                # skip the rest of the oversized line
+                while raw and not raw.endswith(b'\n'):
+                    raw = stream.readline(BULK_MAX_LINE + 1)
+                continue
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                yield number, None, ['Invalid JSON']
+                continue
+            if not isinstance(record, dict):
+                yield number, None, ['Record must be a JSON object']
+                continue
+            errors = validate_bug_report_data(record)
+            if errors:
+                yield number, None, errors
+                continue
+            yield number, record, None
+
+    stored = {}  # file field -> screenshot key, so a screenshot can be shared
+
+    def screenshot_for(field):
+        if field in stored:
+            return stored[field], None
+        file = request.files.get(field) if isinstance(field, str) else None
+        if file is None or not file.filename:
+            return None, f"No attached file named '{field}'"
+        error = screenshot_error(file)
+        if error:
+            return None, error
+        stored[field] = save_screenshot(file)
+        return stored[field], None
+
+    def results():
+        summary = {'records': 0, 'created': 0, 'failed': 0, 'duplicates': 0}
+        chunk = []  # (line number, PendingInsert, signature) waiting for the next transaction
+        rendering = set()
+        # Records in the unwritten chunk have no ids yet: match them by line
+        # number and link them once the chunk is written
+        chunk_index = DuplicateIndex(threshold=duplicates.threshold, max_reports=BULK_CHUNK_SIZE)
+        chunk_duplicates = {}  # line number -> line number of its duplicate in the chunk
+
+        def flush():
+            bug_report_writer.write([pending for _, pending, _ in chunk])
+            ids = {number: pending.id for number, pending, _ in chunk if pending.error is None}
+            linked = {number: ids[original] for number, original in chunk_duplicates.items()
+                      if number in ids and original in ids}
+            if linked:
+                db.session.execute(
+                    update(BugReport.__table__).where(BugReport.id == bindparam('report_id'))
+                    .values(duplicate_of_id=bindparam('duplicate_of')),
+                    [{'report_id': ids[number], 'duplicate_of': original} for number, original in linked.items()]
+                )
+                db.session.commit()
+            for number, pending, text_signature in chunk:
+                if pending.error is not None:
+                    summary['failed'] += 1
+                    yield {'line': number, 'errors': [f'Failed to save bug report: {pending.error}']}
+                    continue
+                summary['created'] += 1
+                duplicates.add(pending.id, pending.values['repository_id'], text_signature)
+                duplicate_of = pending.values['duplicate_of_id'] or linked.get(number)
+                if duplicate_of:
+                    summary['duplicates'] += 1
+                key = pending.values['screenshot_path']
+                if key and not pending.values['thumbnail_path'] and key not in rendering:
+                    rendering.add(key)
+                    screenshot_pipeline.submit(key)
+                yield {'line': number, 'id': pending.id, 'duplicate_of': duplicate_of}
+            chunk.clear()
+            chunk_index.clear()
+            chunk_duplicates.clear()
+
+        for number, record, errors in records():
+            summary['records'] += 1
+            screenshot_path = None
+            if record is not None and record.get('screenshot'):
+                screenshot_path, error = screenshot_for(record['screenshot'])
+                if error:
+                    errors = [error]
+            if errors:
+                summary['failed'] += 1
+                yield json.dumps({'line': number, 'errors': errors}) + '\n'
+                continue
+
+            device = encode_device_info(record.get('deviceInfo', record.get('device_info')))
+            repository_id = record.get('repository_id')
+            repository_id = int(repository_id) if str(repository_id).isdigit() else None
+            title, description = str(record['title']).strip(), str(record['description']).strip()
+            text_signature = signature(title, description)
+            duplicate = duplicates.find(repository_id, text_signature)
+            if duplicate is None:
+                in_chunk = chunk_index.find(repository_id, text_signature)
+                if in_chunk is not None:
+                    chunk_duplicates[number] = in_chunk[0]
+            chunk_index.add(number, repository_id, text_signature)
+            rendered = screenshot_pipeline.rendered(screenshot_path) if screenshot_path else None
+            chunk.append((number, PendingInsert(dict(
+                title=title,
+                description=description,
+                **device,
+                screenshot_path=screenshot_path,
+                screenshot_webp_path=rendered[0] if rendered else None,
+                thumbnail_path=rendered[1] if rendered else None,
+                client_ip=client_ip,
+                user_id=user.id,
+                repository_id=repository_id,
+                duplicate_of_id=duplicate[0] if duplicate else None
+            )), text_signature))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                for result in flush():
+                    yield json.dumps(result) + '\n'
+        if chunk:
+            for result in flush():
+                yield json.dumps(result) + '\n'
+        yield json.dumps({'summary': summary}) + '\n'
+
+    return app.response_class(stream_with_context(results()), mimetype='application/x-ndjson')
+
+def metrics_refusal():
+    """Error response unless the request carries the metrics token, else None"""
+    if not METRICS_TOKEN:
+        return jsonify({"error": "Metrics are not enabled"}), 404
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f'Bearer {METRICS_TOKEN}'.encode('utf-8')):
+        return jsonify({"error": "Not authenticated"}), 401
+    return None
+
+@app.route('/api/metrics/github', methods=['GET'])
+def get_github_metrics():
+    """Upstream latency, response cache and per-token rate-limit budgets"""
+    refusal = metrics_refusal()
+    if refusal:
+        return refusal
+    return jsonify(dict(
+        github.stats(),
+        coalescing=github_calls.stats(),
+        repository_sync=repository_worker.stats(),
+        webhooks=webhooks.stats(),
+        writes=write_counters.snapshot(),
+        profile_writes=profile_writes.stats()
+    ))
+
+@app.route('/api/metrics/bug-reports', methods=['GET'])
+def get_bug_report_metrics():
+    """Submission rate limits, screenshot rendering, group commit and duplicate index"""
+    refusal = metrics_refusal()
+    if refusal:
+        return refusal
+    return jsonify(
+        rate_limits=submission_limiter.stats(),
+        screenshots=screenshot_pipeline.stats(),
+        writer=bug_report_writer.stats(),
+        duplicates=duplicates.stats(),
+        device_profiles=device_profile_ids.stats()
+    )
+
 # Error handlers
+@app.errorhandler(RequestEntityTooLarge)
+def request_entity_too_large(error):
+    """Oversized bug report uploads keep their 400; anything else is a 413"""
+    if request.endpoint == 'submit_bug_report' or isinstance(error, UploadTooLarge):
+        return jsonify({'error': 'File size too large. Maximum size is 5MB.'}), 400
+    return jsonify({'error': 'Request too large'}), 413
+
 @app.errorhandler(405)
 def method_not_allowed(error):
     """Handle 405 Method Not Allowed errors"""
@@ -482,7 +1045,7 @@ def not_found(error):
 if __name__ == "__main__":
     # Create database tables
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
         print("Database tables created successfully!")
     
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
@@ -0,0 +1,336 @@
+"""
+asyncio serving mode for the GitHub-backed routes.
+
+/me, /api/user and /api/repositories spend nearly all of their time waiting
+on GitHub. Served from here they await an httpx connection pool on one event
+loop instead of holding a sync worker each, so a single process can keep
+hundreds of upstream calls in flight. Only the short database work runs on a
+small thread pool, inside a Flask app context so it goes through the same
+models and helpers as app.py. Every other path is handed to the Flask app
+unchanged.
+
+    uvicorn asgi_app:application --host 127.0.0.1 --port 5000
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie, CookieError
+from urllib.parse import parse_qsl
+
+from itsdangerous import BadSignature
+from werkzeug.exceptions import ClientDisconnected
+
+from app import app, github, profile_cache, cached_profile, store_user_profile, start_background_workers
+from user_lookup import user_for_token
+from github_client import AsyncGitHubClient, GitHubError
+from github_ratelimit import RateLimitExceeded
+from github_cache import hash_token
+from singleflight import AsyncSingleFlight
+from repository_listing import parse_listing_args, user_repositories, ListingError
+from repository_sync import (
+    fetch_repository_pages_async, write_repository_page, mark_repositories_synced, changed_at,
+    RepositoryFetchError,
+)
+
+# Shares metrics, response cache and rate-limit budgets with the sync client
+async_github = AsyncGitHubClient.from_client(github)
+
+async_calls = AsyncSingleFlight(grace=float(os.environ.get('GITHUB_COALESCE_GRACE', 0.25)))
+
+# Threads for database work and for requests handed to the Flask app
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi')
+
+# Read size of the request body stream handed to the Flask fallback
+BODY_BUFFER_SIZE = 64 * 1024
+
+
+class ReceiveStream(io.RawIOBase):
+    """Blocking request body read from the ASGI receive channel by a worker thread.
+
+    Flask pulls the body as it parses it, so its size limits stop an upload
+    at the first chunk over them instead of after the whole body has arrived.
+    """
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = b''
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            self._chunk = message.get('body', b'')
+            self._more = message.get('more_body', False)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+async def run_in_thread(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def run_db(fn, *args):
+    """Run fn in an app context on the thread pool; the context's teardown removes the session"""
+    def call():
+        with app.app_context():
+            return fn(*args)
+    return await run_in_thread(call)
+
+
+def header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def session_token(scope):
+    """GitHub token from the Flask session cookie, or None"""
+    cookie_header = header(scope, b'cookie')
+    if not cookie_header:
+        return None
+    cookies = SimpleCookie()
+    try:
+        cookies.load(cookie_header)
+    except CookieError:
+        return None
+    morsel = cookies.get(app.config['SESSION_COOKIE_NAME'])
+    if morsel is None:
+        return None
+    serializer = app.session_interface.get_signing_serializer(app)
+    try:
+        data = serializer.loads(morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return None
+    return data.get('github_token')
+
+
+async def send_response(send, status, body=b'', headers=()):
+    await send({'type': 'http.response.start', 'status': status, 'headers': list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def json_response(send, payload, status=200, headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send_response(send, status, body, [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        *headers,
+    ])
+
+
+async def redirect_response(send, location):
+    await send_response(send, 302, headers=[(b'location', location.encode('latin-1')), (b'content-length', b'0')])
+
+
+async def rate_limit_response(send, error):
+    headers = []
+    if error.retry_after is not None:
+        headers.append((b'retry-after', str(error.retry_after).encode()))
+    await json_response(send, {"error": "GitHub rate limit exhausted, try again later"}, 429, headers)
+
+
+async def fetch_github_profile(token):
+    """Async counterpart of app.fetch_github_profile"""
+    user_resp = await async_github.get("/user", token=token)
+    if user_resp.status_code != 200:
+        return None
+    return user_resp.json()
+
+
+async def refresh_user_profile(token):
+    user_data = await fetch_github_profile(token)
+    if user_data is None:
+        return None
+    await run_db(store_user_profile, user_data, token)
+    profile_cache.set(hash_token(token), {'profile': user_data, 'stored': True})
+    return user_data
+
+
+async def sync_repositories(user_id, token):
+    """First sync for a user: fetch every page, committing each as it arrives"""
+    watermark = ''
+    async for page in fetch_repository_pages_async(async_github, token):
+        await run_db(write_repository_page, user_id, page)
+        watermark = max([watermark] + [changed_at(repo_data) for repo_data in page])
+    await run_db(mark_repositories_synced, user_id, watermark or None)
+
+
+def user_sync_state(token):
+    """(user id, whether its repositories have been synced) for a token, or None"""
+    user = user_for_token(token)
+    return (user.id, user.repos_synced_at is not None) if user else None
+
+
+async def get_user_info(scope, send):
+    token = session_token(scope)
+    if not token:
+        return await redirect_response(send, '/login/github')
+
+    cached = await run_db(cached_profile, token)
+    if cached is not None:
+        return await json_response(send, cached['profile'])
+
+    try:
+        user_data = await async_calls.do(('/me', hash_token(token)), lambda: fetch_github_profile(token))
+    except (GitHubError, RateLimitExceeded):
+        return await redirect_response(send, '/?error=failed_to_fetch_user')
+
+    if user_data is None:
+        return await redirect_response(send, '/?error=failed_to_fetch_user')
+
+    profile_cache.set(hash_token(token), {'profile': user_data, 'stored': False})
+    await json_response(send, user_data)
+
+
+async def get_current_user(scope, send):
+    token = session_token(scope)
+    if not token:
+        return await json_response(send, {"error": "Not authenticated"}, 401)
+
+    cached = await run_db(cached_profile, token)
+    if cached is not None:
+        if not cached['stored']:
+            await run_db(store_user_profile, cached['profile'], token)
+            cached['stored'] = True
+        return await json_response(send, {"user": cached['profile'], "access_token": token})
+
+    try:
+        user_data = await async_calls.do(('/api/user', hash_token(token)), lambda: refresh_user_profile(token))
+    except RateLimitExceeded as e:
+        return await rate_limit_response(send, e)
+    except GitHubError:
+        return await json_response(send, {"error": "GitHub is unavailable"}, 502)
+
+    if user_data is None:
+        return await json_response(send, {"error": "Failed to fetch user data"}, 401)
+
+    await json_response(send, {"user": user_data, "access_token": token})
+
+
+async def get_user_repositories(scope, send):
+    token = session_token(scope)
+    if not token:
+        return await json_response(send, {"error": "Not authenticated"}, 401)
+
+    try:
+        listing = parse_listing_args(dict(parse_qsl(scope['query_string'].decode('latin-1'))))
+    except ListingError as e:
+        return await json_response(send, {"error": str(e)}, 400)
+
+    state = await run_db(user_sync_state, token)
+    if state is None:
+        return await json_response(send, {"error": "User not found"}, 404)
+
+    user_id, synced = state
+    if not synced:
+        try:
+            await async_calls.do(('/api/repositories', hash_token(token)), lambda: sync_repositories(user_id, token))
+        except RepositoryFetchError:
+            return await json_response(send, {"error": "Failed to fetch repositories"}, 500)
+        except RateLimitExceeded as e:
+            return await rate_limit_response(send, e)
+        except Exception as e:
+            return await json_response(send, {"error": f"Failed to process repositories: {str(e)}"}, 500)
+
+    repos_data, next_cursor = await run_db(lambda: user_repositories(user_id, **listing))
+    await json_response(send, {"repositories": repos_data, "count": len(repos_data), "next_cursor": next_cursor})
+
+
+ROUTES = {
+    '/me': get_user_info,
+    '/api/user': get_current_user,
+    '/api/repositories': get_user_repositories,
+}
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # The stream ends with the ASGI body, so chunked requests can be read too
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin-1')
+        if key in environ:
+            value = f"{environ[key]}{'; ' if key == 'HTTP_COOKIE' else ','}{value}"
+        environ[key] = value
+    return environ
+
+
+async def wsgi_fallback(scope, receive, send):
+    """Serve a request with the Flask app on the thread pool"""
+    body = io.BufferedReader(ReceiveStream(receive, asyncio.get_running_loop()), BODY_BUFFER_SIZE)
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    result = await run_in_thread(app, wsgi_environ(scope, body), start_response)
+    try:
+        chunks = iter(result)
+        chunk = await run_in_thread(next, chunks, None)
+        await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await run_in_thread(next, chunks, None)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            await run_in_thread(result.close)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            start_background_workers()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_github.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    handler = ROUTES.get(scope['path']) if scope['method'] == 'GET' else None
+    if handler is None:
+        return await wsgi_fallback(scope, receive, send)
+    await handler(scope, send)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Storage and lookup cost of device info: free text vs device profiles.
+
+Files --reports bug reports from --devices distinct devices into two fresh
+SQLite files, one keeping each report's device info text (the old column)
+and one dictionary-encoding it into DeviceProfile rows, then compares the
+database size and the time to find every report from Safari 17 on iOS:
+
+    python benchmarks/bench_device_profiles.py --reports 100000 --devices 300
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from device_profiles import device_profile_ids, encode_device_info
+from models import db, BugReport, DeviceProfile
+
+USER_AGENTS = [
+    'Mozilla/5.0 (iPhone; CPU iPhone OS {v}_4 like Mac OS X) AppleWebKit/605.1.15 '
+    '(KHTML, like Gecko) Version/{v}.4 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/{v}0.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Linux; Android {v}; Pixel 8) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/{v}0.0.0.0 Mobile Safari/537.36',
+]
+SCREENS = ['390x844', '393x852', '1920x1080', '2560x1440', '412x915']
+
+
+def devices(count, rng):
+    return [{
+        'userAgent': rng.choice(USER_AGENTS).format(v=rng.randint(14, 18)),
+        'platform': rng.choice(['iPhone', 'Win32', 'Linux armv8l']),
+        'language': rng.choice(['en-US', 'de-DE', 'fr-FR', 'ja-JP']),
+        'screenResolution': rng.choice(SCREENS),
+        'viewport': f'{rng.randint(300, 1900)}x{rng.randint(500, 1000)}',
+    } for _ in range(count)]
+
+
+def fill(path, submissions, encoded, batch=5000):
+    bench = Flask(__name__)
+    bench.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    db.init_app(bench)
+    with bench.app_context():
+        db.create_all()
+        device_profile_ids.clear()
+        rows = []
+        for i, device_info in enumerate(submissions):
+            values = {'title': f'Bug {i}', 'description': 'Steps to reproduce.'}
+            if encoded:
+                values.update(encode_device_info(device_info))
+            else:
+                values['device_info_raw'] = device_info
+            rows.append(values)
+            if len(rows) == batch:
+                db.session.execute(insert(BugReport), rows)
+                rows = []
+        if rows:
+            db.session.execute(insert(BugReport), rows)
+        db.session.commit()
+        db.session.execute(db.text('VACUUM'))
+
+        started = time.perf_counter()
+        for _ in range(10):
+            if encoded:
+                found = (BugReport.query.join(BugReport.device_profile)
+                         .filter(DeviceProfile.browser == 'Safari', DeviceProfile.browser_major == 17,
+                                 DeviceProfile.os == 'iOS')
+                         .with_entities(BugReport.id).all())
+            else:
+                found = (BugReport.query
+                         .filter(BugReport.device_info_raw.like('%iPhone OS 17%'),
+                                 BugReport.device_info_raw.like('%Version/17.%Safari%'))
+                         .with_entities(BugReport.id).all())
+        elapsed = (time.perf_counter() - started) / 10
+        db.session.remove()
+        db.engine.dispose()
+    return os.path.getsize(path), elapsed, len(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark device profile encoding')
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--devices', type=int, default=300)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    pool = devices(args.devices, rng)
+    submissions = [json.dumps(dict(rng.choice(pool), timestamp=f'2024-05-01T10:{i % 60:02d}:00.000Z'),
+                              separators=(',', ':')) for i in range(args.reports)]
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, encoded in (('free text', False), ('device profiles', True)):
+            size, elapsed, found = fill(os.path.join(tmp, f'{encoded}.db'), submissions, encoded)
+            print(f"{label:>16}: {size / args.reports:7.1f} bytes/report  "
+                  f"Safari 17 on iOS in {elapsed * 1000:7.2f} ms ({found} reports)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Cost of near-duplicate lookups as the duplicate index fills.
+
+Indexes --reports synthetic bug reports spread over --repositories, a tenth
+of them rewordings of an earlier report, then times signature + lookup for
+fresh submissions and a linear scan over the same signatures for comparison.
+Reports the memory the index holds next to its own estimate:
+
+    python benchmarks/bench_duplicate_index.py --reports 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from duplicate_index import DuplicateIndex, signature, similarity
+
+VOCABULARY = [f'word{i}' for i in range(5000)]
+
+
+def report_text(rng):
+    return ' '.join(rng.sample(VOCABULARY, 6)), ' '.join(rng.choices(VOCABULARY, k=rng.randint(20, 80)))
+
+
+def reword(rng, text):
+    title, description = text
+    words = description.split()
+    for _ in range(max(1, len(words) // 20)):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return title, ' '.join(words)
+
+
+def build(texts, repositories, max_reports):
+    index = DuplicateIndex(max_reports=max_reports)
+    signatures = []
+    for report_id, text in enumerate(texts, start=1):
+        sig = signature(*text)
+        signatures.append((report_id, report_id % repositories, sig))
+        index.add(report_id, report_id % repositories, sig)
+    return index, signatures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark near-duplicate detection')
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--repositories', type=int, default=50)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--scan-lookups', type=int, default=20, help='lookups timed for the linear scan')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    texts = []
+    for _ in range(args.reports):
+        texts.append(reword(rng, rng.choice(texts)) if texts and rng.random() < 0.1 else report_text(rng))
+    queries = []
+    for _ in range(args.lookups):
+        report_id = rng.randrange(args.reports)
+        fresh = rng.random() < 0.5
+        queries.append(((report_id + 1) % args.repositories, report_text(rng) if fresh else reword(rng, texts[report_id])))
+
+    started = time.perf_counter()
+    index, signatures = build(texts, args.repositories, args.reports)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    found = sum(1 for repository_id, text in queries if index.find(repository_id, signature(*text)))
+    lookup = (time.perf_counter() - started) / len(queries)
+
+    started = time.perf_counter()
+    for repository_id, text in queries[:args.scan_lookups]:
+        sig = signature(*text)
+        max((similarity(sig, other) for _, repo, other in signatures if repo == repository_id), default=0)
+    scan = (time.perf_counter() - started) / args.scan_lookups
+
+    del index, signatures
+    tracemalloc.start()
+    index = DuplicateIndex(max_reports=args.reports)
+    for report_id, text in enumerate(texts, start=1):
+        index.add(report_id, report_id % args.repositories, signature(*text))
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    stats = index.stats()
+    print(f"indexed {stats['reports']} reports in {build_seconds:.1f}s, {stats['buckets']} buckets")
+    print(f"{'LSH lookup':>12}: {lookup * 1e6:10.1f} us/submission ({found}/{len(queries)} flagged)")
+    print(f"{'linear scan':>12}: {scan * 1e6:10.1f} us/submission")
+    print(f"{'memory':>12}: {held / 2**20:10.1f} MiB held, {stats['approx_bytes'] / 2**20:.1f} MiB estimated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Bug report insert throughput under concurrent submitters.
+
+Starts --submitters threads at once against a fresh SQLite file, each filing
+--reports bug reports, first with one commit per report (what
+submit_bug_report does by default) and then through GroupCommitWriter, and
+reports throughput, latency percentiles and failed inserts:
+
+    python benchmarks/bench_group_commit.py --submitters 50 200 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from group_commit import GroupCommitWriter
+from models import db, BugReport
+
+
+def create_bench_app(path):
+    bench = Flask(__name__)
+    bench.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    bench.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(bench)
+    return bench
+
+
+def report_values(submitter, i):
+    return {
+        'title': f'Crash on launch {submitter}-{i}',
+        'description': 'Steps to reproduce: open the app. ' * 10,
+        'device_info': 'Browser: Firefox 128, OS: Linux, Screen: 1920x1080',
+        'client_ip': f'10.0.{submitter // 256}.{submitter % 256}',
+    }
+
+
+def commit_each(bench):
+    def insert(values):
+        with bench.app_context():
+            try:
+                report = BugReport(**values)
+                db.session.add(report)
+                db.session.commit()
+                return report.id
+            finally:
+                db.session.remove()
+    return insert
+
+
+def run(insert, submitters, reports):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(submitters + 1)
+
+    def submitter(n):
+        start.wait()
+        for i in range(reports):
+            started = time.perf_counter()
+            try:
+                insert(report_values(n, i))
+            except Exception as error:
+                with lock:
+                    errors.append(error)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=submitter, args=(n,)) for n in range(submitters)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else float('nan')
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else float('nan')
+    return len(latencies) / elapsed, p50, p99, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bug report group commit')
+    parser.add_argument('--submitters', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--reports', type=int, default=5, help='reports per submitter')
+    parser.add_argument('--delay-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    for submitters in args.submitters:
+        for label in ('commit per report', 'group commit'):
+            with tempfile.TemporaryDirectory() as tmp:
+                bench = create_bench_app(os.path.join(tmp, 'bench.db'))
+                with bench.app_context():
+                    db.create_all()
+                writer = None
+                if label == 'group commit':
+                    writer = GroupCommitWriter(bench, BugReport, max_delay=args.delay_ms / 1000)
+                    writer.start()
+                    insert = writer.insert
+                else:
+                    insert = commit_each(bench)
+                rate, p50, p99, errors = run(insert, submitters, args.reports)
+                if writer is not None:
+                    writer.stop()
+                with bench.app_context():
+                    db.engine.dispose()
+                print(f"{submitters:>5} submitters, {label:>17}: {rate:8.0f} reports/s "
+                      f"p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:8.1f} ms  errors {errors}")
+
+
+if __name__ == '__main__':
+    main()
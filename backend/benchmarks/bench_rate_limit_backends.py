@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Latency a rate-limit backend adds to each request.
+
+Starts --workers processes that each run --requests check + hit pairs over
+--keys client keys, against the in-process limiter and against the shared
+SQLite limiter, and reports per-request percentiles across all workers:
+
+    python benchmarks/bench_rate_limit_backends.py --workers 1 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import create_rate_limiter
+
+
+def worker(backend, keys, requests, seed, results):
+    limiter = create_rate_limiter(backend, 5, 3600, max_keys=keys)
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(requests):
+        key = f'10.0.{rng.randrange(keys)}'
+        started = time.perf_counter()
+        if not limiter.is_limited(key):
+            limiter.hit(key)
+        timings.append(time.perf_counter() - started)
+    results.put(timings)
+
+
+def run(backend, workers, keys, requests):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(backend, keys, requests, seed, results))
+        for seed in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    timings = []
+    for _ in processes:
+        timings.extend(results.get())
+    for process in processes:
+        process.join()
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rate-limit backends')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=20000, help='per worker')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            for label, backend in (('memory', 'memory'),
+                                   ('sqlite', f'sqlite:///{tmp}/ratelimit-{workers}.db')):
+                p50, p99 = run(backend, workers, args.keys, args.requests)
+                print(f"{label:>7} x{workers:<2}: p50 {p50 * 1e6:8.1f} us  p99 {p99 * 1e6:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
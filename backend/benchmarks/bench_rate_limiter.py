@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Cost of rate-limit checks as the number of tracked clients grows.
+
+Replays --keys distinct client keys through the old list-of-timestamps
+limiter and SlidingWindowRateLimiter, timing check + record per request and
+reporting the memory each holds afterwards:
+
+    python benchmarks/bench_rate_limiter.py --keys 1000000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import SlidingWindowRateLimiter
+
+
+class TimestampListLimiter:
+    """The previous submission_history approach, kept here for comparison"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.history = {}
+
+    def is_limited(self, key):
+        cutoff = time.time() - self.window
+        self.history[key] = [t for t in self.history.get(key, []) if t > cutoff]
+        return len(self.history[key]) >= self.limit
+
+    def hit(self, key):
+        self.history.setdefault(key, []).append(time.time())
+
+
+def replay(limiter, keys, repeats):
+    for _ in range(repeats):
+        for key in keys:
+            if not limiter.is_limited(key):
+                limiter.hit(key)
+
+
+def run(factory, keys, repeats):
+    """Time one replay, then repeat it under tracemalloc to see what is retained"""
+    started = time.perf_counter()
+    replay(factory(), keys, repeats)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    limiter = factory()
+    replay(limiter, keys, repeats)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed / (len(keys) * repeats), memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the bug report rate limiter')
+    parser.add_argument('--keys', type=int, default=1000000)
+    parser.add_argument('--repeats', type=int, default=2, help='requests per key')
+    parser.add_argument('--max-keys', type=int, default=100000, help='cap for SlidingWindowRateLimiter')
+    args = parser.parse_args()
+
+    keys = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}:{i >> 24}' for i in range(args.keys)]
+    results = [
+        ('timestamp lists', run(lambda: TimestampListLimiter(5, 3600), keys, args.repeats)),
+        (f'sliding window (cap {args.max_keys})', run(
+            lambda: SlidingWindowRateLimiter(5, 3600, max_keys=args.max_keys), keys, args.repeats)),
+        ('sliding window (uncapped)', run(
+            lambda: SlidingWindowRateLimiter(5, 3600, max_keys=args.keys), keys, args.repeats)),
+    ]
+    for label, (seconds, memory) in results:
+        print(f"{label:>32}: {seconds * 1e6:8.2f} us/request {memory / 2**20:10.1f} MiB held")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Query count and wall time for storing synced repositories.
+
+Compares the batched store_repository_page() against the old per-repository
+lookup, for a first sync (all inserts), a resync (all updates) and a reload
+of unchanged data, writing 100-repository pages and committing after each one
+like the real sync:
+
+    python benchmarks/bench_repository_sync.py --sizes 100 1000 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, User, Repository
+from repository_sync import REPOS_PER_PAGE, store_repository_page
+
+
+def store_repository_page_per_row(user_id, repos_data):
+    """The previous implementation: one SELECT per repository"""
+    for repo_data in repos_data:
+        repo = Repository.query.filter_by(github_id=repo_data['id']).first()
+        if not repo:
+            db.session.add(Repository(
+                github_id=repo_data['id'],
+                name=repo_data['name'],
+                full_name=repo_data['full_name'],
+                description=repo_data.get('description'),
+                html_url=repo_data['html_url'],
+                clone_url=repo_data.get('clone_url'),
+                language=repo_data.get('language'),
+                is_private=repo_data['private'],
+                user_id=user_id
+            ))
+        else:
+            repo.name = repo_data['name']
+            repo.full_name = repo_data['full_name']
+            repo.description = repo_data.get('description')
+            repo.html_url = repo_data['html_url']
+            repo.clone_url = repo_data.get('clone_url')
+            repo.language = repo_data.get('language')
+            repo.is_private = repo_data['private']
+
+
+def make_repos(count, generation=0):
+    return [{
+        'id': 100000 + i,
+        'name': f'repo-{i}',
+        'full_name': f'bench/repo-{i}',
+        'description': f'Benchmark repository {i} (generation {generation})',
+        'html_url': f'https://github.com/bench/repo-{i}',
+        'clone_url': f'https://github.com/bench/repo-{i}.git',
+        'language': 'Python',
+        'private': False,
+    } for i in range(count)]
+
+
+def create_bench_app(path):
+    bench = Flask(__name__)
+    bench.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    bench.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(bench)
+    return bench
+
+
+def run_sync(store, user_id, repos):
+    """Store repos page by page; returns (statements, seconds)"""
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith(('BEGIN', 'COMMIT')):
+            statements[0] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    started = time.perf_counter()
+    try:
+        for start in range(0, len(repos), REPOS_PER_PAGE):
+            store(user_id, repos[start:start + REPOS_PER_PAGE])
+            db.session.commit()
+    finally:
+        elapsed = time.perf_counter() - started
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return statements[0], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark repository page writes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    implementations = [('per-row', store_repository_page_per_row), ('batched', store_repository_page)]
+    print(f"{'repos':>7} {'implementation':>14} {'pass':>8} {'queries':>8} {'seconds':>8}")
+    for size in args.sizes:
+        for label, store in implementations:
+            with tempfile.TemporaryDirectory() as tmp:
+                bench = create_bench_app(os.path.join(tmp, 'bench.db'))
+                with bench.app_context():
+                    db.create_all()
+                    user = User(github_id=1, username='bench')
+                    db.session.add(user)
+                    db.session.commit()
+
+                    for run, repos in (('insert', make_repos(size)), ('update', make_repos(size, 1)),
+                                       ('reload', make_repos(size, 1))):
+                        queries, seconds = run_sync(store, user.id, repos)
+                        print(f"{size:>7} {label:>14} {run:>8} {queries:>8} {seconds:>8.3f}")
+                    db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
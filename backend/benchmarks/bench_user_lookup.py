@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Cost of resolving a session token to its User row.
+
+Seeds a SQLite database with --users users, then times random token lookups
+three ways: the old filter on the unindexed access_token column, the indexed
+access_token_hash column, and user_for_token() with its LRU warm:
+
+    python benchmarks/bench_user_lookup.py --users 100000 --lookups 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import insert
+
+from github_cache import hash_token
+from models import db, User
+from user_lookup import user_for_token, token_users
+
+
+def create_bench_app(path):
+    bench = Flask(__name__)
+    bench.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    bench.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(bench)
+    return bench
+
+
+def seed_users(count, batch=10000):
+    for start in range(0, count, batch):
+        rows = []
+        for i in range(start, min(count, start + batch)):
+            token = f'gho_bench_{i:08d}'
+            rows.append({
+                'github_id': i + 1,
+                'username': f'user-{i}',
+                'access_token': token,
+                'access_token_hash': hash_token(token),
+            })
+        db.session.execute(insert(User), rows)
+        db.session.commit()
+
+
+def time_lookups(lookup, tokens):
+    started = time.perf_counter()
+    for token in tokens:
+        user = lookup(token)
+        assert user is not None
+        db.session.expunge_all()  # measure the database, not the identity map
+    return (time.perf_counter() - started) / len(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark token -> user lookups')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--scan-lookups', type=int, default=200,
+                        help='lookups for the unindexed scan, which is much slower')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bench = create_bench_app(os.path.join(tmp, 'bench.db'))
+        with bench.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            seed_users(args.users)
+            print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+            tokens = [f'gho_bench_{random.randrange(args.users):08d}' for _ in range(args.lookups)]
+            results = [
+                ('access_token scan', time_lookups(
+                    lambda token: User.query.filter_by(access_token=token).first(), tokens[:args.scan_lookups])),
+                ('access_token_hash index', time_lookups(
+                    lambda token: User.query.filter_by(access_token_hash=hash_token(token)).first(), tokens)),
+            ]
+            token_users.clear()
+            for token in tokens:
+                user_for_token(token)
+            db.session.expunge_all()
+            results.append(('user_for_token (warm LRU)', time_lookups(user_for_token, tokens)))
+
+            for label, seconds in results:
+                print(f"{label:>28}: {seconds * 1e6:10.1f} us/lookup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency load test for the GitHub-backed endpoints.
+
+Start the fake GitHub server and the backend pointed at it, then run:
+
+    python fake_github_server.py --port 5001 --repos 500 --latency-ms 80 --distinct-users &
+    FAKE_GITHUB_URL=http://127.0.0.1:5001 flask run --port 5000 &
+    python benchmarks/load_test.py --target http://127.0.0.1:5000 --users 50 --duration 30
+
+Each virtual user logs in through the OAuth callback (the fake server accepts
+any code) and then loops over the endpoints, reporting requests per second
+and latency percentiles per endpoint.
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_PATHS = ['/api/user', '/me', '/api/repositories']
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def virtual_user(user_index, target, paths, deadline, results, lock):
+    session = requests.Session()
+    login = session.get(f"{target}/github/callback", params={'code': f'load-test-{user_index}'},
+                        allow_redirects=False, timeout=30)
+    if login.status_code != 302 or 'error' in login.headers.get('Location', ''):
+        with lock:
+            results.setdefault('login_failures', []).append(user_index)
+        return
+
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = session.get(f"{target}{path}", allow_redirects=False, timeout=30)
+            status = response.status_code
+        except requests.RequestException:
+            status = 'error'
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            results.setdefault(path, []).append((elapsed_ms, status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--target', default='http://127.0.0.1:5000')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds')
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    args = parser.parse_args()
+
+    results = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for user_index in range(args.users):
+            pool.submit(virtual_user, user_index, args.target, args.paths, deadline, results, lock)
+    elapsed = time.monotonic() - started
+
+    failures = results.pop('login_failures', [])
+    if failures:
+        print(f"{len(failures)} virtual users failed to log in")
+
+    print(f"{'endpoint':<22}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'non-2xx':>10}")
+    for path in args.paths:
+        samples = results.get(path, [])
+        latencies = [ms for ms, _ in samples]
+        errors = sum(1 for _, status in samples if status == 'error' or not 200 <= status < 400)
+        print(f"{path:<22}{len(samples):>10}{len(samples) / elapsed:>10.1f}"
+              f"{percentile(latencies, 50):>10.1f}{percentile(latencies, 95):>10.1f}"
+              f"{percentile(latencies, 99):>10.1f}{errors:>10}")
+    all_latencies = [ms for samples in results.values() for ms, _ in samples]
+    if all_latencies:
+        print(f"total {len(all_latencies)} requests, {len(all_latencies) / elapsed:.1f} rps, "
+              f"mean {statistics.mean(all_latencies):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
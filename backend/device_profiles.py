@@ -0,0 +1,202 @@
+"""
+Dictionary encoding of bug report device info.
+
+The frontend sends the same user agent, platform, language and screen sizes
+with every report from a device, plus a timestamp. encode_device_info() splits
+a submission into its stable attributes, stored once as a DeviceProfile row
+keyed by their SHA-256, and the few per-report values (timestamps), which stay
+on the report as a short JSON list recording where they go back. The profile
+also holds browser, OS and version columns parsed from the user agent or
+platform, indexed so that "Safari 17 on iOS" is a lookup rather than a LIKE
+over every report's text. A bounded LRU maps fingerprints to profile ids, so
+a known device costs no query at all.
+
+Three formats are understood: a JSON object (what the frontend posts), the
+"Key: value" lines the form displays, and anything else as one raw string.
+BugReport.device_info renders the text back in the submitted format.
+"""
+import hashlib
+import json
+import os
+import re
+
+from sqlalchemy.exc import IntegrityError
+
+from cache_utils import LRUCache
+from models import db, DeviceProfile
+
+device_profile_ids = LRUCache(maxsize=int(os.environ.get('DEVICE_PROFILE_CACHE_SIZE', 10000)))
+
+# Keys whose value changes with every report rather than with the device
+VOLATILE_KEYS = {'timestamp', 'time', 'date', 'datetime', 'submittedat', 'reportedat'}
+
+USER_AGENT_KEYS = ('useragent', 'ua', 'browser')
+FIELD_KEYS = {
+    'platform': ('platform', 'os'),
+    'language': ('language', 'lang', 'locale'),
+    'screen_resolution': ('screenresolution', 'screen', 'resolution'),
+    'viewport': ('viewport', 'window'),
+}
+
+TEXT_LINE = re.compile(r'^([A-Za-z][\w ./()-]{0,39}):[ \t]*(.*)$')
+
+BROWSERS = (
+    ('Edge', re.compile(r'Edg(?:e|A|iOS)?/([\d.]+)')),
+    ('Opera', re.compile(r'(?:OPR|Opera)/([\d.]+)')),
+    ('Samsung Internet', re.compile(r'SamsungBrowser/([\d.]+)')),
+    ('Firefox', re.compile(r'(?:Firefox|FxiOS)/([\d.]+)')),
+    ('Chrome', re.compile(r'(?:Chrome|CriOS)/([\d.]+)')),
+    ('Safari', re.compile(r'Version/([\d.]+)(?: Mobile/\S+)? Safari/')),
+    ('Safari', re.compile(r'AppleWebKit/.* Safari/()')),
+    ('Internet Explorer', re.compile(r'(?:MSIE |Trident/.*rv:)([\d.]+)')),
+)
+BROWSER_NAME = re.compile(
+    r'^(?:Mobile )?(Safari|Chrome|Firefox|Edge|Opera|Samsung Internet)\b[ /v]*([\d.]+)?', re.IGNORECASE)
+
+OPERATING_SYSTEMS = (
+    ('iOS', re.compile(r'(?:iPhone|CPU) OS (\d+(?:_\d+)*)')),
+    ('Android', re.compile(r'Android (\d+(?:\.\d+)*)')),
+    ('Windows', re.compile(r'Windows NT (\d+\.\d+)')),
+    ('ChromeOS', re.compile(r'CrOS \S+ ([\d.]+)')),
+    ('macOS', re.compile(r'Mac OS X (\d+(?:[_.]\d+)*)')),
+    ('Linux', re.compile(r'Linux()')),
+)
+OS_NAME = re.compile(
+    r'^(iOS|iPadOS|Android|Windows|macOS|Mac OS X|ChromeOS|Linux|Ubuntu)\b[ v]*([\d.]+)?', re.IGNORECASE)
+PLATFORM_OS = (('win', 'Windows'), ('mac', 'macOS'), ('iphone', 'iOS'), ('ipad', 'iOS'),
+               ('ipod', 'iOS'), ('android', 'Android'), ('cros', 'ChromeOS'), ('linux', 'Linux'))
+WINDOWS_VERSIONS = {'10.0': '10', '6.3': '8.1', '6.2': '8', '6.1': '7', '6.0': 'Vista'}
+CANONICAL_OS = {name.lower(): name for name in ('iOS', 'Android', 'Windows', 'macOS', 'ChromeOS', 'Linux')}
+CANONICAL_OS.update({'ipados': 'iOS', 'mac os x': 'macOS', 'ubuntu': 'Linux'})
+
+
+def _normal_key(key):
+    return re.sub(r'[^a-z]', '', key.lower())
+
+
+def _major(version):
+    head = (version or '').split('.')[0]
+    return int(head) if head.isdigit() else None
+
+
+def parse_device_info(value):
+    """(format, stable [key, value] pairs, per-report [position, key, value] list)"""
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith('{'):
+            try:
+                decoded = json.loads(text)
+            except ValueError:
+                decoded = None
+            if isinstance(decoded, dict):
+                value = decoded
+    if isinstance(value, dict):
+        format, pairs = 'json', [[str(key), item] for key, item in value.items()]
+    else:
+        text = value if isinstance(value, str) else json.dumps(value)
+        matches = [TEXT_LINE.match(line.rstrip('\r')) for line in text.strip().splitlines() if line.strip()]
+        if matches and all(matches):
+            format, pairs = 'text', [[match.group(1), match.group(2)] for match in matches]
+        else:
+            return 'raw', [['', text]], []
+    stable, volatile = [], []
+    for position, (key, item) in enumerate(pairs):
+        if _normal_key(key) in VOLATILE_KEYS:
+            volatile.append([position, key, item])
+        else:
+            stable.append([key, item])
+    return format, stable, volatile
+
+
+def parse_user_agent(user_agent):
+    """{'browser', 'browser_version', 'os', 'os_version'} found in a user agent or browser name"""
+    fields = dict.fromkeys(('browser', 'browser_version', 'os', 'os_version'))
+    for name, pattern in BROWSERS:
+        match = pattern.search(user_agent)
+        if match:
+            fields['browser'], fields['browser_version'] = name, match.group(1) or None
+            break
+    else:
+        match = BROWSER_NAME.match(user_agent)
+        if match:
+            name = match.group(1).lower()
+            fields['browser'] = 'Samsung Internet' if name == 'samsung internet' else name.capitalize()
+            fields['browser_version'] = match.group(2)
+    for name, pattern in OPERATING_SYSTEMS:
+        match = pattern.search(user_agent)
+        if match:
+            version = match.group(1).replace('_', '.') or None
+            fields['os'] = name
+            fields['os_version'] = WINDOWS_VERSIONS.get(version, version) if name == 'Windows' else version
+            break
+    return fields
+
+
+def parse_platform(platform):
+    """(os, os_version) named by a platform string such as 'iOS 15.6' or 'Win32'"""
+    match = OS_NAME.match(platform)
+    if match:
+        return CANONICAL_OS[match.group(1).lower()], match.group(2)
+    lowered = platform.lower()
+    for prefix, name in PLATFORM_OS:
+        if lowered.startswith(prefix):
+            return name, None
+    return None, None
+
+
+def describe(format, pairs):
+    """Structured DeviceProfile columns for a set of stable pairs"""
+    values = {_normal_key(key): item for key, item in pairs if isinstance(item, str)}
+    if format == 'raw':
+        user_agent = pairs[0][1]
+    else:
+        user_agent = next((values[key] for key in USER_AGENT_KEYS if values.get(key)), '')
+    fields = parse_user_agent(user_agent)
+    for column, keys in FIELD_KEYS.items():
+        fields[column] = next((values[key] for key in keys if values.get(key)), None)
+    if fields['os'] is None and fields['platform']:
+        fields['os'], fields['os_version'] = parse_platform(fields['platform'])
+    fields['browser_major'] = _major(fields['browser_version'])
+    fields['os_major'] = _major(fields['os_version'])
+    for column in ('browser_version', 'os_version'):
+        fields[column] = fields[column][:40] if fields[column] else None
+    for column, size in (('platform', 80), ('language', 35), ('screen_resolution', 20), ('viewport', 20)):
+        fields[column] = fields[column][:size] if fields[column] else None
+    return fields
+
+
+def device_profile_id(format, pairs):
+    """Id of the DeviceProfile for these stable pairs, created (and committed) if new"""
+    attributes = json.dumps(pairs, separators=(',', ':'))
+    fingerprint = hashlib.sha256(f'{format}\n{attributes}'.encode('utf-8')).hexdigest()
+    profile_id = device_profile_ids.get(fingerprint)
+    if profile_id is not None:
+        return profile_id
+
+    profile_id = db.session.query(DeviceProfile.id).filter_by(fingerprint=fingerprint).scalar()
+    if profile_id is None:
+        profile = DeviceProfile(fingerprint=fingerprint, format=format, attributes=attributes,
+                                **describe(format, pairs))
+        try:
+            with db.session.begin_nested():
+                db.session.add(profile)
+            profile_id = profile.id
+            # Committed now so a group-commit writer on another connection can refer to it
+            db.session.commit()
+        except IntegrityError:
+            # Another worker stored the same device first
+            db.session.rollback()
+            profile_id = db.session.query(DeviceProfile.id).filter_by(fingerprint=fingerprint).scalar()
+    device_profile_ids.set(fingerprint, profile_id)
+    return profile_id
+
+
+def encode_device_info(value):
+    """BugReport column values for submitted device info (a string or a JSON object)"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return {'device_profile_id': None, 'device_details': None}
+    format, pairs, volatile = parse_device_info(value)
+    return {
+        'device_profile_id': device_profile_id(format, pairs),
+        'device_details': json.dumps(volatile, separators=(',', ':')) if volatile else None,
+    }
@@ -0,0 +1,284 @@
+"""
+Near-duplicate detection for bug reports.
+
+Each report's title and description are reduced to word and word-pair
+shingles and summarised in a 64-slot MinHash signature, computed with one
+hash per shingle (one-permutation hashing, with empty slots filled from their
+neighbour) so signing a report costs microseconds rather than 64 hashes per
+shingle. Signatures are split into 16 bands of 4 slots; reports whose
+signatures agree on any whole band share an LSH bucket, and only those
+candidates are compared slot by slot to estimate Jaccard similarity. Buckets
+are keyed by repository, so a report is only ever matched against reports
+for the same repository.
+
+The index lives in memory: it is rebuilt from the most recent `max_reports`
+reports at startup, grows as reports are filed, and forgets the oldest
+report once full. Each bucket keeps only its most recent `max_bucket` ids, so
+a phrase every report shares cannot make lookups slow. Signatures are kept as
+bytes and a bucket holding a single report stores its bare id, which keeps an
+indexed report to about 2KB.
+
+Each worker process holds its own index. After the startup rebuild a
+background thread reads, every `refresh_interval` seconds, the reports
+committed since the newest one it has seen, so a report filed through
+another worker is matched within that interval. SQLite commits one writer
+at a time, so ids commit in order and "newer than the last id read" misses
+nothing. Deletions made through another worker are not picked up; those
+reports stay matchable in this worker until it restarts.
+"""
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, BugReport
+
+SLOTS = 64
+ROWS_PER_BAND = 4
+BANDS = SLOTS // ROWS_PER_BAND
+BAND_BYTES = 4 * ROWS_PER_BAND
+EMPTY = 0xffffffff
+MAX_TEXT = 4000  # characters of description considered
+
+WORD = re.compile(r'\w+')
+
+
+def shingles(title, description):
+    """Words and adjacent word pairs of the normalised report text"""
+    words = WORD.findall(f"{title or ''} {(description or '')[:MAX_TEXT]}".lower())
+    result = set(words)
+    result.update(f'{first} {second}' for first, second in zip(words, words[1:]))
+    return result
+
+
+def signature(title, description):
+    """64-slot MinHash of a report's text as bytes, or None if it has no words"""
+    slots = [EMPTY] * SLOTS
+    for shingle in shingles(title, description):
+        value = hash(shingle) & 0xffffffffffffffff
+        slot, value = value % SLOTS, (value >> 6) & 0xfffffffe
+        if value < slots[slot]:
+            slots[slot] = value
+    filled = [slot for slot in range(SLOTS) if slots[slot] != EMPTY]
+    if not filled:
+        return None
+    if len(filled) < SLOTS:
+        # Densify: an empty slot borrows the next filled slot to its right,
+        # tagged with the distance so borrowed and native values differ
+        dense = list(slots)
+        for slot in range(SLOTS):
+            if slots[slot] == EMPTY:
+                offset = 1
+                while slots[(slot + offset) % SLOTS] == EMPTY:
+                    offset += 1
+                dense[slot] = (slots[(slot + offset) % SLOTS] + offset) & 0xfffffffe | 1
+        slots = dense
+    return array('I', slots).tobytes()
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    first, second = array('I', first), array('I', second)
+    return sum(1 for a, b in zip(first, second) if a == b) / SLOTS
+
+
+def band_keys(repository_id, sig):
+    """One bucket key per band, covering the repository and the band's slots"""
+    return [hash((repository_id, band, sig[band * BAND_BYTES:(band + 1) * BAND_BYTES]))
+            for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    """Bounded MinHash/LSH index of recent bug reports, per repository"""
+
+    def __init__(self, threshold=0.5, max_reports=50000, max_bucket=64, refresh_interval=2.0):
+        self.threshold = threshold
+        self.max_reports = max_reports
+        self.max_bucket = max_bucket
+        self.refresh_interval = refresh_interval
+        self._last_read_id = 0  # newest report id read from the database
+        self._lock = threading.Lock()
+        self._reports = OrderedDict()  # report id -> (repository id, signature), oldest first
+        self._buckets = {}  # band key -> report id, or a list of ids once shared
+        self._loader = None
+        self.lookups = 0
+        self.matches = 0
+        self.evictions = 0
+
+    def _remove(self, report_id):
+        entry = self._reports.pop(report_id, None)
+        if entry is None:
+            return
+        for key in band_keys(*entry):
+            bucket = self._buckets.get(key)
+            if bucket == report_id:
+                del self._buckets[key]
+            elif isinstance(bucket, list) and report_id in bucket:
+                bucket.remove(report_id)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket[0]
+
+    def add(self, report_id, repository_id, sig):
+        """Index a stored report's signature"""
+        if sig is None:
+            return
+        with self._lock:
+            if report_id in self._reports:
+                return
+            self._reports[report_id] = (repository_id, sig)
+            for key in band_keys(repository_id, sig):
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    self._buckets[key] = report_id
+                elif isinstance(bucket, list):
+                    bucket.append(report_id)
+                    if len(bucket) > self.max_bucket:
+                        del bucket[0]
+                else:
+                    self._buckets[key] = [bucket, report_id]
+            while len(self._reports) > self.max_reports:
+                self._remove(next(iter(self._reports)))
+                self.evictions += 1
+
+    def remove(self, report_id):
+        with self._lock:
+            self._remove(report_id)
+
+    def find(self, repository_id, sig):
+        """(report id, similarity) of the closest indexed report at or above the threshold"""
+        if sig is None:
+            return None
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for key in band_keys(repository_id, sig):
+                bucket = self._buckets.get(key)
+                if isinstance(bucket, list):
+                    candidates.update(bucket)
+                elif bucket is not None:
+                    candidates.add(bucket)
+            best = None
+            mine = array('I', sig)
+            for candidate in candidates:
+                other = array('I', self._reports[candidate][1])
+                score = sum(1 for a, b in zip(mine, other) if a == b) / SLOTS
+                if score >= self.threshold and (best is None or (score, candidate) > (best[1], best[0])):
+                    best = (candidate, score)
+            if best is not None:
+                self.matches += 1
+            return best
+
+    def rebuild(self, batch_size=1000):
+        """Reload the index from the most recent reports in the database"""
+        rows = (
+            db.session.query(BugReport.id, BugReport.repository_id, BugReport.title, BugReport.description)
+            .order_by(BugReport.id.desc())
+            .limit(self.max_reports)
+            .yield_per(batch_size)
+        )
+        loaded = [(row.id, row.repository_id, signature(row.title, row.description)) for row in rows]
+        for report_id, repository_id, sig in reversed(loaded):
+            self.add(report_id, repository_id, sig)
+        if loaded:
+            self._last_read_id = max(self._last_read_id, loaded[0][0])
+        return len(loaded)
+
+    def refresh(self, batch_size=1000):
+        """Index reports committed since the last read, including other workers'; returns how many"""
+        rows = (
+            db.session.query(BugReport.id, BugReport.repository_id, BugReport.title, BugReport.description)
+            .filter(BugReport.id > self._last_read_id)
+            .order_by(BugReport.id)
+            .limit(self.max_reports)
+            .yield_per(batch_size)
+        )
+        count = 0
+        for row in rows:
+            self.add(row.id, row.repository_id, signature(row.title, row.description))
+            self._last_read_id = row.id
+            count += 1
+        return count
+
+    def _load(self, app):
+        with app.app_context():
+            try:
+                count = self.rebuild()
+                app.logger.info("Duplicate index loaded %d bug reports", count)
+            except Exception:
+                app.logger.exception("Could not rebuild the duplicate index")
+            finally:
+                db.session.remove()
+            while self.refresh_interval > 0:
+                time.sleep(self.refresh_interval)
+                try:
+                    self.refresh()
+                except Exception:
+                    app.logger.exception("Could not refresh the duplicate index")
+                finally:
+                    db.session.remove()
+
+    def start(self, app):
+        """Rebuild from the database, then keep refreshing, on a background thread"""
+        with self._lock:
+            if self._loader is not None:
+                return
+            self._loader = threading.Thread(target=self._load, args=(app,), name='duplicate-index', daemon=True)
+            self._loader.start()
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+            self._buckets.clear()
+            self._last_read_id = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._reports)
+
+    def stats(self):
+        with self._lock:
+            reports = len(self._reports)
+            buckets = len(self._buckets)
+            shared = [bucket for bucket in self._buckets.values() if isinstance(bucket, list)]
+            bucket_entries = buckets - len(shared) + sum(len(bucket) for bucket in shared)
+            tables = sys.getsizeof(self._reports) + sys.getsizeof(self._buckets)
+            lookups, matches, evictions = self.lookups, self.matches, self.evictions
+        # Hash tables, plus per report its signature bytes, tuple and id, per
+        # bucket its int key, and the lists of shared buckets
+        approx_bytes = (tables + reports * (4 * SLOTS + 33 + 56 + 28) + buckets * 32
+                        + sum(sys.getsizeof(bucket) for bucket in shared))
+        return {
+            'reports': reports,
+            'max_reports': self.max_reports,
+            'buckets': buckets,
+            'bucket_entries': bucket_entries,
+            'approx_bytes': approx_bytes,
+            'threshold': self.threshold,
+            'lookups': lookups,
+            'matches': matches,
+            'evictions': evictions,
+        }
+
+
+def watch_deleted_reports(index):
+    """Drop deleted bug reports from the index once their deletion commits"""
+
+    @event.listens_for(Session, 'after_flush')
+    def collect_deleted(session, flush_context):
+        ids = [obj.id for obj in session.deleted if isinstance(obj, BugReport)]
+        if ids:
+            session.info.setdefault('deleted_bug_reports', set()).update(ids)
+
+    @event.listens_for(Session, 'after_commit')
+    def remove_after_commit(session):
+        for report_id in session.info.pop('deleted_bug_reports', ()):
+            index.remove(report_id)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def forget_deleted(session, previous_transaction):
+        session.info.pop('deleted_bug_reports', None)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the parts of GitHub that AlphaTest talks to.
+
+Serves the OAuth token exchange, /user and a paginated /user/repos from the
+recorded fixtures in fixtures/github, with ETags, per-token rate-limit headers
+and configurable latency and error injection, so the backend can be load
+tested without touching real GitHub.
+
+Run it and point the backend at it:
+
+    python fake_github_server.py --port 5001 --repos 2500 --latency-ms 80 --distinct-users
+    FAKE_GITHUB_URL=http://127.0.0.1:5001 flask run
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlencode
+
+from flask import Flask, request, jsonify, redirect, Response
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'github')
+
+
+class FakeGitHubConfig:
+    """Runtime knobs; all of them can be changed through POST /_fake/config"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=502,
+                 rate_limit=5000, rate_limit_window=3600, repo_count=None, default_per_page=30,
+                 distinct_users=False):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.repo_count = repo_count
+        self.default_per_page = default_per_page
+        # Give every token its own user and repository ids, like real GitHub
+        # accounts, instead of serving the recorded identity to everyone
+        self.distinct_users = distinct_users
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def load_fixture(name, fixtures_dir=FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, name)) as fixture:
+        return json.load(fixture)
+
+
+def expand_repos(templates, count):
+    """Clone the recorded repos until there are `count` of them, with unique ids and names"""
+    if count is None:
+        return list(templates)
+    repos = list(templates[:count])
+    for i in range(len(templates), count):
+        template = templates[i % len(templates)]
+        repo = copy.deepcopy(template)
+        repo['id'] = template['id'] + i * 1000
+        repo['name'] = f"{template['name']}-{i}"
+        repo['full_name'] = f"{template['owner']['login']}/{repo['name']}"
+        repo['html_url'] = f"https://github.com/{repo['full_name']}"
+        repo['clone_url'] = f"https://github.com/{repo['full_name']}.git"
+        repos.append(repo)
+    return repos
+
+
+def personalize(user, repos, token):
+    """Derive a stable per-token identity from the recorded user and repos"""
+    index = int(hashlib.sha1(token.encode('utf-8')).hexdigest()[:6], 16) + 1
+    login = f"{user['login']}-{index}"
+    user = dict(user, id=user['id'] + index, login=login, email=f"{login}@example.com")
+    personal = []
+    for repo in repos:
+        name = repo['name']
+        full_name = f"{login}/{name}"
+        personal.append(dict(
+            repo,
+            id=repo['id'] + index * 10_000_000,
+            full_name=full_name,
+            owner=dict(repo['owner'], login=login, id=user['id']),
+            html_url=f"https://github.com/{full_name}",
+            clone_url=f"https://github.com/{full_name}.git",
+        ))
+    return user, personal
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def create_fake_github(config=None, fixtures_dir=FIXTURES_DIR):
+    """Build the fake GitHub Flask app"""
+    config = config or FakeGitHubConfig()
+    fake = Flask(__name__)
+    fake.config['FAKE_GITHUB'] = config
+
+    user = load_fixture('user.json', fixtures_dir)
+    repo_templates = load_fixture('repos.json', fixtures_dir)
+    state = {
+        'repos': expand_repos(repo_templates, config.repo_count),
+        'budgets': {},  # token -> [remaining, reset_at]
+        'requests': {},
+        'injected_errors': 0,
+    }
+    lock = threading.Lock()
+
+    def count_request():
+        with lock:
+            state['requests'][request.path] = state['requests'].get(request.path, 0) + 1
+
+    def simulate_latency():
+        delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def inject_error():
+        if config.error_rate and random.random() < config.error_rate:
+            with lock:
+                state['injected_errors'] += 1
+            return jsonify({'message': 'Injected failure'}), config.error_status
+        return None
+
+    def request_token():
+        header = request.headers.get('Authorization', '')
+        scheme, _, token = header.partition(' ')
+        if scheme.lower() in ('token', 'bearer') and token:
+            return token
+        return None
+
+    def spend_budget(token, charge=True):
+        """Return (remaining, reset_at) after charging one call to the token"""
+        now = int(time.time())
+        with lock:
+            budget = state['budgets'].get(token)
+            if budget is None or budget[1] <= now:
+                budget = state['budgets'][token] = [config.rate_limit, now + config.rate_limit_window]
+            if charge and budget[0] > 0:
+                budget[0] -= 1
+            return budget[0], budget[1]
+
+    def rate_limit_headers(remaining, reset_at):
+        return {
+            'X-RateLimit-Limit': str(config.rate_limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset_at),
+            'X-RateLimit-Used': str(config.rate_limit - remaining),
+            'X-RateLimit-Resource': 'core',
+        }
+
+    def api_response(payload, extra_headers=None):
+        """Authenticated JSON response with ETag, 304 and rate-limit handling"""
+        token = request_token()
+        if token is None:
+            return jsonify({'message': 'Requires authentication'}), 401
+
+        body = json.dumps(payload).encode('utf-8')
+        etag = make_etag(body)
+        not_modified = request.headers.get('If-None-Match') == etag
+
+        with lock:
+            budget = state['budgets'].get(token)
+            exhausted = budget is not None and budget[0] <= 0 and budget[1] > time.time()
+        if exhausted and not not_modified:
+            remaining, reset_at = spend_budget(token, charge=False)
+            response = jsonify({'message': 'API rate limit exceeded'})
+            response.status_code = 403
+            response.headers.update(rate_limit_headers(remaining, reset_at))
+            return response
+
+        # Conditional requests answered with 304 do not count against the limit
+        remaining, reset_at = spend_budget(token, charge=not not_modified)
+        headers = rate_limit_headers(remaining, reset_at)
+        headers['ETag'] = etag
+        headers.update(extra_headers or {})
+        if not_modified:
+            return Response(status=304, headers=headers)
+        return Response(body, status=200, mimetype='application/json', headers=headers)
+
+    @fake.before_request
+    def before():
+        if request.path.startswith('/_fake/'):
+            return None
+        count_request()
+        simulate_latency()
+        return inject_error()
+
+    @fake.route('/login/oauth/authorize')
+    def authorize():
+        redirect_uri = request.args.get('redirect_uri')
+        if not redirect_uri:
+            return jsonify({'error': 'redirect_uri is required'}), 400
+        code = hashlib.sha1(str(random.random()).encode()).hexdigest()[:20]
+        params = {'code': code}
+        if request.args.get('state'):
+            params['state'] = request.args['state']
+        return redirect(f"{redirect_uri}?{urlencode(params)}")
+
+    @fake.route('/login/oauth/access_token', methods=['POST'])
+    def access_token():
+        code = request.form.get('code') or (request.get_json(silent=True) or {}).get('code')
+        if not code:
+            return jsonify({'error': 'bad_verification_code'}), 200
+        return jsonify({
+            'access_token': 'gho_fake_' + hashlib.sha1(code.encode()).hexdigest()[:30],
+            'token_type': 'bearer',
+            'scope': 'repo'
+        })
+
+    def identity():
+        token = request_token()
+        if config.distinct_users and token:
+            return personalize(user, state['repos'], token)
+        return user, state['repos']
+
+    @fake.route('/user')
+    def get_user():
+        return api_response(identity()[0])
+
+    @fake.route('/user/repos')
+    def get_repos():
+        repos = identity()[1]
+        per_page = min(max(request.args.get('per_page', config.default_per_page, type=int), 1), 100)
+        page = max(request.args.get('page', 1, type=int), 1)
+        last_page = max(1, -(-len(repos) // per_page))
+        start = (page - 1) * per_page
+        payload = repos[start:start + per_page]
+
+        links = []
+        base_args = {k: v for k, v in request.args.items() if k != 'page'}
+
+        def page_url(number):
+            return f"{request.base_url}?{urlencode(dict(base_args, page=number))}"
+
+        if page < last_page:
+            links.append(f'<{page_url(page + 1)}>; rel="next"')
+            links.append(f'<{page_url(last_page)}>; rel="last"')
+        if page > 1:
+            links.append(f'<{page_url(1)}>; rel="first"')
+            links.append(f'<{page_url(page - 1)}>; rel="prev"')
+        return api_response(payload, {'Link': ', '.join(links)} if links else None)
+
+    @fake.route('/rate_limit')
+    def get_rate_limit():
+        token = request_token()
+        if token is None:
+            return jsonify({'message': 'Requires authentication'}), 401
+        remaining, reset_at = spend_budget(token, charge=False)
+        core = {'limit': config.rate_limit, 'remaining': remaining, 'reset': reset_at,
+                'used': config.rate_limit - remaining}
+        return jsonify({'resources': {'core': core}, 'rate': core})
+
+    @fake.route('/_fake/config', methods=['GET', 'POST'])
+    def fake_config():
+        if request.method == 'POST':
+            updates = request.get_json(silent=True) or {}
+            for key, value in updates.items():
+                if hasattr(config, key):
+                    setattr(config, key, value)
+            if 'repo_count' in updates:
+                with lock:
+                    state['repos'] = expand_repos(repo_templates, config.repo_count)
+            if updates.get('reset_budgets'):
+                with lock:
+                    state['budgets'].clear()
+        return jsonify(config.as_dict())
+
+    @fake.route('/_fake/stats')
+    def fake_stats():
+        with lock:
+            return jsonify({
+                'requests': dict(state['requests']),
+                'injected_errors': state['injected_errors'],
+                'repos': len(state['repos']),
+                'tokens': len(state['budgets']),
+            })
+
+    return fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local fake GitHub API for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='directory with user.json and repos.json')
+    parser.add_argument('--repos', type=int, default=None, help='number of repositories to serve')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=502)
+    parser.add_argument('--rate-limit', type=int, default=5000)
+    parser.add_argument('--distinct-users', action='store_true',
+                        help='serve a different user and repo set for every token')
+    args = parser.parse_args()
+
+    config = FakeGitHubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit=args.rate_limit,
+        repo_count=args.repos,
+        distinct_users=args.distinct_users,
+    )
+    fake = create_fake_github(config, args.fixtures)
+    print(f"Fake GitHub listening on http://{args.host}:{args.port}")
+    fake.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Conditional-request cache for GitHub API responses.
+
+Bodies are stored together with their ETag/Last-Modified validators, keyed by
+(token hash, URL). A cached entry is revalidated with If-None-Match /
+If-Modified-Since; GitHub answers unchanged documents with a 304 that does not
+count against the rate limit, and the stored body is served instead.
+"""
+import hashlib
+import json
+import threading
+
+from cache_utils import LRUCache
+
+
+def hash_token(token):
+    """Stable, non-reversible key for an access token"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest() if token else ''
+
+
+class CachedResponse:
+    """Response-like view over a cached GitHub document"""
+
+    from_cache = True
+
+    def __init__(self, content, headers, status_code=200):
+        self.content = content
+        self.headers = headers
+        self.status_code = status_code
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class CacheEntry:
+    __slots__ = ('content', 'headers', 'etag', 'last_modified')
+
+    def __init__(self, content, headers, etag=None, last_modified=None):
+        self.content = content
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self, fresh_headers=None):
+        headers = dict(self.headers)
+        if fresh_headers:
+            # Rate-limit counters on the 304 are newer than the stored ones
+            headers.update({k: v for k, v in fresh_headers.items() if isinstance(v, str)})
+        return CachedResponse(self.content, headers)
+
+
+class ResponseCache:
+    """Bounded LRU of GitHub response bodies and their validators"""
+
+    def __init__(self, maxsize=1024, max_entry_bytes=1024 * 1024):
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.revalidated = 0
+        self.stored = 0
+
+    @staticmethod
+    def key(token, url):
+        return (hash_token(token), url)
+
+    def get(self, token, url):
+        return self._entries.get(self.key(token, url))
+
+    def store(self, token, url, response):
+        """Remember a 200 response if it carries a validator; returns True when stored"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        etag = etag if isinstance(etag, str) else None
+        last_modified = last_modified if isinstance(last_modified, str) else None
+        content = response.content
+        if not (etag or last_modified) or not isinstance(content, (bytes, bytearray)):
+            return False
+        if len(content) > self.max_entry_bytes:
+            return False
+        headers = {k: v for k, v in response.headers.items() if isinstance(v, str)}
+        self._entries.set(self.key(token, url), CacheEntry(bytes(content), headers, etag, last_modified))
+        with self._lock:
+            self.stored += 1
+        return True
+
+    def record_revalidation(self):
+        with self._lock:
+            self.revalidated += 1
+
+    def invalidate(self, token, url=None):
+        """Drop one URL, or every entry for the token when url is None"""
+        if url is not None:
+            self._entries.pop(self.key(token, url))
+            return
+        token_key = hash_token(token)
+        for key in [k for k in self._entries.keys() if k[0] == token_key]:
+            self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        stats = self._entries.stats()
+        with self._lock:
+            stats['stored'] = self.stored
+            stats['revalidated'] = self.revalidated
+        return stats
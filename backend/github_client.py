@@ -0,0 +1,333 @@
+"""
+Pooled HTTP client for the GitHub API.
+
+Every GitHub-backed route goes through one GitHubClient per process instead of
+calling `requests` directly, so connections are kept alive between requests,
+every call has a connect/read timeout, transient failures are retried with
+jittered backoff and per-endpoint latency is recorded. GET responses are
+revalidated through the conditional-request cache in github_cache, and every
+authenticated call is admitted by the per-token budget in github_ratelimit.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from github_cache import ResponseCache
+from github_ratelimit import RateLimitScheduler, RateLimitExceeded, PRIORITY_HIGH
+
+GITHUB_API_URL = 'https://api.github.com'
+
+# Upstream statuses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Only idempotent calls are retried. The OAuth code exchange is a POST and the
+# code is single-use, so retrying it after a partial send would fail anyway.
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class GitHubError(Exception):
+    """Raised when GitHub could not be reached after all retries"""
+
+
+class LatencyMetrics:
+    """Thread-safe per-endpoint call counters and latency totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, seconds, status=None, retries=0, error=False):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    'calls': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'statuses': {},
+                }
+            elapsed_ms = seconds * 1000
+            stats['calls'] += 1
+            stats['retries'] += retries
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if error:
+                stats['errors'] += 1
+            if status is not None:
+                stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._endpoints.items():
+                result[endpoint] = dict(stats, statuses=dict(stats['statuses']))
+                result[endpoint]['avg_ms'] = round(stats['total_ms'] / stats['calls'], 3)
+                result[endpoint]['total_ms'] = round(stats['total_ms'], 3)
+                result[endpoint]['max_ms'] = round(stats['max_ms'], 3)
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+class GitHubClient:
+    """Keep-alive GitHub client with timeouts, bounded retries and metrics"""
+
+    def __init__(self, api_url=GITHUB_API_URL, connect_timeout=3.05, read_timeout=10.0,
+                 max_retries=2, backoff_base=0.25, backoff_max=4.0, pool_size=20, cache=None,
+                 scheduler=None):
+        self.api_url = api_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.metrics = LatencyMetrics()
+        self.cache = cache
+        self.scheduler = scheduler
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, api_url=None):
+        """Build a client from GITHUB_* environment variables"""
+        return cls(
+            api_url=api_url or os.environ.get('GITHUB_API_URL', GITHUB_API_URL),
+            connect_timeout=float(os.environ.get('GITHUB_CONNECT_TIMEOUT', 3.05)),
+            read_timeout=float(os.environ.get('GITHUB_READ_TIMEOUT', 10.0)),
+            max_retries=int(os.environ.get('GITHUB_MAX_RETRIES', 2)),
+            backoff_base=float(os.environ.get('GITHUB_BACKOFF_BASE', 0.25)),
+            backoff_max=float(os.environ.get('GITHUB_BACKOFF_MAX', 4.0)),
+            pool_size=int(os.environ.get('GITHUB_POOL_SIZE', 20)),
+            cache=ResponseCache(
+                maxsize=int(os.environ.get('GITHUB_CACHE_MAX_ENTRIES', 1024)),
+                max_entry_bytes=int(os.environ.get('GITHUB_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)),
+            ),
+            scheduler=RateLimitScheduler(
+                low_water=int(os.environ.get('GITHUB_RATE_LIMIT_LOW_WATER', 100)),
+                max_wait=float(os.environ.get('GITHUB_RATE_LIMIT_MAX_WAIT', 2.0)),
+            ),
+        )
+
+    @property
+    def session(self):
+        """Connection-pooled session, recreated after a fork so workers never share sockets"""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._session_lock:
+                if self._session is None or self._session_pid != pid:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    def url(self, path):
+        """Resolve an API path like '/user' against the configured base URL"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.api_url}{path}"
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay for the given retry attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _prepare(self, method, path, token, headers, use_cache):
+        """Resolve the URL and headers, adding cache validators when there is a cached copy"""
+        url = self.url(path)
+        request_headers = {'Accept': 'application/vnd.github+json'}
+        if token:
+            request_headers['Authorization'] = f"token {token}"
+        if headers:
+            request_headers.update(headers)
+
+        cached = None
+        if use_cache:
+            cached = self.cache.get(token, url)
+            if cached is not None:
+                request_headers.update(cached.validators())
+        return url, request_headers, cached
+
+    def _finish(self, token, url, endpoint, response, started, attempt, use_cache, cached):
+        """Record metrics and budget, then answer a 304 from the cache or store a 200"""
+        self.metrics.record(
+            endpoint,
+            time.perf_counter() - started,
+            status=response.status_code,
+            retries=attempt,
+            error=response.status_code >= 500,
+        )
+        if self.scheduler is not None:
+            self.scheduler.update(token, response)
+        if use_cache:
+            if response.status_code == 304 and cached is not None:
+                self.cache.record_revalidation()
+                return cached.to_response(response.headers)
+            if response.status_code == 200:
+                self.cache.store(token, url, response)
+        return response
+
+    def request(self, method, path, token=None, headers=None, use_cache=True,
+                priority=PRIORITY_HIGH, **kwargs):
+        """Send a request, retrying idempotent calls on 5xx and connection errors.
+
+        GET responses carrying an ETag or Last-Modified are cached and later
+        revalidated conditionally; a 304 is answered from the cache. When the
+        token's rate-limit budget is exhausted the cached copy is served without
+        contacting GitHub, or RateLimitExceeded is raised if there is none.
+        """
+        method = method.upper()
+        use_cache = use_cache and method == 'GET' and self.cache is not None
+        url, request_headers, cached = self._prepare(method, path, token, headers, use_cache)
+        endpoint = urlsplit(url).path or '/'
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+
+        if self.scheduler is not None:
+            try:
+                self.scheduler.acquire(token, priority)
+            except RateLimitExceeded:
+                if cached is not None:
+                    return cached.to_response()
+                raise
+
+        max_retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, headers=request_headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt < max_retries:
+                    time.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                self.metrics.record(endpoint, time.perf_counter() - started, retries=attempt, error=True)
+                raise GitHubError(f"GitHub request to {endpoint} failed: {exc}") from exc
+
+            if response.status_code in RETRY_STATUSES and attempt < max_retries:
+                response.close()
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+
+            return self._finish(token, url, endpoint, response, started, attempt, use_cache, cached)
+
+    def get(self, path, token=None, **kwargs):
+        return self.request('GET', path, token=token, **kwargs)
+
+    def post(self, path, token=None, **kwargs):
+        return self.request('POST', path, token=token, **kwargs)
+
+    def stats(self):
+        """Latency, cache and rate-limit figures for monitoring"""
+        return {
+            'endpoints': self.metrics.snapshot(),
+            'response_cache': self.cache.stats() if self.cache is not None else None,
+            'rate_limits': self.scheduler.snapshot() if self.scheduler is not None else None,
+        }
+
+
+class AsyncGitHubClient(GitHubClient):
+    """asyncio flavour of GitHubClient on top of httpx.AsyncClient.
+
+    Built from a sync client with from_client() it shares that client's
+    metrics, response cache and rate-limit budgets, so both serving modes see
+    the same picture of each token.
+    """
+
+    def __init__(self, max_connections=200, **kwargs):
+        super().__init__(**kwargs)
+        self.max_connections = max_connections
+        self._client = None
+
+    @classmethod
+    def from_client(cls, client, max_connections=None):
+        async_client = cls(
+            api_url=client.api_url,
+            connect_timeout=client.connect_timeout,
+            read_timeout=client.read_timeout,
+            max_retries=client.max_retries,
+            backoff_base=client.backoff_base,
+            backoff_max=client.backoff_max,
+            pool_size=client.pool_size,
+            cache=client.cache,
+            scheduler=client.scheduler,
+            max_connections=max_connections or int(os.environ.get('GITHUB_ASYNC_MAX_CONNECTIONS', 200)),
+        )
+        async_client.metrics = client.metrics
+        return async_client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method, path, token=None, headers=None, use_cache=True,
+                      priority=PRIORITY_HIGH, **kwargs):
+        """Same contract as GitHubClient.request, awaited instead of blocking"""
+        method = method.upper()
+        use_cache = use_cache and method == 'GET' and self.cache is not None
+        url, request_headers, cached = self._prepare(method, path, token, headers, use_cache)
+        endpoint = urlsplit(url).path or '/'
+
+        if self.scheduler is not None:
+            try:
+                await self.scheduler.acquire_async(token, priority)
+            except RateLimitExceeded:
+                if cached is not None:
+                    return cached.to_response()
+                raise
+
+        max_retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.request(method, url, headers=request_headers, **kwargs)
+            except httpx.TransportError as exc:
+                if attempt < max_retries:
+                    await asyncio.sleep(self.backoff(attempt))
+                    attempt += 1
+                    continue
+                self.metrics.record(endpoint, time.perf_counter() - started, retries=attempt, error=True)
+                raise GitHubError(f"GitHub request to {endpoint} failed: {exc}") from exc
+
+            if response.status_code in RETRY_STATUSES and attempt < max_retries:
+                await response.aclose()
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+
+            return self._finish(token, url, endpoint, response, started, attempt, use_cache, cached)
+
+    async def get(self, path, token=None, **kwargs):
+        return await self.request('GET', path, token=token, **kwargs)
+
+    async def post(self, path, token=None, **kwargs):
+        return await self.request('POST', path, token=token, **kwargs)
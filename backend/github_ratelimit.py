@@ -0,0 +1,173 @@
+"""
+Per-token GitHub rate-limit budget tracking.
+
+Every GitHub response reports the token's remaining quota in
+X-RateLimit-Remaining / X-RateLimit-Reset, and secondary limits answer with
+Retry-After. The scheduler remembers the latest figures per token and is
+consulted before each call: low-priority calls are queued briefly or shed
+once the budget runs low, and nothing is sent while the budget is exhausted
+so the client can fall back to cached data instead.
+"""
+import asyncio
+import threading
+import time
+
+from cache_utils import LRUCache
+from github_cache import hash_token
+
+PRIORITY_HIGH = 'high'
+PRIORITY_LOW = 'low'
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is refused to protect a token's remaining budget"""
+
+    def __init__(self, message, retry_at=None):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+    @property
+    def retry_after(self):
+        """Seconds until the budget is expected to recover"""
+        if self.retry_at is None:
+            return None
+        return max(0, int(self.retry_at - time.time()) + 1)
+
+
+class TokenBudget:
+    __slots__ = ('limit', 'remaining', 'reset_at', 'blocked_until', 'shed', 'updated_at')
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.blocked_until = None
+        self.shed = 0
+        self.updated_at = None
+
+    def as_dict(self):
+        return {
+            'limit': self.limit,
+            'remaining': self.remaining,
+            'reset_at': self.reset_at,
+            'blocked_until': self.blocked_until,
+            'shed': self.shed,
+            'updated_at': self.updated_at,
+        }
+
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    if isinstance(value, (str, int)) and str(value).strip().isdigit():
+        return int(value)
+    return None
+
+
+class RateLimitScheduler:
+    """Admits or refuses GitHub calls based on each token's last known budget"""
+
+    def __init__(self, low_water=100, max_wait=2.0, max_tokens=10000,
+                 clock=time.time, sleep=time.sleep):
+        self.low_water = low_water
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._budgets = LRUCache(maxsize=max_tokens)
+
+    def _budget(self, token):
+        key = hash_token(token)
+        budget = self._budgets.get(key)
+        if budget is None:
+            budget = TokenBudget()
+            self._budgets.set(key, budget)
+        return budget
+
+    def reserve(self, token, priority=PRIORITY_HIGH):
+        """Try to reserve one call for the token.
+
+        Returns None when the call may go ahead, or the number of seconds to
+        wait before trying again. Raises RateLimitExceeded when the wait would
+        be longer than max_wait.
+        """
+        if not token:
+            return None
+        with self._lock:
+            budget = self._budget(token)
+            now = self._clock()
+            wait_until = None
+            if budget.blocked_until and budget.blocked_until > now:
+                wait_until = budget.blocked_until
+            elif budget.remaining is not None and budget.reset_at and budget.reset_at > now:
+                if budget.remaining <= 0:
+                    wait_until = budget.reset_at
+                elif priority == PRIORITY_LOW and budget.remaining <= self.low_water:
+                    wait_until = budget.reset_at
+
+            if wait_until is None:
+                if budget.remaining is not None:
+                    # Count the call now so concurrent callers see the spend
+                    budget.remaining -= 1
+                return None
+
+            if wait_until - now > self.max_wait:
+                budget.shed += 1
+                raise RateLimitExceeded('GitHub rate limit budget exhausted for this token', retry_at=wait_until)
+            return wait_until - now
+
+    def acquire(self, token, priority=PRIORITY_HIGH):
+        """Reserve one call for the token, waiting briefly or raising RateLimitExceeded"""
+        delay = self.reserve(token, priority)
+        while delay is not None:
+            self._sleep(delay)
+            delay = self.reserve(token, priority)
+
+    async def acquire_async(self, token, priority=PRIORITY_HIGH):
+        """acquire() for the asyncio serving mode; waits without blocking the event loop"""
+        delay = self.reserve(token, priority)
+        while delay is not None:
+            await asyncio.sleep(delay)
+            delay = self.reserve(token, priority)
+
+    def update(self, token, response):
+        """Record the budget reported by a GitHub response"""
+        if not token:
+            return
+        headers = response.headers
+        limit = _int_header(headers, 'X-RateLimit-Limit')
+        remaining = _int_header(headers, 'X-RateLimit-Remaining')
+        reset_at = _int_header(headers, 'X-RateLimit-Reset')
+        retry_after = _int_header(headers, 'Retry-After')
+
+        with self._lock:
+            budget = self._budget(token)
+            now = self._clock()
+            if limit is not None:
+                budget.limit = limit
+            if remaining is not None:
+                budget.remaining = remaining
+            if reset_at is not None:
+                budget.reset_at = reset_at
+            if response.status_code in (403, 429):
+                if retry_after is not None:
+                    budget.blocked_until = now + retry_after
+                elif remaining == 0 and reset_at is not None:
+                    budget.blocked_until = reset_at
+            budget.updated_at = now
+
+    def budget(self, token):
+        with self._lock:
+            return self._budget(token).as_dict()
+
+    def snapshot(self):
+        """Current budget per token, keyed by a short token hash for monitoring"""
+        with self._lock:
+            result = {}
+            for key in self._budgets.keys():
+                budget = self._budgets.get(key)
+                if budget is not None and budget.updated_at is not None:
+                    result[key[:12]] = budget.as_dict()
+            return result
+
+    def clear(self):
+        self._budgets.clear()
@@ -0,0 +1,265 @@
+"""
+GitHub webhook intake for repository changes.
+
+The endpoint checks the X-Hub-Signature-256 HMAC against
+GITHUB_WEBHOOK_SECRET, queues the verified body and answers 202; a background
+thread applies `repository` and `installation_repositories` events to the
+Repository table. The queue is bounded by the total bytes it holds as well
+as by deliveries, so unsigned or oversized traffic cannot fill memory, so repository metadata follows GitHub as it changes rather
+than waiting for the next poll.
+"""
+import hashlib
+import hmac
+import json
+import queue
+import threading
+
+from cache_utils import LRUCache
+from sqlalchemy import select, update, delete
+
+from models import db, User, Repository, repository_access
+from repository_sync import existing_repositories, list_repositories, store_repository_page, write_repository_page
+
+# Actions on the `repository` event that carry the full, current repository
+REPOSITORY_UPSERT_ACTIONS = {
+    'created', 'edited', 'renamed', 'privatized', 'publicized', 'archived', 'unarchived', 'transferred',
+}
+
+# The only repository fields installation_repositories lists carry -> Repository column
+INSTALLATION_FIELDS = {'name': 'name', 'full_name': 'full_name', 'private': 'is_private'}
+
+
+def verify_signature(secret, body, signature):
+    """Check a X-Hub-Signature-256 header against the raw request body"""
+    if not secret or not signature or not signature.startswith('sha256='):
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
+def sign(secret, body):
+    """X-Hub-Signature-256 value for a body, as GitHub computes it"""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+def owner_user_id(account):
+    """Id of the AlphaTest user for a GitHub account, or None"""
+    if not account or 'id' not in account:
+        return None
+    user = User.query.filter_by(github_id=account['id']).first()
+    return user.id if user else None
+
+
+def upsert_repositories(repos_data, user_id):
+    """Apply repository payloads; without a known owner only existing rows are updated"""
+    if user_id is None:
+        existing = existing_repositories(repo_data['id'] for repo_data in repos_data)
+        repos_data = [repo_data for repo_data in repos_data if repo_data['id'] in existing]
+    if repos_data:
+        write_repository_page(user_id, repos_data)
+    return len(repos_data)
+
+
+def remove_repositories(github_ids):
+    """Delete repositories that no longer exist on GitHub.
+
+    Rows that bug reports point at are kept so the reports stay attached.
+    """
+    repos = Repository.query.filter(Repository.github_id.in_(list(github_ids))).all()
+    removed = 0
+    for repo in repos:
+        if not repo.bug_reports:
+            db.session.delete(repo)
+            removed += 1
+    db.session.commit()
+    return removed
+
+
+def revoke_repositories(github_ids, user_id):
+    """Stop listing repositories for one user; other users keep theirs"""
+    if user_id is None:
+        return 0
+    result = db.session.execute(
+        delete(repository_access)
+        .where(repository_access.c.user_id == user_id,
+               repository_access.c.repository_id.in_(
+                   select(Repository.id).where(Repository.github_id.in_(list(github_ids)))))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def installation_repo(repo_data):
+    """installation_repositories lists carry only id, name, full_name and private"""
+    return dict(
+        repo_data,
+        html_url=repo_data.get('html_url') or f"https://github.com/{repo_data['full_name']}",
+    )
+
+
+def add_installation_repositories(repos_data, user_id):
+    """Apply an installation_repositories list without blanking what it leaves out.
+
+    Repositories new to the table are inserted for a known account. Known
+    ones get only the fields the list carries, and their content hash is
+    cleared so the next sync writes the full payload again.
+    """
+    existing = existing_repositories((repo_data['id'] for repo_data in repos_data), user_id)
+    added = [installation_repo(repo_data) for repo_data in repos_data if repo_data['id'] not in existing]
+    if user_id is None:
+        added = []
+    elif added:
+        store_repository_page(user_id, added)
+
+    known = {existing[repo_data['id']][0]: repo_data for repo_data in repos_data if repo_data['id'] in existing}
+    columns = list(INSTALLATION_FIELDS.values())
+    rows = db.session.execute(
+        select(Repository.id, *(getattr(Repository, column) for column in columns))
+        .where(Repository.id.in_(list(known)))
+    ) if known else []
+    updates = []
+    for row_id, *stored in rows:
+        repo_data = known[row_id]
+        values = {column: repo_data[key] for key, column in INSTALLATION_FIELDS.items() if key in repo_data}
+        if any(values[column] != value for column, value in zip(columns, stored) if column in values):
+            updates.append(dict(values, id=row_id, content_hash=None))
+    if updates:
+        db.session.execute(update(Repository), updates)
+    list_repositories(user_id, [row_id for row_id, _, listed in existing.values() if not listed])
+    db.session.commit()
+    return len(added) + len(updates)
+
+
+def handle_repository(payload):
+    action = payload.get('action')
+    repo_data = payload['repository']
+    if action == 'deleted':
+        return remove_repositories([repo_data['id']])
+    if action in REPOSITORY_UPSERT_ACTIONS:
+        return upsert_repositories([repo_data], owner_user_id(repo_data.get('owner')))
+    return 0
+
+
+def handle_installation_repositories(payload):
+    account = (payload.get('installation') or {}).get('account')
+    changed = 0
+    added = payload.get('repositories_added') or []
+    if added:
+        changed += add_installation_repositories(added, owner_user_id(account))
+    # The installation's account lost access; the repository itself still exists
+    removed = [repo_data['id'] for repo_data in payload.get('repositories_removed') or []]
+    if removed:
+        changed += revoke_repositories(removed, owner_user_id(account))
+    return changed
+
+
+HANDLERS = {
+    'repository': handle_repository,
+    'installation_repositories': handle_installation_repositories,
+}
+
+
+class WebhookProcessor:
+    """Bounded queue of deliveries, verified and applied on a background thread"""
+
+    def __init__(self, app, secret, maxsize=1000, max_bytes=64 * 1024 * 1024, seen_deliveries=10000):
+        self.app = app
+        self.secret = secret
+        self._queue = queue.Queue(maxsize=maxsize)
+        self.max_bytes = max_bytes
+        self._bytes = 0  # body bytes waiting in the queue
+        # GitHub redelivers on timeouts; remember recent delivery ids
+        self._seen = LRUCache(maxsize=seen_deliveries)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.counts = {'queued': 0, 'dropped': 0, 'rejected': 0, 'duplicate': 0,
+                       'ignored': 0, 'applied': 0, 'failed': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def verify(self, body, signature):
+        """Check a delivery's signature before it is queued"""
+        if verify_signature(self.secret, body, signature):
+            return True
+        self._count('rejected')
+        return False
+
+    def submit(self, event, delivery_id, signature, body):
+        """Queue a delivery; returns False when the queue is full"""
+        with self._lock:
+            if self._bytes + len(body) > self.max_bytes:
+                self.counts['dropped'] += 1
+                return False
+            try:
+                self._queue.put_nowait((event, delivery_id, signature, body))
+            except queue.Full:
+                self.counts['dropped'] += 1
+                return False
+            self._bytes += len(body)
+            self.counts['queued'] += 1
+        return True
+
+    def _done(self, item):
+        with self._lock:
+            self._bytes -= len(item[3])
+        self._queue.task_done()
+
+    def process(self, event, delivery_id, signature, body):
+        """Verify and apply one delivery"""
+        if not verify_signature(self.secret, body, signature):
+            self._count('rejected')
+            self.app.logger.warning("Rejected GitHub webhook %s: bad signature", delivery_id)
+            return
+        if delivery_id and delivery_id in self._seen:
+            self._count('duplicate')
+            return
+        handler = HANDLERS.get(event)
+        if handler is None:
+            self._count('ignored')
+            return
+        with self.app.app_context():
+            try:
+                handler(json.loads(body))
+            except Exception:
+                db.session.rollback()
+                self._count('failed')
+                self.app.logger.exception("Failed to apply GitHub webhook %s (%s)", delivery_id, event)
+                return
+        if delivery_id:
+            self._seen.set(delivery_id, True)
+        self._count('applied')
+
+    def drain(self):
+        """Process everything queued so far on the calling thread"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.process(*item)
+            finally:
+                self._done(item)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                self.process(*item)
+            except Exception:
+                self.app.logger.exception("GitHub webhook worker error")
+            finally:
+                self._done(item)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='github-webhooks', daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, backlog=self._queue.qsize(), backlog_bytes=self._bytes)
@@ -0,0 +1,173 @@
+"""
+Group commit for row inserts from concurrent requests.
+
+On SQLite every commit takes the database write lock and syncs the journal,
+so a burst of requests that each commit one row queue up behind each other.
+GroupCommitWriter instead has request threads hand their row to a single
+writer thread, which waits up to `max_delay` seconds for more rows to arrive
+(or until `max_batch` are waiting) and inserts them all with one multi-row
+INSERT ... RETURNING in one transaction. If that statement fails, the batch
+is retried row by row, each inside its own SAVEPOINT, so a bad row is rolled
+back alone and only its caller sees the error; every other caller gets the
+id of its row once the shared commit succeeds.
+"""
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from models import db
+
+
+class PendingInsert:
+    """One caller's row, resolved by the writer thread"""
+
+    __slots__ = ('values', 'id', 'error', 'done')
+
+    def __init__(self, values):
+        self.values = values
+        self.id = None
+        self.error = None
+        self.done = threading.Event()
+
+    def result(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise TimeoutError('group commit did not complete in time')
+        if self.error is not None:
+            raise self.error
+        return self.id
+
+
+class GroupCommitWriter:
+    """Batches inserts of one model from many threads into shared transactions"""
+
+    def __init__(self, app, model, max_delay=0.005, max_batch=200, name='group-commit'):
+        self.app = app
+        self.model = model
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def insert(self, values, timeout=30.0):
+        """Insert one row and return its id; raises that row's error"""
+        pending = PendingInsert(values)
+        if not self.running():
+            # No writer thread (tests, scripts): commit a batch of one right here
+            self.write([pending])
+        else:
+            self._queue.put(pending)
+        return pending.result(timeout)
+
+    def _insert_rows(self, batch):
+        """Insert the whole batch in one statement; returns the ids in order"""
+        statement = insert(self.model).returning(self.model.id, sort_by_parameter_order=True)
+        with db.session.begin_nested():
+            return db.session.scalars(statement, [pending.values for pending in batch]).all()
+
+    def _insert_each(self, batch):
+        """Insert row by row, each in its own savepoint, recording per-row errors"""
+        ids = []
+        for pending in batch:
+            try:
+                with db.session.begin_nested():
+                    ids.append(db.session.scalar(insert(self.model).returning(self.model.id), pending.values))
+            except Exception as error:
+                pending.error = error
+                ids.append(None)
+        return ids
+
+    def write(self, batch):
+        """Insert a batch in one transaction; a failing row only fails its own caller"""
+        with self.app.app_context():
+            try:
+                ids = self._insert_rows(batch)
+            except Exception:
+                ids = self._insert_each(batch)
+            written = [(pending, row_id) for pending, row_id in zip(batch, ids) if row_id is not None]
+            try:
+                db.session.commit()
+            except Exception as error:
+                db.session.rollback()
+                for pending, _ in written:
+                    pending.error = error
+                written = []
+            for pending, row_id in written:
+                pending.id = row_id
+            db.session.remove()
+        with self._lock:
+            self.inserted += len(written)
+            self.failed += len(batch) - len(written)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+        for pending in batch:
+            pending.done.set()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)  # finish this batch, then stop
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                self.write(batch)
+            except Exception as error:
+                self.app.logger.exception("%s batch failed", self.name)
+                for pending in batch:
+                    if not pending.done.is_set():
+                        pending.error = error
+                        pending.done.set()
+
+    def start(self):
+        with self._lock:
+            if self.running():
+                return
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Write what is queued, then stop the writer thread"""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running(),
+                'inserted': self.inserted,
+                'failed': self.failed,
+                'batches': self.batches,
+                'largest_batch': self.largest_batch,
+                'waiting': self._queue.qsize(),
+            }
@@ -0,0 +1,177 @@
+"""
+Database models shared by the Flask app and the background workers.
+"""
+import hashlib
+import json
+import threading
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DateTime, func
+from sqlalchemy.orm import validates
+
+from github_cache import hash_token
+
+db = SQLAlchemy()
+
+
+def content_hash(values):
+    """Fingerprint of the column values we copy from GitHub, to skip no-op writes"""
+    encoded = json.dumps(values, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class WriteCounters:
+    """Rows written vs. skipped as unchanged, per table"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, table, written=0, skipped=0):
+        with self._lock:
+            counts = self._counts.setdefault(table, {'written': 0, 'skipped': 0})
+            counts['written'] += written
+            counts['skipped'] += skipped
+
+    def snapshot(self):
+        with self._lock:
+            return {table: dict(counts) for table, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+write_counters = WriteCounters()
+
+# Database Models
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    github_id = db.Column(db.Integer, unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), nullable=True)
+    avatar_url = db.Column(db.String(255), nullable=True)
+    access_token = db.Column(db.String(255), nullable=True)
+    # Indexed SHA-256 of access_token; requests look their user up by this
+    access_token_hash = db.Column(db.String(64), nullable=True, index=True)
+    # Newest GitHub updated_at/pushed_at seen by the last repository sync
+    repos_watermark = db.Column(db.String(32), nullable=True)
+    repos_synced_at = db.Column(DateTime(timezone=True), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Relationships
+    repositories = db.relationship('Repository', backref='user', lazy=True)
+    bug_reports = db.relationship('BugReport', backref='user', lazy=True)
+
+    @validates('access_token')
+    def _hash_access_token(self, key, token):
+        self.access_token_hash = hash_token(token) if token else None
+        return token
+
+# Users GitHub lists each repository for. A repository shared through an
+# organisation or as a collaborator is stored once but listed for every user
+# who synced it; Repository.user_id only records who synced it first.
+repository_access = db.Table(
+    'repository_access',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Column('repository_id', db.Integer, db.ForeignKey('repository.id'), primary_key=True),
+)
+
+class Repository(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    github_id = db.Column(db.Integer, unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    full_name = db.Column(db.String(150), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    html_url = db.Column(db.String(255), nullable=False)
+    clone_url = db.Column(db.String(255), nullable=True)
+    language = db.Column(db.String(50), nullable=True)
+    is_private = db.Column(db.Boolean, default=False)
+    content_hash = db.Column(db.String(64), nullable=True)
+    # Latest of GitHub's updated_at and pushed_at (ISO 8601 text), what listings sort on
+    changed_at = db.Column(db.String(32), nullable=True)
+    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Foreign Keys
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    # Relationships
+    bug_reports = db.relationship('BugReport', backref='repository', lazy=True)
+    users = db.relationship('User', secondary=repository_access, lazy=True,
+                            backref=db.backref('listed_repositories', lazy=True))
+
+class DeviceProfile(db.Model):
+    """One distinct device description, shared by every report sent from it"""
+    id = db.Column(db.Integer, primary_key=True)
+    # SHA-256 of format + attributes; reports from the same device resolve to one row
+    fingerprint = db.Column(db.String(64), unique=True, nullable=False)
+    format = db.Column(db.String(8), nullable=False)  # json, text or raw, as submitted
+    attributes = db.Column(db.Text, nullable=False)  # JSON [[key, value], ...] in submitted order
+    browser = db.Column(db.String(40), nullable=True)
+    browser_version = db.Column(db.String(40), nullable=True)
+    browser_major = db.Column(db.Integer, nullable=True)
+    os = db.Column(db.String(40), nullable=True)
+    os_version = db.Column(db.String(40), nullable=True)
+    os_major = db.Column(db.Integer, nullable=True)
+    platform = db.Column(db.String(80), nullable=True)
+    language = db.Column(db.String(35), nullable=True)
+    screen_resolution = db.Column(db.String(20), nullable=True)
+    viewport = db.Column(db.String(20), nullable=True)
+    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
+
+    # "Safari 17 on iOS" and "everything on Android 14" are index range scans
+    __table_args__ = (
+        db.Index('ix_device_profile_browser', 'browser', 'browser_major', 'os'),
+        db.Index('ix_device_profile_os', 'os', 'os_major'),
+    )
+
+    def render(self, details=None):
+        """The device info text as submitted, with per-report values put back in place"""
+        pairs = json.loads(self.attributes)
+        for position, key, value in json.loads(details) if details else ():
+            pairs.insert(position, [key, value])
+        if self.format == 'json':
+            return json.dumps(dict(pairs), separators=(',', ':'))
+        if self.format == 'text':
+            return '\n'.join(f'{key}: {value}' for key, value in pairs)
+        return pairs[0][1] if pairs else ''
+
+class BugReport(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    # Free-text device info of reports stored before device profiles
+    device_info_raw = db.Column('device_info', db.Text, nullable=True)
+    device_profile_id = db.Column(db.Integer, db.ForeignKey('device_profile.id'), nullable=True, index=True)
+    device_details = db.Column(db.Text, nullable=True)  # per-report values such as the timestamp
+    screenshot_path = db.Column(db.String(255), nullable=True, index=True)  # screenshot store key
+    screenshot_webp_path = db.Column(db.String(255), nullable=True)  # recompressed copy, once rendered
+    thumbnail_path = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), default='open')  # open, closed, in_progress
+    priority = db.Column(db.String(10), default='medium')  # low, medium, high, critical
+    client_ip = db.Column(db.String(45), nullable=True)
+    created_at = db.Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = db.Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Foreign Keys
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    repository_id = db.Column(db.Integer, db.ForeignKey('repository.id'), nullable=True)
+    duplicate_of_id = db.Column(db.Integer, db.ForeignKey('bug_report.id'), nullable=True, index=True)
+
+    device_profile = db.relationship('DeviceProfile', lazy=True)
+
+    @property
+    def device_info(self):
+        if self.device_profile_id is not None and self.device_profile is not None:
+            return self.device_profile.render(self.device_details)
+        return self.device_info_raw
+
+    @device_info.setter
+    def device_info(self, value):
+        # Kept as free text; ingestion encodes through device_profiles instead
+        self.device_info_raw = value
+        self.device_profile_id = None
+        self.device_details = None
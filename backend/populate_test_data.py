@@ -8,6 +8,7 @@ import os
 import sys
 from datetime import datetime, timedelta
 from app import app, db, User, Repository, BugReport
+from device_profiles import encode_device_info
 
 def populate_test_data():
     """Populate the database with test data"""
@@ -131,6 +132,7 @@ def populate_test_data():
         repositories = []
         for repo_data in repositories_data:
             repo = Repository(**repo_data)
+            repo.users.append(db.session.get(User, repo_data['user_id']))
             db.session.add(repo)
             repositories.append(repo)
         
@@ -211,6 +213,7 @@ def populate_test_data():
         
         bug_reports = []
         for report_data in bug_reports_data:
+            report_data.update(encode_device_info(report_data.pop('device_info')))
             bug_report = BugReport(**report_data)
             db.session.add(bug_report)
             bug_reports.append(bug_report)
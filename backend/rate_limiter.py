@@ -0,0 +1,261 @@
+"""
+Fixed-memory rate limiting for anonymous endpoints.
+
+Each key keeps three numbers: the index of its current fixed window, the hits
+counted in it, and the hits counted in the window before. The sliding-window
+estimate weights the previous window by how much of it still overlaps the
+last `window` seconds, so a check or a hit is O(1) and never walks a list of
+timestamps. Keys live in an LRU bounded by `max_keys`; keys that have not been
+hit for two windows carry no information and are dropped from the cold end as
+new keys arrive.
+
+SlidingWindowRateLimiter keeps the counters in process memory, so every
+worker process enforces its own limit. SQLiteRateLimiter keeps the same
+counters in a SQLite file that all workers on a node open, updating them with
+one atomic upsert per hit. create_rate_limiter() picks one from a backend
+string such as 'memory' or 'sqlite:///var/run/alphatest/ratelimit.db'.
+"""
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class RateLimiter(ABC):
+    """Allows `limit` hits per key in any `window` seconds, approximately"""
+
+    def __init__(self, limit, window, max_keys=100000, clock=time.time):
+        if limit <= 0 or window <= 0 or max_keys <= 0:
+            raise ValueError('limit, window and max_keys must be positive')
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    @abstractmethod
+    def count(self, key, now=None):
+        """Estimated hits for key over the last window"""
+
+    def is_limited(self, key, now=None):
+        """True if another hit for key would exceed the limit"""
+        limited = self.count(key, now) >= self.limit
+        if limited:
+            with self._lock:
+                self.rejected += 1
+        return limited
+
+    @abstractmethod
+    def hit(self, key, now=None):
+        """Record one hit for key; returns the new estimate"""
+
+    @abstractmethod
+    def reset(self, key):
+        """Forget every hit recorded for key"""
+
+    @abstractmethod
+    def clear(self):
+        """Forget every key"""
+
+    @abstractmethod
+    def __len__(self):
+        """Number of keys currently tracked"""
+
+    def stats(self):
+        size = len(self)
+        with self._lock:
+            return {
+                'backend': self.backend,
+                'keys': size,
+                'max_keys': self.max_keys,
+                'limit': self.limit,
+                'window_seconds': self.window,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'rejected': self.rejected,
+            }
+
+    def _estimate(self, counter, now):
+        index = int(now // self.window)
+        if counter[0] == index:
+            current, previous = counter[1], counter[2]
+        elif counter[0] == index - 1:
+            current, previous = 0, counter[1]
+        else:
+            return 0.0
+        overlap = 1.0 - (now % self.window) / self.window
+        return current + previous * overlap
+
+
+class SlidingWindowRateLimiter(RateLimiter):
+    """In-process counters held in a bounded LRU"""
+
+    backend = 'memory'
+
+    def __init__(self, limit, window, max_keys=100000, clock=time.time):
+        super().__init__(limit, window, max_keys, clock)
+        self._counters = OrderedDict()  # key -> [window index, current hits, previous hits]
+
+    def _expire(self, now):
+        # The LRU end holds the least recently hit keys; stop at the first live one
+        stale_before = int(now // self.window) - 1
+        counters = self._counters
+        while counters:
+            key = next(iter(counters))
+            if counters[key][0] >= stale_before:
+                break
+            del counters[key]
+            self.expirations += 1
+
+    def count(self, key, now=None):
+        now = self._clock() if now is None else now
+        with self._lock:
+            counter = self._counters.get(key)
+            return 0.0 if counter is None else self._estimate(counter, now)
+
+    def is_limited(self, key, now=None):
+        now = self._clock() if now is None else now
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or self._estimate(counter, now) < self.limit:
+                return False
+            self.rejected += 1
+            return True
+
+    def hit(self, key, now=None):
+        now = self._clock() if now is None else now
+        index = int(now // self.window)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = [index, 0, 0]
+            elif counter[0] != index:
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[0], counter[1] = index, 0
+            counter[1] += 1
+            self._counters.move_to_end(key)
+            self._expire(now)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+                self.evictions += 1
+            return self._estimate(counter, now)
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counters)
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """Counters in a SQLite file shared by every worker process on the node"""
+
+    backend = 'sqlite'
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS rate_limit ('
+        ' key TEXT PRIMARY KEY, window INTEGER NOT NULL,'
+        ' current INTEGER NOT NULL, previous INTEGER NOT NULL) WITHOUT ROWID'
+    )
+    # SET expressions all see the row as it was, so the window roll-over,
+    # the increment and the read-back happen in one statement and one lock
+    HIT = (
+        'INSERT INTO rate_limit (key, window, current, previous) VALUES (?, ?, 1, 0) '
+        'ON CONFLICT (key) DO UPDATE SET '
+        ' previous = CASE WHEN window = excluded.window THEN previous'
+        '  WHEN window = excluded.window - 1 THEN current ELSE 0 END,'
+        ' current = CASE WHEN window = excluded.window THEN current + 1 ELSE 1 END,'
+        ' window = excluded.window '
+        'RETURNING window, current, previous'
+    )
+
+    def __init__(self, path, limit, window, max_keys=100000, clock=time.time,
+                 prune_every=1000, busy_timeout=5.0):
+        super().__init__(limit, window, max_keys, clock)
+        self.path = path
+        self.prune_every = prune_every
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._hits_since_prune = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().execute(self.SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or survive a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def count(self, key, now=None):
+        now = self._clock() if now is None else now
+        row = self._connection().execute(
+            'SELECT window, current, previous FROM rate_limit WHERE key = ?', (key,)
+        ).fetchone()
+        return 0.0 if row is None else self._estimate(row, now)
+
+    def hit(self, key, now=None):
+        now = self._clock() if now is None else now
+        row = self._connection().execute(self.HIT, (key, int(now // self.window))).fetchone()
+        with self._lock:
+            self._hits_since_prune += 1
+            prune = self._hits_since_prune >= self.prune_every
+            if prune:
+                self._hits_since_prune = 0
+        if prune:
+            self.prune(now)
+        return self._estimate(row, now)
+
+    def prune(self, now=None):
+        """Delete idle keys, then the least recently active ones beyond max_keys"""
+        now = self._clock() if now is None else now
+        conn = self._connection()
+        expired = conn.execute(
+            'DELETE FROM rate_limit WHERE window < ?', (int(now // self.window) - 1,)
+        ).rowcount
+        excess = self.__len__() - self.max_keys
+        evicted = 0
+        if excess > 0:
+            evicted = conn.execute(
+                'DELETE FROM rate_limit WHERE key IN '
+                '(SELECT key FROM rate_limit ORDER BY window, current LIMIT ?)', (excess,)
+            ).rowcount
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+        return expired + evicted
+
+    def reset(self, key):
+        self._connection().execute('DELETE FROM rate_limit WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_limit')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM rate_limit').fetchone()[0]
+
+
+def create_rate_limiter(backend, limit, window, max_keys=100000):
+    """A limiter for a backend string: 'memory' or 'sqlite:///path/to/file.db'"""
+    if backend in (None, '', 'memory'):
+        return SlidingWindowRateLimiter(limit, window, max_keys=max_keys)
+    if backend.startswith('sqlite:///'):
+        return SQLiteRateLimiter(backend[len('sqlite:///'):], limit, window, max_keys=max_keys)
+    raise ValueError(f'unknown rate limit backend: {backend}')
@@ -0,0 +1,147 @@
+"""
+Repository listings served from the Repository table.
+
+/api/repositories answers from here instead of relaying GitHub's payload:
+
+    /api/repositories?fields=id,name,full_name&sort=name&limit=50
+    /api/repositories?fields=id,name,full_name&sort=name&limit=50&cursor=<next_cursor>
+
+sort=updated follows GitHub's own updated_at/pushed_at, stored on each row
+at sync time. Pages use keyset pagination on (sort key, id), so no page
+re-reads the rows before it; ties on the sort key are broken by id,
+ascending. A user's rows are found through repository_access's
+(user_id, repository_id) key and sorted per request, so a page costs time
+in the number of repositories listed for that user (not in the whole
+table), as one index cannot order rows across the join. `fields` limits both the columns loaded and
+the keys returned. Without `limit` every repository is returned, as before.
+"""
+import base64
+import json
+
+from sqlalchemy import select, or_, and_, tuple_, type_coerce, func, String
+from sqlalchemy.orm import load_only
+
+from models import db, Repository, repository_access
+
+# Response field -> Repository attributes it is built from
+FIELDS = {
+    'id': ('github_id',),
+    'name': ('name',),
+    'full_name': ('full_name',),
+    'owner': ('full_name',),
+    'description': ('description',),
+    'html_url': ('html_url',),
+    'clone_url': ('clone_url',),
+    'language': ('language',),
+    'private': ('is_private',),
+}
+
+# Sort name -> (key expression, descending). Timestamps are compared as the
+# stored text so cursor values round-trip exactly; rows never synced from
+# GitHub have no changed_at and come last.
+SORTS = {
+    'updated': (func.coalesce(Repository.changed_at, ''), True),
+    'created': (type_coerce(Repository.created_at, String), True),
+    'name': (Repository.name, False),
+    'full_name': (Repository.full_name, False),
+}
+
+DEFAULT_SORT = 'updated'
+MAX_LIMIT = 100
+
+
+class ListingError(ValueError):
+    """Raised for listing parameters the endpoint cannot serve (answered with 400)"""
+
+
+def parse_listing_args(args):
+    """Validate fields/sort/limit/cursor query parameters"""
+    fields = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown:
+            raise ListingError(f"Unknown fields: {', '.join(unknown)}")
+
+    sort = args.get('sort') or DEFAULT_SORT
+    if sort not in SORTS:
+        raise ListingError(f"Unknown sort: {sort}. Use one of: {', '.join(SORTS)}")
+
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = int(args['limit'])
+        except ValueError:
+            raise ListingError("limit must be a number")
+        if limit < 1:
+            raise ListingError("limit must be positive")
+        limit = min(limit, MAX_LIMIT)
+
+    cursor = decode_cursor(args['cursor'], sort) if args.get('cursor') else None
+    if cursor is not None and limit is None:
+        limit = MAX_LIMIT
+    return {'fields': fields, 'sort': sort, 'limit': limit, 'cursor': cursor}
+
+
+def encode_cursor(sort, key, row_id):
+    raw = json.dumps([sort, key, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """(sort key, id) of the last row on the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, key, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ListingError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(row_id, int) or not isinstance(key, (str, type(None))):
+        raise ListingError("Cursor does not match this sort")
+    return key, row_id
+
+
+def repository_to_dict(repo, fields=None):
+    """GitHub-shaped repository built from a stored Repository row"""
+    data = {}
+    for field in fields or FIELDS:
+        if field == 'id':
+            data['id'] = repo.github_id
+        elif field == 'owner':
+            data['owner'] = {'login': repo.full_name.split('/', 1)[0]}
+        elif field == 'private':
+            data['private'] = repo.is_private
+        else:
+            data[field] = getattr(repo, field)
+    return data
+
+
+def user_repositories(user_id, fields=None, sort=DEFAULT_SORT, limit=None, cursor=None):
+    """One page of the repositories listed for a user and the cursor for the next one (or None)"""
+    key, descending = SORTS[sort]
+    # Rows written together share a timestamp; id ascending keeps them in GitHub's order
+    order = (key.desc() if descending else key, Repository.id)
+
+    columns = {attr for field in (fields or FIELDS) for attr in FIELDS[field]}
+    query = (
+        select(Repository, key)
+        .options(load_only(*(getattr(Repository, attr) for attr in sorted(columns))))
+        .join(repository_access, repository_access.c.repository_id == Repository.id)
+        .where(repository_access.c.user_id == user_id)
+        .order_by(*order)
+    )
+    if cursor is not None:
+        last_key, last_id = cursor
+        if descending:
+            query = query.where(or_(key < last_key, and_(key == last_key, Repository.id > last_id)))
+        else:
+            query = query.where(tuple_(key, Repository.id) > tuple_(last_key, last_id))
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last_repo, last_key = rows[-1]
+        next_cursor = encode_cursor(sort, last_key, last_repo.id)
+    return [repository_to_dict(repo, fields) for repo, _ in rows], next_cursor
@@ -0,0 +1,310 @@
+"""
+Repository sync from GitHub into the Repository table.
+
+`/user/repos` is paginated through the Link header. The first page tells us
+the last page number; the remaining pages are then fetched concurrently on a
+bounded worker pool and handed back one page at a time, so the caller can
+write each page to the database and let it go before the next one arrives.
+"""
+import asyncio
+import os
+import re
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, parse_qs
+
+from sqlalchemy import select, insert, update
+
+from github_ratelimit import PRIORITY_HIGH
+from models import db, User, Repository, repository_access, content_hash, write_counters
+
+REPOS_PER_PAGE = 100
+
+# Upper bound on concurrent page fetches per sync
+PAGE_WORKERS = int(os.environ.get('GITHUB_PAGE_WORKERS', 4))
+
+# github_ids per IN query when looking up existing rows
+LOOKUP_CHUNK = 500
+
+_LINK_RE = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
+
+
+class RepositoryFetchError(Exception):
+    """Raised when GitHub refuses a page of the repository listing"""
+
+    def __init__(self, status_code):
+        super().__init__(f"GitHub returned {status_code} for /user/repos")
+        self.status_code = status_code
+
+
+def parse_link_header(value):
+    """Map rel names to URLs from a GitHub Link header"""
+    if not isinstance(value, str):
+        return {}
+    return {rel: url for url, rel in _LINK_RE.findall(value)}
+
+
+def page_number(url):
+    """Extract the page query parameter from a pagination URL"""
+    pages = parse_qs(urlsplit(url).query).get('page')
+    return int(pages[0]) if pages and pages[0].isdigit() else None
+
+
+def repos_page_path(page=1, per_page=REPOS_PER_PAGE):
+    path = f"/user/repos?per_page={per_page}&sort=updated"
+    return path if page == 1 else f"{path}&page={page}"
+
+
+def fetch_repository_pages(client, token, per_page=REPOS_PER_PAGE, max_workers=PAGE_WORKERS,
+                           priority=PRIORITY_HIGH):
+    """Yield lists of repository dicts, one per GitHub page.
+
+    Pages after the first may arrive out of order. At most `max_workers`
+    fetches are in flight at once, so completed pages never pile up while the
+    caller is busy writing the previous one.
+    """
+    def fetch(page_path):
+        response = client.get(page_path, token=token, priority=priority)
+        if response.status_code != 200:
+            raise RepositoryFetchError(response.status_code)
+        return response
+
+    first = fetch(repos_page_path(1, per_page))
+    yield first.json()
+
+    links = parse_link_header(first.headers.get('Link'))
+    last_page = page_number(links['last']) if 'last' in links else None
+
+    if last_page is None:
+        # No last link: follow rel="next" sequentially, if there is one
+        next_url = links.get('next')
+        while next_url:
+            response = fetch(next_url)
+            yield response.json()
+            next_url = parse_link_header(response.headers.get('Link')).get('next')
+        return
+
+    remaining = iter(range(2, last_page + 1))
+    workers = max(1, min(max_workers, last_page - 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='repo-page') as pool:
+        in_flight = set()
+        try:
+            for page in remaining:
+                in_flight.add(pool.submit(fetch, repos_page_path(page, per_page)))
+                if len(in_flight) >= workers:
+                    break
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result().json()
+                    next_page = next(remaining, None)
+                    if next_page is not None:
+                        in_flight.add(pool.submit(fetch, repos_page_path(next_page, per_page)))
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def changed_at(repo_data):
+    """Latest of GitHub's updated_at and pushed_at; ISO 8601 UTC, so it compares as text"""
+    return max(repo_data.get('updated_at') or '', repo_data.get('pushed_at') or '')
+
+
+def fetch_changed_pages(client, token, since, per_page=REPOS_PER_PAGE, priority=PRIORITY_HIGH):
+    """Yield pages newest first, stopping after the page that reaches `since`.
+
+    The listing is sorted by updated_at descending, so once a page holds a
+    repository not updated since the watermark every later page is older too.
+    """
+    next_url = repos_page_path(1, per_page)
+    while next_url:
+        response = client.get(next_url, token=token, priority=priority)
+        if response.status_code != 200:
+            raise RepositoryFetchError(response.status_code)
+        repos_data = response.json()
+        yield repos_data
+        if any((repo_data.get('updated_at') or '') <= since for repo_data in repos_data):
+            return
+        next_url = parse_link_header(response.headers.get('Link')).get('next')
+
+
+def repository_values(repo_data):
+    """Repository column values from a GitHub repository payload"""
+    return {
+        'name': repo_data['name'],
+        'full_name': repo_data['full_name'],
+        'description': repo_data.get('description'),
+        'html_url': repo_data['html_url'],
+        'clone_url': repo_data.get('clone_url'),
+        'language': repo_data.get('language'),
+        'is_private': repo_data['private'],
+        'changed_at': changed_at(repo_data) or None,
+    }
+
+
+def existing_repositories(github_ids, user_id=None):
+    """Map github_id -> (Repository.id, content_hash, listed for user_id) for the rows that already exist"""
+    github_ids = list(github_ids)
+    existing = {}
+    access = repository_access.alias()
+    for start in range(0, len(github_ids), LOOKUP_CHUNK):
+        chunk = github_ids[start:start + LOOKUP_CHUNK]
+        rows = db.session.execute(
+            select(Repository.github_id, Repository.id, Repository.content_hash, access.c.user_id)
+            .outerjoin(access, (access.c.repository_id == Repository.id) & (access.c.user_id == user_id))
+            .where(Repository.github_id.in_(chunk))
+        )
+        existing.update((github_id, (row_id, digest, listed is not None))
+                        for github_id, row_id, digest, listed in rows)
+    return existing
+
+
+def list_repositories(user_id, repository_ids):
+    """Record that GitHub lists these Repository rows for a user (rows not listed yet)"""
+    if user_id is not None and repository_ids:
+        db.session.execute(insert(repository_access),
+                           [{'user_id': user_id, 'repository_id': row_id} for row_id in repository_ids])
+
+
+def store_repository_page(user_id, repos_data):
+    """Insert or update one page of GitHub repositories for a user.
+
+    Existing rows are found with one IN query, then new rows go out as a
+    single batched INSERT and changed rows as a single batched UPDATE, so the
+    write lock is held for a few statements rather than one query per repo.
+    Rows whose content hash matches the payload are not written at all.
+    Every repository on the page is recorded in repository_access for the
+    user, since GitHub lists a shared repository for each user who can see
+    it. Returns the number of rows written.
+    """
+    incoming = {repo_data['id']: repo_data for repo_data in repos_data}
+    if not incoming:
+        return 0
+    existing = existing_repositories(incoming, user_id)
+
+    inserts = []
+    updates = []
+    unlisted = []  # Repository.id of existing rows not yet listed for this user
+    for github_id, repo_data in incoming.items():
+        values = repository_values(repo_data)
+        values['content_hash'] = content_hash(values)
+        if github_id not in existing:
+            inserts.append(dict(values, github_id=github_id, user_id=user_id))
+            continue
+        row_id, digest, listed = existing[github_id]
+        if digest != values['content_hash']:
+            # Update existing repository; ownership is left as it was
+            updates.append(dict(values, id=row_id))
+        if not listed:
+            unlisted.append(row_id)
+
+    if inserts:
+        inserted = db.session.execute(
+            insert(Repository).returning(Repository.id), inserts
+        ).scalars().all()
+        unlisted.extend(inserted)
+    if updates:
+        db.session.execute(update(Repository), updates)
+    list_repositories(user_id, unlisted)
+    written = len(inserts) + len(updates)
+    write_counters.record('repository', written=written, skipped=len(incoming) - written)
+    return written
+
+
+async def fetch_repository_pages_async(client, token, per_page=REPOS_PER_PAGE, max_workers=PAGE_WORKERS):
+    """fetch_repository_pages() for an AsyncGitHubClient; same ordering and bounds"""
+    async def fetch(page_path):
+        response = await client.get(page_path, token=token)
+        if response.status_code != 200:
+            raise RepositoryFetchError(response.status_code)
+        return response
+
+    first = await fetch(repos_page_path(1, per_page))
+    yield first.json()
+
+    links = parse_link_header(first.headers.get('Link'))
+    last_page = page_number(links['last']) if 'last' in links else None
+
+    if last_page is None:
+        next_url = links.get('next')
+        while next_url:
+            response = await fetch(next_url)
+            yield response.json()
+            next_url = parse_link_header(response.headers.get('Link')).get('next')
+        return
+
+    remaining = iter(range(2, last_page + 1))
+    workers = max(1, min(max_workers, last_page - 1))
+    in_flight = set()
+    try:
+        for page in remaining:
+            in_flight.add(asyncio.ensure_future(fetch(repos_page_path(page, per_page))))
+            if len(in_flight) >= workers:
+                break
+        while in_flight:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result().json()
+                next_page = next(remaining, None)
+                if next_page is not None:
+                    in_flight.add(asyncio.ensure_future(fetch(repos_page_path(next_page, per_page))))
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+def write_repository_page(user_id, repos_data):
+    """Store one page of repositories in its own transaction"""
+    written = store_repository_page(user_id, repos_data)
+    db.session.commit()
+    return written
+
+
+def sync_user_repositories(client, user_id, token, on_page=None):
+    """Fetch every repository page and commit each one as it arrives.
+
+    Returns the number of repositories synced. `on_page` is called with each
+    page after it has been committed.
+    """
+    count = 0
+    for repos_data in fetch_repository_pages(client, token):
+        write_repository_page(user_id, repos_data)
+        count += len(repos_data)
+        if on_page is not None:
+            on_page(repos_data)
+    return count
+
+
+def mark_repositories_synced(user_id, watermark):
+    """Record a finished sync and its watermark on the User row.
+
+    updated_at is written back unchanged: the profile cache reads it as the
+    time the profile was last fetched.
+    """
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(repos_watermark=watermark, repos_synced_at=datetime.now(timezone.utc), updated_at=User.updated_at)
+    )
+    db.session.commit()
+
+
+def sync_changed_repositories(client, user_id, token, since=None, priority=PRIORITY_HIGH):
+    """Store repositories changed after the `since` watermark, or all of them when it is None.
+
+    Returns the number of rows written and the new watermark.
+    """
+    if since is None:
+        pages = fetch_repository_pages(client, token, priority=priority)
+    else:
+        pages = fetch_changed_pages(client, token, since, priority=priority)
+
+    count = 0
+    watermark = since or ''
+    for repos_data in pages:
+        if since is not None:
+            repos_data = [repo_data for repo_data in repos_data if changed_at(repo_data) > since]
+        if repos_data:
+            count += write_repository_page(user_id, repos_data)
+            watermark = max(watermark, max(changed_at(repo_data) for repo_data in repos_data))
+    return count, watermark or None
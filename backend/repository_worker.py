@@ -0,0 +1,129 @@
+"""
+Background repository sync.
+
+A daemon thread wakes up every `interval` seconds, picks the users whose
+repositories were last synced more than an interval ago and syncs them on a
+small worker pool. Each sync asks GitHub only for repositories changed since
+the user's watermark (see sync_changed_repositories), at low priority so it
+never eats into the rate-limit budget interactive requests need. The
+/api/repositories endpoint reads the Repository table and only syncs inline
+for a user who has never been synced.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, or_
+
+from github_ratelimit import PRIORITY_LOW
+from models import db, User
+from repository_sync import sync_changed_repositories, mark_repositories_synced
+from singleflight import SingleFlight
+
+
+class RepositorySyncWorker:
+    """Keeps every user's Repository rows in step with GitHub"""
+
+    def __init__(self, app, client, interval=300, max_concurrency=4):
+        self.app = app
+        self.client = client
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        # The scheduled run and a first page load may ask for the same user
+        self._syncs = SingleFlight(grace=0)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.runs = 0
+        self.synced = 0
+        self.failed = 0
+        self.repositories = 0
+        self.last_run_at = None
+
+    def sync_user(self, user_id, priority=PRIORITY_LOW):
+        """Sync one user's changed repositories now; returns how many were written"""
+        return self._syncs.do(user_id, lambda: self._sync_user(user_id, priority))
+
+    def _sync_user(self, user_id, priority):
+        with self.app.app_context():
+            user = db.session.get(User, user_id)
+            if user is None or not user.access_token:
+                return 0
+            token, since = user.access_token, user.repos_watermark
+            db.session.rollback()  # don't hold a read transaction across GitHub calls
+            try:
+                count, watermark = sync_changed_repositories(self.client, user_id, token, since, priority)
+                mark_repositories_synced(user_id, watermark)
+            except Exception:
+                db.session.rollback()
+                raise
+        with self._lock:
+            self.repositories += count
+        return count
+
+    def due_users(self):
+        """Ids of users with a token whose repositories are older than one interval"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.interval)
+        with self.app.app_context():
+            return list(db.session.scalars(
+                select(User.id)
+                .where(User.access_token.is_not(None))
+                .where(or_(User.repos_synced_at.is_(None), User.repos_synced_at < cutoff))
+                .order_by(User.repos_synced_at.is_not(None), User.repos_synced_at)
+            ))
+
+    def run_once(self):
+        """Sync every due user, at most max_concurrency at a time"""
+        user_ids = self.due_users()
+        if user_ids:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='repo-sync') as pool:
+                futures = {pool.submit(self.sync_user, user_id): user_id for user_id in user_ids}
+                for future, user_id in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        with self._lock:
+                            self.failed += 1
+                        self.app.logger.warning("Repository sync failed for user %s: %s", user_id, e)
+                    else:
+                        with self._lock:
+                            self.synced += 1
+        with self._lock:
+            self.runs += 1
+            self.last_run_at = time.time()
+        return len(user_ids)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception("Repository sync run failed")
+
+    def start(self):
+        """Start the schedule thread if it is not already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='repository-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'interval': self.interval,
+                'runs': self.runs,
+                'synced_users': self.synced,
+                'failed_users': self.failed,
+                'repositories_written': self.repositories,
+                'last_run_at': self.last_run_at,
+            }
@@ -0,0 +1,88 @@
+"""
+In-place schema upgrades for existing databases.
+
+db.create_all() creates missing tables but never touches tables that already
+exist, so a database created by an older version keeps its old columns.
+upgrade_schema() adds every model column a table lacks (nullable, without
+constraints, as SQLite's ALTER TABLE allows), creates missing indexes, and
+backfills values that lookups rely on. It is idempotent and runs at startup;
+for deployments served by gunicorn or uvicorn run it once before starting:
+
+    python schema.py
+"""
+from sqlalchemy import inspect, select, insert, update, text
+
+from github_cache import hash_token
+from models import db, User, Repository, repository_access
+
+BACKFILL_BATCH = 1000
+
+
+def add_missing_columns(connection):
+    """ALTER TABLE ... ADD COLUMN for model columns the database lacks; returns their names"""
+    inspector = inspect(connection)
+    added = []
+    for table in db.metadata.sorted_tables:
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            added.append(f'{table.name}.{column.name}')
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+    return added
+
+
+def backfill_token_hashes():
+    """Fill User.access_token_hash for rows stored before the column existed"""
+    filled = 0
+    while True:
+        rows = db.session.execute(
+            select(User.id, User.access_token)
+            .where(User.access_token_hash.is_(None), User.access_token.is_not(None))
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return filled
+        db.session.execute(update(User), [
+            {'id': user_id, 'access_token_hash': hash_token(token)} for user_id, token in rows
+        ])
+        db.session.commit()
+        filled += len(rows)
+
+
+def backfill_repository_access():
+    """List each repository for the user who synced it, for rows stored before repository_access existed"""
+    listed = select(repository_access.c.repository_id).where(
+        repository_access.c.repository_id == Repository.id, repository_access.c.user_id == Repository.user_id)
+    result = db.session.execute(insert(repository_access).from_select(
+        ['user_id', 'repository_id'],
+        select(Repository.user_id, Repository.id).where(Repository.user_id.is_not(None), ~listed.exists())))
+    db.session.commit()
+    return result.rowcount
+
+
+def upgrade_schema():
+    """Bring the database up to the current models; returns the columns added"""
+    db.create_all()
+    with db.engine.begin() as connection:
+        added = add_missing_columns(connection)
+    backfill_token_hashes()
+    backfill_repository_access()
+    if 'repository.changed_at' in added:
+        # Incremental syncs skip unchanged repositories; a full one fills in changed_at
+        db.session.execute(update(User).values(repos_watermark=None))
+        db.session.commit()
+    return added
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        added = upgrade_schema()
+        print(f"Added columns: {', '.join(added)}" if added else "Schema is up to date")
@@ -0,0 +1,194 @@
+"""
+Off-request derivation of screenshot variants.
+
+After a bug report is committed its screenshot key is queued here. A
+dispatcher thread hands each one to a process pool, where Pillow decodes the
+original once and writes two WebP files next to it in the store: a
+recompressed full-size copy and a small thumbnail, both without EXIF, ICC or
+XMP metadata. When a job finishes the derived keys are recorded on every
+report that shares the screenshot, so listings can ship the thumbnail. Image
+work never runs on a request thread, and a CPU-bound decode does not hold the
+GIL of the process serving requests.
+"""
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from models import db, BugReport
+from screenshot_store import DERIVED_SUFFIXES, derived_key, key_digest
+
+WEBP_SUFFIX, THUMBNAIL_SUFFIX = DERIVED_SUFFIXES
+
+
+def _save_webp(image, path, quality):
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.derive-', delete=False) as temp:
+        try:
+            image.save(temp, 'WEBP', quality=quality, method=4)
+        except BaseException:
+            os.unlink(temp.name)
+            raise
+    os.replace(temp.name, path)
+    return os.path.getsize(path)
+
+
+def render_derivatives(source_path, webp_path, thumbnail_path, thumbnail_size=320, quality=80):
+    """Write a metadata-free WebP and thumbnail of source_path; runs in a worker process"""
+    with Image.open(source_path) as original:
+        original.seek(0)  # first frame of an animation
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.info = {}  # drop EXIF, ICC and XMP carried over from the upload
+        sizes = {'webp': _save_webp(image, webp_path, quality)}
+        image.thumbnail((thumbnail_size, thumbnail_size))
+        sizes['thumbnail'] = _save_webp(image, thumbnail_path, quality)
+    return sizes
+
+
+class ScreenshotPipeline:
+    """Bounded queue of screenshots, rendered by a process pool off the request path"""
+
+    def __init__(self, app, store, max_workers=2, maxsize=1000, thumbnail_size=320, quality=80):
+        self.app = app
+        self.store = store
+        self.max_workers = max_workers
+        self.thumbnail_size = thumbnail_size
+        self.quality = quality
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._slots = threading.BoundedSemaphore(max_workers * 2)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._thread = None
+        self.counts = {'queued': 0, 'dropped': 0, 'skipped': 0, 'rendered': 0, 'failed': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def submit(self, key):
+        """Queue a stored screenshot for rendering; returns False when the queue is full"""
+        if not key or key_digest(key) is None:
+            self._count('skipped')  # legacy flat uploads have no derived keys
+            return False
+        try:
+            self._queue.put_nowait(key)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('queued')
+        return True
+
+    def _job(self, key):
+        webp_key, thumbnail_key = derived_key(key, WEBP_SUFFIX), derived_key(key, THUMBNAIL_SUFFIX)
+        args = (
+            self.store.local_path(key),
+            self.store.local_path(webp_key),
+            self.store.local_path(thumbnail_key),
+            self.thumbnail_size,
+            self.quality,
+        )
+        return webp_key, thumbnail_key, args
+
+    def rendered(self, key):
+        """Derived keys if this screenshot was already rendered for an earlier report"""
+        if key_digest(key) is None:
+            return None
+        webp_key, thumbnail_key = derived_key(key, WEBP_SUFFIX), derived_key(key, THUMBNAIL_SUFFIX)
+        if self.store.exists(webp_key) and self.store.exists(thumbnail_key):
+            return webp_key, thumbnail_key
+        return None
+
+    def record(self, key, webp_key, thumbnail_key):
+        """Point every report sharing this screenshot at its derived files"""
+        with self.app.app_context():
+            try:
+                BugReport.query.filter_by(screenshot_path=key).update(
+                    {'screenshot_webp_path': webp_key, 'thumbnail_path': thumbnail_key},
+                    synchronize_session=False,
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def process(self, key):
+        """Render and record one screenshot on the calling thread"""
+        webp_key, thumbnail_key, args = self._job(key)
+        try:
+            render_derivatives(*args)
+            self.record(key, webp_key, thumbnail_key)
+        except Exception:
+            self._count('failed')
+            self.app.logger.warning("Could not render screenshot %s", key, exc_info=True)
+            return False
+        self._count('rendered')
+        return True
+
+    def drain(self):
+        """Process everything queued so far on the calling thread"""
+        while True:
+            try:
+                key = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.process(key)
+            finally:
+                self._queue.task_done()
+
+    def _run(self):
+        while True:
+            key = self._queue.get()
+            self._slots.acquire()  # keep at most two jobs per worker in flight
+            try:
+                webp_key, thumbnail_key, args = self._job(key)
+                future = self._executor.submit(render_derivatives, *args)
+                future.add_done_callback(
+                    lambda future, key=key, webp_key=webp_key, thumbnail_key=thumbnail_key:
+                        self._done(key, webp_key, thumbnail_key, future))
+            except Exception:
+                self._slots.release()
+                self._count('failed')
+                self.app.logger.exception("Screenshot pipeline error")
+            finally:
+                self._queue.task_done()
+
+    def _done(self, key, webp_key, thumbnail_key, future):
+        try:
+            future.result()
+            self.record(key, webp_key, thumbnail_key)
+        except Exception:
+            self._count('failed')
+            self.app.logger.warning("Could not render screenshot %s", key, exc_info=True)
+        else:
+            self._count('rendered')
+        finally:
+            self._slots.release()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._executor is None:
+                # spawn, not fork: the serving process has threads and open connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            self._thread = threading.Thread(target=self._run, name='screenshot-pipeline', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, backlog=self._queue.qsize())
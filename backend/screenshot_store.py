@@ -0,0 +1,247 @@
+"""
+Content-addressed storage for bug report screenshots.
+
+A screenshot is stored once under the SHA-256 of its bytes, at a key such as
+'3f/a2/3fa2...e9.png'; the two leading shard directories keep any one
+directory small. BugReport.screenshot_path holds the key, so identical
+uploads share one file and the number of reports naming a key is its
+reference count: release_screenshots() deletes a file once no report refers
+to it any more. Files are written to a temporary name and renamed into place,
+so readers never see a partial screenshot.
+
+Files rendered from a screenshot (see screenshot_pipeline) sit beside it as
+'<sha256>.<suffix>' and are released together with it.
+
+A report's row commits some time after its screenshot is placed, and in that
+gap the reference count does not see it yet. So the store holds on to each
+placed upload until settle() is called after the commit: release_screenshots()
+skips held keys, and settle() puts the file back from the held copy if
+another process released it in the meantime. Placing, settling and releasing
+take the store's lock, a flock on the root directory shared by every worker.
+
+ScreenshotStore is the interface the app talks to; LocalScreenshotStore keeps
+files on the local filesystem. An object-store backend implements the same
+methods, returning None from local_path().
+"""
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers this process
+    fcntl = None
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from models import db, BugReport
+from uploads import StreamingUpload
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+DERIVED_SUFFIXES = ('opt.webp', 'thumb.webp')
+
+
+def screenshot_key(sha256, extension):
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+
+def key_digest(key):
+    """The SHA-256 a key was derived from, or None for a legacy path"""
+    name, _, extension = os.path.basename(key).partition('.')
+    return name if key == screenshot_key(name, extension) and len(name) == 64 else None
+
+
+def derived_key(key, suffix):
+    """Key of a file rendered from a stored screenshot, e.g. '<sha256>.thumb.webp'"""
+    return screenshot_key(key_digest(key), suffix)
+
+
+class ScreenshotStore(ABC):
+    """Interface for screenshot backends"""
+
+    @abstractmethod
+    def put_upload(self, upload, extension):
+        """Store a StreamingUpload and hold it until settle(); returns the key"""
+
+    @abstractmethod
+    def put(self, fileobj, extension):
+        """Store the contents of a readable file object and hold it until settle(); returns the key"""
+
+    @abstractmethod
+    def settle(self, keys):
+        """Let go of uploads held for keys once the reports naming them have committed"""
+
+    @abstractmethod
+    def holds(self, key):
+        """True while an upload placed at key waits for settle()"""
+
+    @abstractmethod
+    def locked(self):
+        """Context manager serialising placement, settling and release"""
+
+    @abstractmethod
+    def open(self, key):
+        """Readable binary file object for key"""
+
+    @abstractmethod
+    def exists(self, key):
+        """True if a file is stored at key"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove the file at key; returns False if there was none"""
+
+    def local_path(self, key):
+        """Filesystem path for key, or None if the backend has no local files"""
+        return None
+
+
+class LocalScreenshotStore(ScreenshotStore):
+    """Sharded directory tree on the local filesystem"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._root_fd = os.open(root, os.O_RDONLY) if fcntl else None
+        self._held = {}  # key -> uploads placed there whose reports have not committed
+
+    def local_path(self, key):
+        # Rows written before content addressing hold absolute paths
+        if os.path.isabs(key):
+            return key
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.join(os.path.normpath(self.root), '')):
+            raise ValueError(f'screenshot key escapes the store: {key}')
+        return path
+
+    @contextmanager
+    def locked(self):
+        with self._lock:
+            if self._root_fd is None:
+                yield
+                return
+            fcntl.flock(self._root_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._root_fd, fcntl.LOCK_UN)
+
+    def _link(self, upload, path):
+        """Place a copy of the upload at path, keeping the upload itself"""
+        upload.flush()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(upload.path, path)
+        except OSError:
+            # No hard links here: copy under a temporary name, then rename
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            shutil.copyfile(upload.path, temp_path)
+            os.replace(temp_path, path)
+
+    def put_upload(self, upload, extension):
+        key = screenshot_key(upload.sha256, extension)
+        path = self.local_path(key)
+        with self.locked():
+            if not os.path.exists(path):
+                self._link(upload, path)
+            self._held.setdefault(key, []).append(upload)
+        return key
+
+    def put(self, fileobj, extension):
+        upload = StreamingUpload(self.root)
+        try:
+            for chunk in iter(lambda: fileobj.read(64 * 1024), b''):
+                upload.write(chunk)
+        except BaseException:
+            upload.close()
+            raise
+        return self.put_upload(upload, extension)
+
+    def settle(self, keys):
+        for key in keys:
+            with self.locked():
+                held = self._held.get(key)
+                if not held:
+                    continue
+                upload = held.pop()
+                if not held:
+                    del self._held[key]
+                path = self.local_path(key)
+                if not os.path.exists(path):
+                    # Released by another worker between placement and commit
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    upload.move_to(path)
+                upload.close()
+
+    def holds(self, key):
+        return bool(self._held.get(key))
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.unlink(self.local_path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+
+def screenshot_references(key, connection=None):
+    """How many bug reports point at a stored screenshot"""
+    query = select(func.count()).select_from(BugReport).where(BugReport.screenshot_path == key)
+    return (connection or db.session).execute(query).scalar()
+
+
+def release_screenshots(store, keys, connection=None):
+    """Delete the stored files of keys no bug report refers to any more"""
+    released = 0
+    for key in set(keys):
+        if not key:
+            continue
+        with store.locked():
+            # A held key belongs to a report that has not committed yet
+            if store.holds(key) or screenshot_references(key, connection) != 0:
+                continue
+            if store.delete(key):
+                released += 1
+            if key_digest(key) is not None:
+                for suffix in DERIVED_SUFFIXES:
+                    store.delete(derived_key(key, suffix))
+    return released
+
+
+def watch_screenshot_references(store):
+    """Release a screenshot when the last bug report naming it is deleted"""
+
+    @event.listens_for(Session, 'after_flush')
+    def collect_released(session, flush_context):
+        keys = [obj.screenshot_path for obj in session.deleted
+                if isinstance(obj, BugReport) and obj.screenshot_path]
+        if keys:
+            session.info.setdefault('released_screenshots', set()).update(keys)
+
+    @event.listens_for(Session, 'after_commit')
+    def release_after_commit(session):
+        keys = session.info.pop('released_screenshots', None)
+        if keys:
+            # The committed session cannot emit SQL, so count on a fresh connection
+            with session.get_bind().connect() as connection:
+                release_screenshots(store, keys, connection)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def forget_released(session, previous_transaction):
+        session.info.pop('released_screenshots', None)
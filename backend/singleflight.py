@@ -0,0 +1,159 @@
+"""
+In-process coalescing of identical concurrent calls.
+
+When several requests ask for the same thing at once (the React app mounting
+fires /api/user and /api/repositories more than once per session), only the
+first caller runs the work; the others wait for it and share its result. The
+result is kept for a short grace window after completion so callers arriving
+just behind the leader are served too. Exceptions are shared with the callers
+that were waiting but are never kept for the grace window.
+"""
+import asyncio
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'done_at')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.done_at = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome"""
+
+    def __init__(self, grace=0.25, sweep_threshold=1024, clock=time.monotonic):
+        self.grace = grace
+        self.sweep_threshold = sweep_threshold
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.collapsed = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done_at is not None and call.done_at + self.grace <= self._clock():
+                del self._calls[key]
+                call = None
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                if len(self._calls) >= self.sweep_threshold:
+                    self._sweep()
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                call.done_at = self._clock()
+                if call.error is not None or self.grace <= 0:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def _sweep(self):
+        # Called with the lock held; drops results whose grace window has passed
+        now = self._clock()
+        expired = [k for k, c in self._calls.items() if c.done_at is not None and c.done_at + self.grace <= now]
+        for key in expired:
+            del self._calls[key]
+
+    def forget(self, key):
+        """Drop a completed result so the next caller runs the work again"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done_at is not None:
+                del self._calls[key]
+
+    def clear(self):
+        with self._lock:
+            for key in [k for k, c in self._calls.items() if c.done_at is not None]:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': sum(1 for c in self._calls.values() if c.done_at is None),
+                'executed': self.executed,
+                'collapsed': self.collapsed,
+            }
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines; must only be used from one event loop"""
+
+    def __init__(self, grace=0.25, sweep_threshold=1024, clock=time.monotonic):
+        self.grace = grace
+        self.sweep_threshold = sweep_threshold
+        self._clock = clock
+        self._calls = {}  # key -> (future, done_at)
+        self.executed = 0
+        self.collapsed = 0
+
+    async def do(self, key, fn):
+        entry = self._calls.get(key)
+        if entry is not None and entry[1] is not None and entry[1] + self.grace <= self._clock():
+            del self._calls[key]
+            entry = None
+        if entry is not None:
+            self.collapsed += 1
+            return await asyncio.shield(entry[0])
+
+        if len(self._calls) >= self.sweep_threshold:
+            now = self._clock()
+            for expired in [k for k, (_, done_at) in self._calls.items()
+                            if done_at is not None and done_at + self.grace <= now]:
+                del self._calls[expired]
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = (future, None)
+        self.executed += 1
+        try:
+            result = await fn()
+        except BaseException as exc:
+            if self._calls.get(key, (None,))[0] is future:
+                del self._calls[key]
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        future.set_result(result)
+        if self.grace > 0:
+            self._calls[key] = (future, self._clock())
+        elif self._calls.get(key, (None,))[0] is future:
+            del self._calls[key]
+        return result
+
+    def forget(self, key):
+        entry = self._calls.get(key)
+        if entry is not None and entry[1] is not None:
+            del self._calls[key]
+
+    def clear(self):
+        for key in [k for k, (_, done_at) in self._calls.items() if done_at is not None]:
+            del self._calls[key]
+
+    def stats(self):
+        return {
+            'in_flight': sum(1 for _, done_at in self._calls.values() if done_at is None),
+            'executed': self.executed,
+            'collapsed': self.collapsed,
+        }
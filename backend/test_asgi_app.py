@@ -0,0 +1,211 @@
+import unittest
+import asyncio
+import json
+import httpx
+from app import app, db, User, Repository, BugReport, github_calls, profile_cache, submission_limiter
+import asgi_app
+from asgi_app import application, async_github, async_calls
+
+def make_repo(repo_id):
+    return {
+        'id': repo_id,
+        'name': f'repo-{repo_id}',
+        'full_name': f'testuser/repo-{repo_id}',
+        'html_url': f'https://github.com/testuser/repo-{repo_id}',
+        'private': False
+    }
+
+class FakeGitHub:
+    """httpx MockTransport handler serving /user and paginated /user/repos"""
+
+    def __init__(self, pages=1, per_page=3, user_status=200, repos_status=200, delay=0.0):
+        self.pages = pages
+        self.per_page = per_page
+        self.user_status = user_status
+        self.repos_status = repos_status
+        self.delay = delay
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(request.url.path)
+        await asyncio.sleep(self.delay)
+        if request.url.path == '/user':
+            return httpx.Response(self.user_status, json={
+                'id': 12345, 'login': 'testuser', 'email': 'test@example.com', 'avatar_url': None
+            })
+        page = int(request.url.params.get('page', 1))
+        headers = {}
+        if page == 1 and self.pages > 1:
+            base = 'https://api.github.com/user/repos?per_page=100&sort=updated'
+            headers['Link'] = f'<{base}&page=2>; rel="next", <{base}&page={self.pages}>; rel="last"'
+        start = (page - 1) * self.per_page
+        repos = [make_repo(start + i + 1) for i in range(self.per_page)]
+        return httpx.Response(self.repos_status, json=repos, headers=headers)
+
+class TestAsgiApp(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        github_calls.clear()
+        async_calls.clear()
+        profile_cache.clear()
+        async_github.cache.clear()
+        async_github.scheduler.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def session_cookie(self, token):
+        serializer = app.session_interface.get_signing_serializer(app)
+        return {app.config['SESSION_COOKIE_NAME']: serializer.dumps({'github_token': token})}
+
+    def run_requests(self, upstream, *paths, token='test_token'):
+        """Issue the requests concurrently against the ASGI app with GitHub mocked"""
+        async def scenario():
+            async_github._client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+            cookies = self.session_cookie(token) if token else None
+            transport = httpx.ASGITransport(app=application)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url='http://testserver',
+                                             cookies=cookies) as client:
+                    return await asyncio.gather(*(client.get(path) for path in paths))
+            finally:
+                await async_github.aclose()
+        return asyncio.run(scenario())
+
+    def test_user_not_authenticated(self):
+        """Test that /api/user without a session is refused"""
+        response, = self.run_requests(FakeGitHub(), '/api/user', token=None)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['error'], 'Not authenticated')
+
+    def test_user_is_fetched_and_stored(self):
+        """Test that /api/user fetches the profile asynchronously and stores the user"""
+        upstream = FakeGitHub()
+        response, = self.run_requests(upstream, '/api/user')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['login'], 'testuser')
+        self.assertEqual(upstream.requests, ['/user'])
+        with app.app_context():
+            user = User.query.filter_by(github_id=12345).first()
+            self.assertEqual(user.access_token, 'test_token')
+
+    def test_concurrent_requests_share_one_upstream_call(self):
+        """Test that concurrent /me requests for a session make one GitHub call"""
+        upstream = FakeGitHub(delay=0.05)
+        responses = self.run_requests(upstream, *['/me'] * 20)
+
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        self.assertEqual(upstream.requests, ['/user'])
+
+    def test_me_redirects_on_github_failure(self):
+        """Test that /me redirects when GitHub refuses the token"""
+        response, = self.run_requests(FakeGitHub(user_status=401), '/me')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.headers['location'], '/?error=failed_to_fetch_user')
+
+    def test_repositories_are_synced(self):
+        """Test that every page of repositories is fetched and stored"""
+        with app.app_context():
+            user = User(github_id=12345, username='testuser', access_token='test_token')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        upstream = FakeGitHub(pages=4, per_page=25)
+        response, = self.run_requests(upstream, '/api/repositories')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 100)
+        with app.app_context():
+            self.assertEqual(Repository.query.filter_by(user_id=user_id).count(), 100)
+
+    def test_repository_fetch_failure(self):
+        """Test that a failing GitHub listing yields a 500"""
+        with app.app_context():
+            db.session.add(User(github_id=12345, username='testuser', access_token='test_token'))
+            db.session.commit()
+
+        response, = self.run_requests(FakeGitHub(repos_status=500), '/api/repositories')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['error'], 'Failed to fetch repositories')
+
+    def test_other_routes_are_served_by_flask(self):
+        """Test that paths without an async handler fall through to the Flask app"""
+        response, = self.run_requests(FakeGitHub(), '/api/bug-reports', token=None)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('bug_reports', response.json())
+
+    def stream_request(self, path, headers, chunks):
+        """POST chunks through the ASGI app; returns (status, JSON body, body messages read)"""
+        async def scenario():
+            messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                        for i, chunk in enumerate(chunks)]
+            read = []
+            sent = []
+
+            async def receive():
+                if messages:
+                    read.append(messages[0])
+                    return messages.pop(0)
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'',
+                     'headers': headers, 'client': ('10.0.0.9', 1234), 'server': ('testserver', 80)}
+            await application(scope, receive, send)
+            payload = b''.join(message.get('body', b'') for message in sent[1:])
+            return sent[0]['status'], json.loads(payload), len(read)
+        return asyncio.run(scenario())
+
+    def test_flask_reads_the_body_as_it_arrives(self):
+        """Test that a fallback request body is streamed to Flask, split across messages"""
+        submission_limiter.clear()
+        body = b'title=Broken+button&description=It+does+nothing'
+        status, payload, read = self.stream_request('/api/bug-report', [
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', str(len(body)).encode()),
+        ], [body[:10], body[10:30], body[30:]])
+        self.assertEqual(status, 201)
+        self.assertEqual(read, 3)
+        with app.app_context():
+            self.assertEqual(BugReport.query.one().title, 'Broken button')
+
+    def test_oversized_upload_is_refused_before_its_body_is_read(self):
+        """Test that a Content-Length over the bug report limit is answered without reading the body"""
+        submission_limiter.clear()
+        chunk = b'x' * (1024 * 1024)
+        status, payload, read = self.stream_request('/api/bug-report', [
+            (b'content-type', b'multipart/form-data; boundary=x'),
+            (b'content-length', str(len(chunk) * 100).encode()),
+        ], [chunk] * 100)
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['error'], 'File size too large. Maximum size is 5MB.')
+        self.assertEqual(read, 0)
+
+    def test_chunked_upload_is_cut_off_at_the_limit(self):
+        """Test that a body without Content-Length stops being read once it passes the limit"""
+        submission_limiter.clear()
+        head = (b'--x\r\nContent-Disposition: form-data; name="screenshot"; filename="s.png"\r\n'
+                b'Content-Type: image/png\r\n\r\n\x89PNG\r\n\x1a\n')
+        status, payload, read = self.stream_request('/api/bug-report', [
+            (b'content-type', b'multipart/form-data; boundary=x'),
+            (b'transfer-encoding', b'chunked'),
+        ], [head] + [b'x' * (1024 * 1024)] * 100)
+        self.assertEqual(status, 400)
+        self.assertEqual(payload['error'], 'File size too large. Maximum size is 5MB.')
+        self.assertLess(read, 10)
+
+    def test_session_cookie_must_be_signed(self):
+        """Test that a tampered session cookie is treated as no session"""
+        scope = {'headers': [(b'cookie', b'session=forged.value.sig')]}
+        self.assertIsNone(asgi_app.session_token(scope))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,8 @@ import os
 import signal
 from unittest.mock import patch, MagicMock
 from io import BytesIO
-from app import app, submission_history, validate_bug_report_data, is_rate_limited
+from app import app, submission_limiter, validate_bug_report_data, is_rate_limited
+from device_profiles import device_profile_ids
 
 class TestBugReportAPI(unittest.TestCase):
     # Set timeout for all test methods (30 seconds)
@@ -25,7 +26,8 @@ class TestBugReportAPI(unittest.TestCase):
             db.create_all()
         
         # Clear rate limiting history for each test
-        submission_history.clear()
+        submission_limiter.clear()
+        device_profile_ids.clear()
 
     def tearDown(self):
         # Cancel the timeout alarm
@@ -361,20 +363,21 @@ Viewport: 1200x800"""
     def test_rate_limiting_is_per_ip(self):
         """Test that rate limiting is applied per IP address"""
         # Test the rate limiting function directly without Flask context
-        from app import is_rate_limited, submission_history
-        import time
+        from app import is_rate_limited, submission_limiter
         
         # Clear any existing history
-        submission_history.clear()
+        submission_limiter.clear()
         
         # Test that new IP is not rate limited
         self.assertFalse(is_rate_limited('192.168.1.1'))
         
         # Add submissions for this IP to trigger rate limiting
-        submission_history['192.168.1.1'] = [time.time()] * 5
+        for _ in range(5):
+            submission_limiter.hit('192.168.1.1')
         
-        # Now the IP should be rate limited
+        # Now the IP should be rate limited, but not its neighbour
         self.assertTrue(is_rate_limited('192.168.1.1'))
+        self.assertFalse(is_rate_limited('192.168.1.2'))
 
     def test_old_submissions_are_excluded_from_rate_limiting(self):
         """Test that submissions older than 1 hour don't count toward rate limit"""
@@ -382,7 +385,8 @@ Viewport: 1200x800"""
         
         # Add old submissions (more than 1 hour ago)
         old_time = time.time() - 7200  # 2 hours ago
-        submission_history['192.168.1.1'] = [old_time] * 10
+        for _ in range(10):
+            submission_limiter.hit('192.168.1.1', now=old_time)
         
         # Should not be rate limited because submissions are old
         self.assertFalse(is_rate_limited('192.168.1.1'))
@@ -0,0 +1,102 @@
+import json
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+from app import app, db, User, BugReport, bug_report_writer, submission_limiter
+from user_lookup import token_users
+from device_profiles import device_profile_ids
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x02' * 32
+
+def ndjson(*records):
+    return ''.join((r if isinstance(r, str) else json.dumps(r)) + '\n' for r in records).encode()
+
+class TestBulkIngest(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(github_id=12345, username='harness', access_token='harness_token'))
+            db.session.commit()
+        token_users.clear()
+        submission_limiter.clear()
+        device_profile_ids.clear()
+        self.headers = {'Authorization': 'Bearer harness_token'}
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def post(self, body, **kwargs):
+        kwargs.setdefault('content_type', 'application/x-ndjson')
+        response = self.app.post('/api/bug-reports/bulk', data=body, headers=self.headers, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.data.decode().splitlines()]
+
+    def test_records_are_validated_and_reported_per_line(self):
+        """Test that good records are created and bad ones get their own errors"""
+        lines = self.post(ndjson(
+            {'title': 'First', 'description': 'Broken button', 'deviceInfo': {'browser': 'Firefox'}},
+            {'title': '', 'description': 'No title'},
+            'not json',
+            '',
+            {'title': 'Second', 'description': 'Broken link', 'repository_id': '7'},
+        ))
+        self.assertEqual(lines[0]['line'], 2)
+        self.assertIn('Title is required', lines[0]['errors'])
+        self.assertEqual(lines[1], {'line': 3, 'errors': ['Invalid JSON']})
+        self.assertEqual([line['line'] for line in lines[2:4]], [1, 5])
+        self.assertEqual(lines[-1], {'summary': {'records': 4, 'created': 2, 'failed': 2, 'duplicates': 0}})
+        with app.app_context():
+            first = db.session.get(BugReport, lines[2]['id'])
+            self.assertEqual(first.user.username, 'harness')
+            self.assertEqual(json.loads(first.device_info), {'browser': 'Firefox'})
+            self.assertEqual(db.session.get(BugReport, lines[3]['id']).repository_id, 7)
+
+    def test_inserts_are_chunked(self):
+        """Test that records are committed BULK_CHUNK_SIZE at a time"""
+        batches = bug_report_writer.stats()['batches']
+        with patch('app.BULK_CHUNK_SIZE', 2):
+            lines = self.post(ndjson(*({'title': f'Bug {i}', 'description': 'd'} for i in range(5))))
+        self.assertEqual(lines[-1]['summary']['created'], 5)
+        self.assertEqual(bug_report_writer.stats()['batches'] - batches, 3)
+        with app.app_context():
+            self.assertEqual(BugReport.query.count(), 5)
+
+    def test_multipart_with_shared_screenshot(self):
+        """Test that records can reference attached screenshots by field name"""
+        reports = ndjson(
+            {'title': 'A', 'description': 'd', 'screenshot': 'shot'},
+            {'title': 'B', 'description': 'd', 'screenshot': 'shot'},
+            {'title': 'C', 'description': 'd', 'screenshot': 'missing'},
+        )
+        lines = self.post({
+            'reports': (BytesIO(reports), 'reports.ndjson'),
+            'shot': (BytesIO(PNG), 'shot.png'),
+        }, content_type='multipart/form-data')
+        self.assertEqual(lines[0], {'line': 3, 'errors': ["No attached file named 'missing'"]})
+        with app.app_context():
+            keys = {db.session.get(BugReport, line['id']).screenshot_path for line in lines[1:3]}
+        self.assertEqual(len(keys), 1)
+        self.assertTrue(keys.pop().endswith('.png'))
+
+    def test_record_limit(self):
+        """Test that records past BULK_MAX_RECORDS are refused"""
+        with patch('app.BULK_MAX_RECORDS', 2):
+            lines = self.post(ndjson(*({'title': f'Bug {i}', 'description': 'd'} for i in range(4))))
+        self.assertEqual(lines[0], {'line': 3, 'errors': ['Too many records. Maximum is 2.']})
+        self.assertEqual(lines[-1]['summary']['created'], 2)
+
+    def test_requires_authentication_and_ndjson(self):
+        """Test the responses given before any record is read"""
+        response = self.app.post('/api/bug-reports/bulk', data=ndjson({'title': 't', 'description': 'd'}),
+                                 content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 401)
+        response = self.app.post('/api/bug-reports/bulk', json={'title': 't'}, headers=self.headers)
+        self.assertEqual(response.status_code, 415)
+
+if __name__ == '__main__':
+    unittest.main()
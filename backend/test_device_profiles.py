@@ -0,0 +1,143 @@
+import json
+import unittest
+from sqlalchemy import text
+from app import app, db, BugReport, DeviceProfile, duplicates, submission_limiter
+from device_profiles import device_profile_ids, encode_device_info, parse_device_info, parse_user_agent, describe
+
+IPHONE = ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 '
+          '(KHTML, like Gecko) Version/17.4 Mobile/15E148 Safari/604.1')
+CHROME = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+          '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36')
+
+def frontend_device_info(user_agent=IPHONE, timestamp='2024-05-01T10:00:00.000Z'):
+    """What App.js posts as deviceInfo"""
+    return json.dumps({'userAgent': user_agent, 'platform': 'iPhone', 'language': 'en-US',
+                       'screenResolution': '393x852', 'viewport': '393x659', 'timestamp': timestamp})
+
+class TestParsing(unittest.TestCase):
+    def test_user_agents(self):
+        """Test that common user agents resolve to browser and OS versions"""
+        cases = [
+            (IPHONE, ('Safari', '17.4', 'iOS', '17.4')),
+            (CHROME, ('Chrome', '124.0.0.0', 'Windows', '10')),
+            ('Mozilla/5.0 (X11; Linux x86_64; rv:126.0) Gecko/20100101 Firefox/126.0', ('Firefox', '126.0', 'Linux', None)),
+            ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) '
+             'Chrome/124.0.0.0 Safari/537.36 Edg/124.0.2478.80', ('Edge', '124.0.2478.80', 'macOS', '10.15.7')),
+            ('Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 (KHTML, like Gecko) '
+             'SamsungBrowser/24.0 Chrome/117.0.0.0 Mobile Safari/537.36', ('Samsung Internet', '24.0', 'Android', '14')),
+            ('Chrome 91.0.4472.124', ('Chrome', '91.0.4472.124', None, None)),
+            ('Not a valid device info format', (None, None, None, None)),
+        ]
+        for user_agent, expected in cases:
+            with self.subTest(user_agent=user_agent):
+                fields = parse_user_agent(user_agent)
+                self.assertEqual((fields['browser'], fields['browser_version'], fields['os'], fields['os_version']), expected)
+
+    def test_text_lines_split_stable_and_volatile_values(self):
+        """Test that the form's Key: value text keeps its timestamp out of the profile"""
+        format, stable, volatile = parse_device_info('Browser: Mobile Safari\nPlatform: iOS 15.6\nTimestamp: now')
+        self.assertEqual(format, 'text')
+        self.assertEqual(stable, [['Browser', 'Mobile Safari'], ['Platform', 'iOS 15.6']])
+        self.assertEqual(volatile, [[2, 'Timestamp', 'now']])
+        fields = describe(format, stable)
+        self.assertEqual((fields['browser'], fields['os'], fields['os_major']), ('Safari', 'iOS', 15))
+
+    def test_free_text_is_kept_whole(self):
+        """Test that unparseable device info is stored as one raw value"""
+        self.assertEqual(parse_device_info('Mozilla/5.0 Chrome Windows'), ('raw', [['', 'Mozilla/5.0 Chrome Windows']], []))
+
+class TestDeviceProfiles(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        submission_limiter.clear()
+        device_profile_ids.clear()
+        duplicates.clear()
+
+    def tearDown(self):
+        duplicates.clear()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def submit(self, device_info, title='Broken button', ip='10.0.0.1'):
+        response = self.app.post('/api/bug-report', data={
+            'title': title, 'description': 'It does nothing', 'deviceInfo': device_info,
+        }, environ_base={'REMOTE_ADDR': ip})
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['bug_report_id']
+
+    def test_reports_from_one_device_share_a_profile(self):
+        """Test that repeated device info is stored once and rendered back per report"""
+        first = self.submit(frontend_device_info(timestamp='2024-05-01T10:00:00.000Z'))
+        second = self.submit(frontend_device_info(timestamp='2024-05-02T11:00:00.000Z'), ip='10.0.0.2')
+        with app.app_context():
+            self.assertEqual(DeviceProfile.query.count(), 1)
+            first, second = db.session.get(BugReport, first), db.session.get(BugReport, second)
+            self.assertEqual(first.device_profile_id, second.device_profile_id)
+            self.assertIsNone(first.device_info_raw)
+            self.assertEqual(json.loads(second.device_info),
+                             json.loads(frontend_device_info(timestamp='2024-05-02T11:00:00.000Z')))
+            self.assertLess(len(second.device_details), 60)
+            profile = first.device_profile
+            self.assertEqual((profile.browser, profile.browser_major, profile.os, profile.os_major), ('Safari', 17, 'iOS', 17))
+            self.assertEqual(profile.screen_resolution, '393x852')
+
+    def test_device_info_round_trips_in_submitted_format(self):
+        """Test that text and free-form device info read back as submitted"""
+        lines = 'Browser: Chrome 91.0.4472.124\nPlatform: Windows 10\nScreen: 1920x1080\nTimestamp: 2024-05-01'
+        with app.app_context():
+            for device_info in (lines, 'Mozilla/5.0 Chrome Windows'):
+                report = BugReport(title='t', description='d', **encode_device_info(device_info))
+                db.session.add(report)
+                db.session.commit()
+                self.assertEqual(db.session.get(BugReport, report.id).device_info, device_info)
+            self.assertEqual(encode_device_info(''), {'device_profile_id': None, 'device_details': None})
+
+    def test_legacy_free_text_is_still_readable(self):
+        """Test that reports stored before profiles fall back to their raw text"""
+        with app.app_context():
+            report = BugReport(title='t', description='d', device_info='Runtime: Go 1.19')
+            db.session.add(report)
+            db.session.commit()
+            self.assertEqual(db.session.get(BugReport, report.id).device_info, 'Runtime: Go 1.19')
+            self.assertIsNone(report.device_profile_id)
+
+    def test_filter_by_browser_and_os(self):
+        """Test that listings filter on the indexed browser and OS columns"""
+        safari = self.submit(frontend_device_info())
+        self.submit(frontend_device_info(user_agent=CHROME), title='Other', ip='10.0.0.2')
+        self.submit('Mozilla/5.0 Chrome Windows', title='Legacy', ip='10.0.0.3')
+
+        response = self.app.get('/api/bug-reports?browser=Safari&browser_version=17&os=iOS')
+        reports = response.get_json()['bug_reports']
+        self.assertEqual([report['id'] for report in reports], [safari])
+        self.assertEqual(reports[0]['device']['browser_version'], '17.4')
+        response = self.app.get('/api/bug-reports?os=Windows&os_version=10')
+        self.assertEqual([report['title'] for report in response.get_json()['bug_reports']], ['Other'])
+
+    def test_non_numeric_versions_are_rejected(self):
+        """Test that a version filter without a major number answers 400, not 500"""
+        for query in ('browser_version=latest', 'os_version=x.1', 'browser=Safari&browser_version=.17'):
+            with self.subTest(query=query):
+                response = self.app.get(f'/api/bug-reports?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('version number', response.get_json()['error'])
+        self.assertEqual(self.app.get('/api/bug-reports?browser_version=17.4').status_code, 200)
+
+    def test_browser_query_uses_index(self):
+        """Test that 'Safari 17 on iOS' is an index search, not a scan"""
+        with app.app_context():
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT bug_report.id FROM bug_report JOIN device_profile "
+                "ON device_profile.id = bug_report.device_profile_id "
+                "WHERE device_profile.browser = 'Safari' AND device_profile.browser_major = 17 "
+                "AND device_profile.os = 'iOS'")).all()
+        details = ' '.join(row[-1] for row in plan)
+        self.assertIn('ix_device_profile_browser', details)
+        self.assertIn('ix_bug_report_device_profile_id', details)
+
+if __name__ == '__main__':
+    unittest.main()
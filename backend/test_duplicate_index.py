@@ -0,0 +1,184 @@
+import json
+import unittest
+from unittest.mock import patch
+from app import app, db, User, BugReport, duplicates, submission_limiter
+from duplicate_index import DuplicateIndex, signature, similarity, shingles
+from user_lookup import token_users
+
+CRASH = ('App crashes when uploading a large photo',
+         'Open the gallery, pick a photo over 10MB and tap upload. The app freezes and then crashes to the home screen.')
+CRASH_AGAIN = ('App crashes when uploading a big photo',
+               'Open the gallery, pick a photo over 10MB and tap upload. The app freezes and then crashes to the home screen.')
+LOGIN = ('Login button does nothing on Safari',
+         'Clicking the GitHub login button on Safari 17 shows no redirect and no error in the console.')
+
+class TestSignatures(unittest.TestCase):
+    def test_shingles_are_words_and_pairs(self):
+        """Test that text is lowercased into words and adjacent word pairs"""
+        self.assertEqual(shingles('Save Fails', 'on save'), {'save', 'fails', 'on', 'save fails', 'fails on', 'on save'})
+
+    def test_similar_text_has_similar_signatures(self):
+        """Test that reworded reports score far above unrelated ones"""
+        crash, again, login = signature(*CRASH), signature(*CRASH_AGAIN), signature(*LOGIN)
+        self.assertEqual(similarity(crash, crash), 1.0)
+        self.assertGreater(similarity(crash, again), 0.5)
+        self.assertLess(similarity(crash, login), 0.2)
+
+    def test_empty_text_has_no_signature(self):
+        """Test that text without words is never indexed or matched"""
+        self.assertIsNone(signature('', '  ...  '))
+        index = DuplicateIndex()
+        index.add(1, None, None)
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.find(None, None))
+
+class TestDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = DuplicateIndex(threshold=0.5, max_reports=3)
+
+    def test_finds_near_duplicate_in_same_repository(self):
+        """Test that a reworded report matches, but not across repositories"""
+        self.index.add(1, 7, signature(*CRASH))
+        self.index.add(2, 7, signature(*LOGIN))
+
+        match = self.index.find(7, signature(*CRASH_AGAIN))
+        self.assertEqual(match[0], 1)
+        self.assertGreaterEqual(match[1], 0.5)
+        self.assertIsNone(self.index.find(8, signature(*CRASH_AGAIN)))
+        self.assertIsNone(self.index.find(7, signature('Dark mode', 'Colours are wrong in the settings page')))
+
+    def test_oldest_reports_are_evicted(self):
+        """Test that the index never holds more than max_reports"""
+        texts = ['alpha beta gamma', 'delta epsilon zeta', 'eta theta iota', 'kappa lambda mu', 'nu xi omicron']
+        for report_id, text in enumerate(texts, start=1):
+            self.index.add(report_id, 7, signature(text, ''))
+        self.assertEqual(len(self.index), 3)
+        stats = self.index.stats()
+        self.assertEqual(stats['evictions'], 2)
+        self.assertGreater(stats['approx_bytes'], 0)
+        self.assertIsNone(self.index.find(7, signature('alpha beta gamma', '')))
+        self.assertEqual(self.index.find(7, signature('nu xi omicron', ''))[0], 5)
+
+    def test_remove(self):
+        """Test that a removed report is no longer matched and leaves no buckets"""
+        self.index.add(1, 7, signature(*CRASH))
+        self.index.remove(1)
+        self.assertIsNone(self.index.find(7, signature(*CRASH)))
+        self.assertEqual(self.index.stats()['buckets'], 0)
+
+class TestDuplicateDetection(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(github_id=12345, username='harness', access_token='harness_token'))
+            db.session.commit()
+        token_users.clear()
+        submission_limiter.clear()
+        duplicates.clear()
+
+    def tearDown(self):
+        duplicates.clear()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def submit(self, title, description, repository_id='7', ip='10.0.0.1'):
+        response = self.app.post('/api/bug-report', data={
+            'title': title, 'description': description, 'repository_id': repository_id,
+        }, environ_base={'REMOTE_ADDR': ip})
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()
+
+    def test_submit_links_near_duplicate(self):
+        """Test that a reworded report for the same repository is linked to the first"""
+        first = self.submit(*CRASH)
+        self.assertIsNone(first['duplicate_of'])
+        again = self.submit(*CRASH_AGAIN, ip='10.0.0.2')
+        self.assertEqual(again['duplicate_of'], first['bug_report_id'])
+        self.assertGreaterEqual(again['similarity'], 0.5)
+        other_repository = self.submit(*CRASH_AGAIN, repository_id='8', ip='10.0.0.3')
+        self.assertIsNone(other_repository['duplicate_of'])
+
+        with app.app_context():
+            self.assertEqual(db.session.get(BugReport, again['bug_report_id']).duplicate_of_id, first['bug_report_id'])
+        listed = {r['id']: r['duplicate_of'] for r in self.app.get('/api/bug-reports').get_json()['bug_reports']}
+        self.assertEqual(listed[again['bug_report_id']], first['bug_report_id'])
+
+    def test_index_is_rebuilt_from_database(self):
+        """Test that reports stored before startup are matched after a rebuild"""
+        with app.app_context():
+            report = BugReport(title=CRASH[0], description=CRASH[1], repository_id=7)
+            db.session.add(report)
+            db.session.commit()
+            self.assertEqual(duplicates.rebuild(), 1)
+            report_id = report.id
+        self.assertEqual(self.submit(*CRASH_AGAIN)['duplicate_of'], report_id)
+
+    def test_refresh_picks_up_reports_from_other_workers(self):
+        """Test that reports committed outside this process's index are matched after a refresh"""
+        with app.app_context():
+            self.assertEqual(duplicates.rebuild(), 0)
+            # Inserted as another worker would: committed, but never added to this index
+            report = BugReport(title=CRASH[0], description=CRASH[1], repository_id=7)
+            db.session.add(report)
+            db.session.commit()
+            report_id = report.id
+            self.assertIsNone(duplicates.find(7, signature(*CRASH_AGAIN)))
+            self.assertEqual(duplicates.refresh(), 1)
+            self.assertEqual(duplicates.refresh(), 0)
+        self.assertEqual(self.submit(*CRASH_AGAIN)['duplicate_of'], report_id)
+
+    def test_deleted_report_leaves_index(self):
+        """Test that deleting a report stops it being matched"""
+        first = self.submit(*CRASH)
+        with app.app_context():
+            db.session.delete(db.session.get(BugReport, first['bug_report_id']))
+            db.session.commit()
+        self.assertIsNone(self.submit(*CRASH_AGAIN, ip='10.0.0.2')['duplicate_of'])
+
+    def test_bulk_links_duplicates_within_and_across_chunks(self):
+        """Test that bulk records match stored reports and earlier records of the same upload"""
+        stored = self.submit(*CRASH)
+        body = ''.join(json.dumps(record) + '\n' for record in (
+            {'title': CRASH_AGAIN[0], 'description': CRASH_AGAIN[1], 'repository_id': 7},
+            {'title': LOGIN[0], 'description': LOGIN[1], 'repository_id': 7},
+            {'title': LOGIN[0] + ' 17', 'description': LOGIN[1], 'repository_id': 7},
+        ))
+        response = self.app.post('/api/bug-reports/bulk', data=body, content_type='application/x-ndjson',
+                                 headers={'Authorization': 'Bearer harness_token'})
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+        self.assertEqual(lines[0]['duplicate_of'], stored['bug_report_id'])
+        self.assertIsNone(lines[1]['duplicate_of'])
+        self.assertEqual(lines[2]['duplicate_of'], lines[1]['id'])
+        self.assertEqual(lines[-1]['summary']['duplicates'], 2)
+        with app.app_context():
+            self.assertEqual(db.session.get(BugReport, lines[2]['id']).duplicate_of_id, lines[1]['id'])
+
+    def test_metrics_report_index_size(self):
+        """Test that the index footprint is exposed with the other bug report metrics"""
+        self.submit(*CRASH)
+        with patch('app.METRICS_TOKEN', 'metrics-secret'):
+            response = self.app.get('/api/metrics/bug-reports', headers={'Authorization': 'Bearer metrics-secret'})
+        stats = response.get_json()['duplicates']
+        self.assertEqual(stats['reports'], 1)
+        self.assertEqual(stats['max_reports'], duplicates.max_reports)
+        self.assertGreater(stats['approx_bytes'], 0)
+
+    def test_metrics_require_the_metrics_token(self):
+        """Test that metrics are hidden without METRICS_TOKEN and refused without the right bearer token"""
+        for path in ('/api/metrics/bug-reports', '/api/metrics/github'):
+            with self.subTest(path=path):
+                with patch('app.METRICS_TOKEN', None):
+                    self.assertEqual(self.app.get(path).status_code, 404)
+                with patch('app.METRICS_TOKEN', 'metrics-secret'):
+                    self.assertEqual(self.app.get(path).status_code, 401)
+                    wrong = self.app.get(path, headers={'Authorization': 'Bearer guess'})
+                    self.assertEqual(wrong.status_code, 401)
+                    right = self.app.get(path, headers={'Authorization': 'Bearer metrics-secret'})
+                    self.assertEqual(right.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
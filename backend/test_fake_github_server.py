@@ -0,0 +1,109 @@
+import unittest
+import json
+import threading
+from werkzeug.serving import make_server
+from fake_github_server import create_fake_github, FakeGitHubConfig
+from github_client import GitHubClient
+from repository_sync import fetch_repository_pages, parse_link_header, page_number
+
+AUTH = {'Authorization': 'token test_token'}
+
+class TestFakeGitHubServer(unittest.TestCase):
+    def setUp(self):
+        self.config = FakeGitHubConfig(repo_count=250, rate_limit=10)
+        self.fake = create_fake_github(self.config).test_client()
+
+    def test_token_exchange_returns_access_token(self):
+        """Test that any OAuth code is exchanged for a fake access token"""
+        response = self.fake.post('/login/oauth/access_token', data={'code': 'abc'})
+        self.assertTrue(json.loads(response.data)['access_token'].startswith('gho_fake_'))
+
+    def test_user_requires_authentication(self):
+        """Test that /user rejects calls without a token"""
+        self.assertEqual(self.fake.get('/user').status_code, 401)
+
+    def test_user_returns_recorded_fixture(self):
+        """Test that /user serves the recorded profile"""
+        response = self.fake.get('/user', headers=AUTH)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['login'], 'alpha-tester')
+
+    def test_repos_are_paginated_with_link_header(self):
+        """Test that /user/repos pages through all repositories"""
+        response = self.fake.get('/user/repos?per_page=100', headers=AUTH)
+        links = parse_link_header(response.headers['Link'])
+
+        self.assertEqual(len(json.loads(response.data)), 100)
+        self.assertEqual(page_number(links['last']), 3)
+
+        last = self.fake.get('/user/repos?per_page=100&page=3', headers=AUTH)
+        self.assertEqual(len(json.loads(last.data)), 50)
+        self.assertNotIn('next', parse_link_header(last.headers.get('Link')))
+
+    def test_etag_revalidation_returns_304_without_spending_budget(self):
+        """Test that matching If-None-Match gets a 304 that does not count against the limit"""
+        first = self.fake.get('/user', headers=AUTH)
+        second = self.fake.get('/user', headers=dict(AUTH, **{'If-None-Match': first.headers['ETag']}))
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['X-RateLimit-Remaining'], first.headers['X-RateLimit-Remaining'])
+
+    def test_rate_limit_is_enforced_per_token(self):
+        """Test that a token is refused with 403 once its budget is spent"""
+        for _ in range(10):
+            self.assertEqual(self.fake.get('/user', headers=AUTH).status_code, 200)
+
+        response = self.fake.get('/user', headers=AUTH)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '0')
+        self.assertEqual(self.fake.get('/user', headers={'Authorization': 'token other'}).status_code, 200)
+
+    def test_distinct_users_per_token(self):
+        """Test that each token gets its own identity and repository ids when enabled"""
+        self.fake.post('/_fake/config', json={'distinct_users': True})
+
+        alice = json.loads(self.fake.get('/user', headers={'Authorization': 'token alice'}).data)
+        bob = json.loads(self.fake.get('/user', headers={'Authorization': 'token bob'}).data)
+        alice_repos = json.loads(self.fake.get('/user/repos', headers={'Authorization': 'token alice'}).data)
+        bob_repos = json.loads(self.fake.get('/user/repos', headers={'Authorization': 'token bob'}).data)
+
+        self.assertNotEqual(alice['id'], bob['id'])
+        self.assertNotEqual(alice['login'], bob['login'])
+        self.assertFalse({r['id'] for r in alice_repos} & {r['id'] for r in bob_repos})
+
+    def test_error_injection(self):
+        """Test that the configured fraction of calls fails with the configured status"""
+        self.fake.post('/_fake/config', json={'error_rate': 1.0, 'error_status': 503})
+
+        self.assertEqual(self.fake.get('/user', headers=AUTH).status_code, 503)
+        self.assertEqual(json.loads(self.fake.get('/_fake/stats').data)['injected_errors'], 1)
+
+class TestClientAgainstFakeServer(unittest.TestCase):
+    def setUp(self):
+        fake = create_fake_github(FakeGitHubConfig(repo_count=730))
+        self.server = make_server('127.0.0.1', 0, fake, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = GitHubClient.from_env(api_url=f'http://127.0.0.1:{self.server.server_port}')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join(5)
+
+    def test_full_repository_listing_over_http(self):
+        """Test that the pooled client pages through the fake server end to end"""
+        pages = list(fetch_repository_pages(self.client, 'test_token'))
+
+        self.assertEqual(sum(len(page) for page in pages), 730)
+        self.assertEqual(self.client.metrics.snapshot()['/user/repos']['calls'], 8)
+
+    def test_repeat_fetch_is_revalidated(self):
+        """Test that a second /user fetch is answered by a 304 from the fake server"""
+        self.client.get('/user', token='test_token')
+        response = self.client.get('/user', token='test_token')
+
+        self.assertTrue(response.from_cache)
+        self.assertEqual(self.client.metrics.snapshot()['/user']['statuses'], {200: 1, 304: 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+from github_client import GitHubClient, GitHubError
+from github_cache import ResponseCache
+
+def make_response(status_code=200, json_data=None, headers=None, content=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = json_data
+    response.headers = headers or {}
+    if content is not None:
+        response.content = content
+    return response
+
+class TestGitHubClient(unittest.TestCase):
+    def setUp(self):
+        self.client = GitHubClient(backoff_base=0, connect_timeout=1, read_timeout=2)
+
+    @patch('github_client.requests.Session.request')
+    def test_get_sends_token_and_timeouts(self, mock_request):
+        """Test that GET resolves the path and sends auth header and timeouts"""
+        mock_request.return_value = make_response(json_data={'login': 'octocat'})
+
+        response = self.client.get('/user', token='abc')
+
+        self.assertEqual(response.json()['login'], 'octocat')
+        args, kwargs = mock_request.call_args
+        self.assertEqual(args, ('GET', 'https://api.github.com/user'))
+        self.assertEqual(kwargs['headers']['Authorization'], 'token abc')
+        self.assertEqual(kwargs['timeout'], (1, 2))
+
+    @patch('github_client.requests.Session.request')
+    def test_retries_server_errors_then_succeeds(self, mock_request):
+        """Test that 5xx responses are retried up to the configured limit"""
+        mock_request.side_effect = [make_response(502), make_response(503), make_response(200)]
+
+        response = self.client.get('/user', token='abc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(self.client.metrics.snapshot()['/user']['retries'], 2)
+
+    @patch('github_client.requests.Session.request')
+    def test_returns_last_server_error_when_retries_exhausted(self, mock_request):
+        """Test that the final 5xx response is returned once retries run out"""
+        mock_request.return_value = make_response(500)
+
+        response = self.client.get('/user', token='abc')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @patch('github_client.requests.Session.request')
+    def test_connection_errors_raise_github_error(self, mock_request):
+        """Test that persistent connection failures surface as GitHubError"""
+        mock_request.side_effect = requests.ConnectionError('refused')
+
+        with self.assertRaises(GitHubError):
+            self.client.get('/user', token='abc')
+
+        self.assertEqual(mock_request.call_count, 3)
+        self.assertEqual(self.client.metrics.snapshot()['/user']['errors'], 1)
+
+    @patch('github_client.requests.Session.request')
+    def test_post_is_not_retried(self, mock_request):
+        """Test that non-idempotent calls are sent exactly once"""
+        mock_request.return_value = make_response(502)
+
+        response = self.client.post('https://github.com/login/oauth/access_token', data={'code': 'x'})
+
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(mock_request.call_count, 1)
+
+    @patch('github_client.requests.Session.request')
+    def test_client_errors_are_not_retried(self, mock_request):
+        """Test that 4xx responses are returned immediately"""
+        mock_request.return_value = make_response(401)
+
+        response = self.client.get('/user', token='bad')
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(mock_request.call_count, 1)
+
+    def test_session_is_reused(self):
+        """Test that the pooled session is created once per process"""
+        self.assertIs(self.client.session, self.client.session)
+
+    @patch('github_client.requests.Session.request')
+    def test_metrics_are_recorded_per_endpoint(self, mock_request):
+        """Test that latency metrics are grouped by path without the query string"""
+        mock_request.return_value = make_response(200, json_data=[])
+
+        self.client.get('/user/repos?per_page=100', token='abc')
+        self.client.get('/user/repos?per_page=100&page=2', token='abc')
+
+        stats = self.client.metrics.snapshot()['/user/repos']
+        self.assertEqual(stats['calls'], 2)
+        self.assertEqual(stats['statuses'], {200: 2})
+        self.assertGreaterEqual(stats['max_ms'], 0)
+
+class TestConditionalRequestCache(unittest.TestCase):
+    def setUp(self):
+        self.client = GitHubClient(backoff_base=0, cache=ResponseCache(maxsize=2))
+
+    @patch('github_client.requests.Session.request')
+    def test_etag_is_sent_and_304_served_from_cache(self, mock_request):
+        """Test that a cached ETag is revalidated and a 304 returns the stored body"""
+        first = make_response(200, headers={'ETag': '"v1"'}, content=b'{"login": "octocat"}')
+        mock_request.side_effect = [first, make_response(304, headers={'X-RateLimit-Remaining': '4999'})]
+
+        self.client.get('/user', token='abc')
+        response = self.client.get('/user', token='abc')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.json(), {'login': 'octocat'})
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '4999')
+        second_headers = mock_request.call_args_list[1][1]['headers']
+        self.assertEqual(second_headers['If-None-Match'], '"v1"')
+        self.assertEqual(self.client.cache.stats()['revalidated'], 1)
+
+    @patch('github_client.requests.Session.request')
+    def test_last_modified_is_revalidated(self, mock_request):
+        """Test that Last-Modified validators are replayed as If-Modified-Since"""
+        first = make_response(200, headers={'Last-Modified': 'Tue, 01 Jul 2025 00:00:00 GMT'}, content=b'[]')
+        mock_request.side_effect = [first, make_response(304)]
+
+        self.client.get('/user/repos', token='abc')
+        self.client.get('/user/repos', token='abc')
+
+        second_headers = mock_request.call_args_list[1][1]['headers']
+        self.assertEqual(second_headers['If-Modified-Since'], 'Tue, 01 Jul 2025 00:00:00 GMT')
+
+    @patch('github_client.requests.Session.request')
+    def test_cache_is_keyed_by_token(self, mock_request):
+        """Test that one user's cached document is never revalidated for another token"""
+        first = make_response(200, headers={'ETag': '"v1"'}, content=b'{}')
+        mock_request.side_effect = [first, make_response(200, headers={})]
+
+        self.client.get('/user', token='alice')
+        self.client.get('/user', token='bob')
+
+        second_headers = mock_request.call_args_list[1][1]['headers']
+        self.assertNotIn('If-None-Match', second_headers)
+
+    @patch('github_client.requests.Session.request')
+    def test_responses_without_validators_are_not_cached(self, mock_request):
+        """Test that only responses with an ETag or Last-Modified are stored"""
+        mock_request.return_value = make_response(200, headers={}, content=b'{}')
+
+        self.client.get('/user', token='abc')
+
+        self.assertEqual(self.client.cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache stays within its entry bound"""
+        cache = ResponseCache(maxsize=2)
+        cache.store('abc', '/a', make_response(200, headers={'ETag': '"a"'}, content=b'{}'))
+        cache.store('abc', '/b', make_response(200, headers={'ETag': '"b"'}, content=b'{}'))
+        cache.get('abc', '/a')
+        cache.store('abc', '/c', make_response(200, headers={'ETag': '"c"'}, content=b'{}'))
+
+        self.assertIsNotNone(cache.get('abc', '/a'))
+        self.assertIsNone(cache.get('abc', '/b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate_drops_all_entries_for_token(self):
+        """Test that invalidating a token removes every document cached for it"""
+        cache = ResponseCache()
+        cache.store('abc', '/user', make_response(200, headers={'ETag': '"1"'}, content=b'{}'))
+        cache.store('abc', '/user/repos', make_response(200, headers={'ETag': '"2"'}, content=b'[]'))
+        cache.store('other', '/user', make_response(200, headers={'ETag': '"3"'}, content=b'{}'))
+
+        cache.invalidate('abc')
+
+        self.assertIsNone(cache.get('abc', '/user'))
+        self.assertIsNotNone(cache.get('other', '/user'))
+
+if __name__ == '__main__':
+    unittest.main()
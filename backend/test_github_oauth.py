@@ -7,11 +7,11 @@ class TestGitHubOAuth(unittest.TestCase):
         self.app = app.test_client()
         self.app.testing = True
 
-    @patch('requests.post')
-    def test_github_callback_exchanges_code_and_stores_token(self, mock_post):
+    @patch('github_client.requests.Session.request')
+    def test_github_callback_exchanges_code_and_stores_token(self, mock_request):
         # Simulate GitHub returning an access token
-        mock_post.return_value.json.return_value = {'access_token': 'fake-token'}
-        mock_post.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'access_token': 'fake-token'}
+        mock_request.return_value.status_code = 200
         with self.app.session_transaction() as sess:
             pass  # session setup if needed
         response = self.app.get('/github/callback?code=fakecode')
@@ -0,0 +1,135 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from github_client import GitHubClient
+from github_cache import ResponseCache
+from github_ratelimit import RateLimitScheduler, RateLimitExceeded, PRIORITY_LOW
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def make_response(status_code=200, headers=None, content=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    if content is not None:
+        response.content = content
+    return response
+
+def budget_headers(remaining, reset_in, clock, limit=5000):
+    return {
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(int(clock.now + reset_in)),
+    }
+
+class TestRateLimitScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = RateLimitScheduler(low_water=10, max_wait=2.0, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_unknown_token_is_admitted(self):
+        """Test that calls are admitted before any budget is known"""
+        self.scheduler.acquire('abc')
+
+    def test_budget_is_tracked_from_headers(self):
+        """Test that the latest rate-limit headers are recorded per token"""
+        self.scheduler.update('abc', make_response(headers=budget_headers(4321, 600, self.clock)))
+
+        budget = self.scheduler.budget('abc')
+        self.assertEqual(budget['limit'], 5000)
+        self.assertEqual(budget['remaining'], 4321)
+
+    def test_acquire_spends_budget(self):
+        """Test that admitted calls are counted against the known budget"""
+        self.scheduler.update('abc', make_response(headers=budget_headers(50, 600, self.clock)))
+        self.scheduler.acquire('abc')
+        self.assertEqual(self.scheduler.budget('abc')['remaining'], 49)
+
+    def test_low_priority_is_shed_when_budget_is_low(self):
+        """Test that background calls are refused once the budget falls below the low-water mark"""
+        self.scheduler.update('abc', make_response(headers=budget_headers(5, 600, self.clock)))
+
+        with self.assertRaises(RateLimitExceeded):
+            self.scheduler.acquire('abc', priority=PRIORITY_LOW)
+        self.scheduler.acquire('abc')  # interactive calls still go through
+        self.assertEqual(self.scheduler.budget('abc')['shed'], 1)
+
+    def test_exhausted_budget_refuses_all_calls(self):
+        """Test that nothing is sent for a token with no budget left"""
+        self.scheduler.update('abc', make_response(headers=budget_headers(0, 600, self.clock)))
+
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            self.scheduler.acquire('abc')
+        self.assertEqual(ctx.exception.retry_at, self.clock.now + 600)
+
+    def test_calls_wait_for_an_imminent_reset(self):
+        """Test that calls are queued when the budget resets within max_wait"""
+        self.scheduler.update('abc', make_response(headers=budget_headers(0, 1, self.clock)))
+
+        self.scheduler.acquire('abc')
+
+        self.assertEqual(self.clock.sleeps, [1])
+
+    def test_retry_after_blocks_token(self):
+        """Test that a secondary rate limit's Retry-After blocks further calls"""
+        self.scheduler.update('abc', make_response(403, headers={'Retry-After': '60'}))
+
+        with self.assertRaises(RateLimitExceeded):
+            self.scheduler.acquire('abc')
+        self.scheduler.acquire('other-token')
+
+    def test_snapshot_hides_raw_tokens(self):
+        """Test that the monitoring snapshot is keyed by token hash, not the token"""
+        self.scheduler.update('secret-token', make_response(headers=budget_headers(10, 600, self.clock)))
+
+        snapshot = self.scheduler.snapshot()
+
+        self.assertEqual(len(snapshot), 1)
+        self.assertNotIn('secret-token', snapshot)
+        self.assertEqual(list(snapshot.values())[0]['remaining'], 10)
+
+class TestClientRateLimiting(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.client = GitHubClient(
+            backoff_base=0,
+            cache=ResponseCache(),
+            scheduler=RateLimitScheduler(clock=self.clock, sleep=self.clock.sleep),
+        )
+
+    @patch('github_client.requests.Session.request')
+    def test_cached_data_is_served_when_budget_exhausted(self, mock_request):
+        """Test that an exhausted token gets its cached copy without an upstream call"""
+        headers = budget_headers(0, 600, self.clock)
+        headers['ETag'] = '"v1"'
+        mock_request.return_value = make_response(200, headers=headers, content=b'{"login": "octocat"}')
+
+        self.client.get('/user', token='abc')
+        response = self.client.get('/user', token='abc')
+
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertTrue(response.from_cache)
+        self.assertEqual(response.json()['login'], 'octocat')
+
+    @patch('github_client.requests.Session.request')
+    def test_exhausted_budget_without_cache_raises(self, mock_request):
+        """Test that RateLimitExceeded is raised when there is nothing cached to serve"""
+        mock_request.return_value = make_response(200, headers=budget_headers(0, 600, self.clock), content=b'{}')
+
+        self.client.get('/user', token='abc')
+        with self.assertRaises(RateLimitExceeded):
+            self.client.get('/user/repos', token='abc')
+
+        self.assertEqual(mock_request.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import unittest
+import json
+import uuid
+from unittest.mock import patch
+from app import app, db, User, Repository, BugReport, webhooks
+from github_webhooks import WebhookProcessor, verify_signature, sign
+
+SECRET = 'webhook-secret'
+
+def repo_payload(repo_id, name, owner_id=12345, private=False):
+    return {
+        'id': repo_id,
+        'name': name,
+        'full_name': f'testuser/{name}',
+        'description': f'{name} description',
+        'html_url': f'https://github.com/testuser/{name}',
+        'clone_url': f'https://github.com/testuser/{name}.git',
+        'language': 'Python',
+        'private': private,
+        'owner': {'login': 'testuser', 'id': owner_id}
+    }
+
+class TestSignature(unittest.TestCase):
+    def test_valid_signature(self):
+        """Test that a body signed with the secret verifies"""
+        body = b'{"zen": "Keep it logically awesome."}'
+        self.assertTrue(verify_signature(SECRET, body, sign(SECRET, body)))
+
+    def test_invalid_signatures(self):
+        """Test that wrong secrets, altered bodies and missing headers fail"""
+        body = b'{"action": "edited"}'
+        self.assertFalse(verify_signature(SECRET, body, sign('other', body)))
+        self.assertFalse(verify_signature(SECRET, body + b' ', sign(SECRET, body)))
+        self.assertFalse(verify_signature(SECRET, body, None))
+        self.assertFalse(verify_signature(None, body, sign(SECRET, body)))
+
+class TestGitHubWebhooks(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            user = User(github_id=12345, username='testuser', access_token='test_token')
+            db.session.add(user)
+            db.session.commit()
+            db.session.add(Repository(
+                github_id=101, name='old-name', full_name='testuser/old-name',
+                html_url='https://github.com/testuser/old-name', is_private=False, user_id=user.id,
+                users=[user]
+            ))
+            db.session.commit()
+            self.user_id = user.id
+        self.secret = patch.object(webhooks, 'secret', SECRET)
+        self.secret.start()
+        webhooks.drain()
+
+    def tearDown(self):
+        self.secret.stop()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def deliver(self, event, payload, delivery=None, signature=None):
+        body = json.dumps(payload).encode('utf-8')
+        return self.app.post('/api/webhooks/github', data=body, headers={
+            'X-GitHub-Event': event,
+            'X-GitHub-Delivery': delivery or str(uuid.uuid4()),
+            'X-Hub-Signature-256': signature or sign(SECRET, body),
+            'Content-Type': 'application/json'
+        })
+
+    def test_delivery_is_queued_and_applied_later(self):
+        """Test that the endpoint answers 202 before the change is written"""
+        response = self.deliver('repository', {'action': 'renamed', 'repository': repo_payload(101, 'new-name')})
+
+        self.assertEqual(response.status_code, 202)
+        with app.app_context():
+            self.assertEqual(Repository.query.filter_by(github_id=101).first().name, 'old-name')
+        webhooks.drain()
+        with app.app_context():
+            repo = Repository.query.filter_by(github_id=101).first()
+            self.assertEqual(repo.name, 'new-name')
+            self.assertEqual(repo.language, 'Python')
+
+    def test_created_repository_is_added_for_known_owner(self):
+        """Test that a created repository owned by a known user is inserted"""
+        self.deliver('repository', {'action': 'created', 'repository': repo_payload(102, 'fresh')})
+        self.deliver('repository', {'action': 'created', 'repository': repo_payload(103, 'stranger', owner_id=999)})
+        webhooks.drain()
+        with app.app_context():
+            self.assertEqual(Repository.query.filter_by(github_id=102).first().user_id, self.user_id)
+            self.assertIsNone(Repository.query.filter_by(github_id=103).first())
+
+    def test_deleted_repository_is_removed_unless_reported(self):
+        """Test that deletes keep repositories that bug reports point at"""
+        with app.app_context():
+            db.session.add(Repository(
+                github_id=104, name='reported', full_name='testuser/reported',
+                html_url='https://github.com/testuser/reported', user_id=self.user_id
+            ))
+            db.session.commit()
+            reported = Repository.query.filter_by(github_id=104).first()
+            db.session.add(BugReport(title='Bug', description='Broken', repository_id=reported.id))
+            db.session.commit()
+
+        self.deliver('repository', {'action': 'deleted', 'repository': repo_payload(101, 'old-name')})
+        self.deliver('repository', {'action': 'deleted', 'repository': repo_payload(104, 'reported')})
+        webhooks.drain()
+        with app.app_context():
+            self.assertIsNone(Repository.query.filter_by(github_id=101).first())
+            self.assertIsNotNone(Repository.query.filter_by(github_id=104).first())
+
+    def test_installation_repositories_added_and_removed(self):
+        """Test that installation_repositories events list and unlist repositories for the account"""
+        self.deliver('installation_repositories', {
+            'action': 'added',
+            'installation': {'account': {'login': 'testuser', 'id': 12345}},
+            'repositories_added': [{'id': 105, 'name': 'shared', 'full_name': 'testuser/shared', 'private': True}],
+            'repositories_removed': [{'id': 101, 'name': 'old-name', 'full_name': 'testuser/old-name'}]
+        })
+        webhooks.drain()
+        with app.app_context():
+            added = Repository.query.filter_by(github_id=105).first()
+            self.assertEqual(added.html_url, 'https://github.com/testuser/shared')
+            self.assertTrue(added.is_private)
+            removed = Repository.query.filter_by(github_id=101).one()
+            self.assertEqual(removed.users, [])
+            self.assertEqual([repo.github_id for repo in db.session.get(User, self.user_id).listed_repositories], [105])
+
+    def test_installation_removal_keeps_other_users_access(self):
+        """Test that one account losing a shared repository leaves it listed for the others"""
+        with app.app_context():
+            other = User(github_id=67890, username='otheruser', access_token='other_token')
+            db.session.add(other)
+            repo = Repository.query.filter_by(github_id=101).one()
+            repo.users.append(other)
+            db.session.commit()
+            other_id = other.id
+        self.deliver('installation_repositories', {
+            'action': 'removed',
+            'installation': {'account': {'login': 'testuser', 'id': 12345}},
+            'repositories_added': [],
+            'repositories_removed': [{'id': 101, 'name': 'old-name', 'full_name': 'testuser/old-name'}]
+        })
+        webhooks.drain()
+        with app.app_context():
+            repo = Repository.query.filter_by(github_id=101).one()
+            self.assertEqual([user.id for user in repo.users], [other_id])
+
+    def test_installation_repositories_keep_fields_the_list_omits(self):
+        """Test that a partial installation_repositories entry does not blank a known repository"""
+        self.deliver('repository', {'action': 'edited', 'repository': repo_payload(101, 'old-name')})
+        self.deliver('installation_repositories', {
+            'action': 'added',
+            'installation': {'account': {'login': 'testuser', 'id': 12345}},
+            'repositories_added': [{'id': 101, 'name': 'new-name', 'full_name': 'testuser/new-name', 'private': True}],
+        })
+        webhooks.drain()
+        with app.app_context():
+            repo = Repository.query.filter_by(github_id=101).one()
+            self.assertEqual((repo.name, repo.full_name, repo.is_private), ('new-name', 'testuser/new-name', True))
+            self.assertEqual(repo.description, 'old-name description')
+            self.assertEqual(repo.clone_url, 'https://github.com/testuser/old-name.git')
+            self.assertEqual(repo.language, 'Python')
+            self.assertIsNone(repo.content_hash)
+            self.assertEqual([user.id for user in repo.users], [self.user_id])
+
+    def test_bad_signature_is_rejected_before_queuing(self):
+        """Test that a forged delivery is refused without taking queue space"""
+        rejected, queued = webhooks.stats()['rejected'], webhooks.stats()['queued']
+        response = self.deliver('repository', {'action': 'renamed', 'repository': repo_payload(101, 'forged')},
+                                signature='sha256=' + '0' * 64)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(webhooks.stats()['rejected'], rejected + 1)
+        self.assertEqual(webhooks.stats()['queued'], queued)
+        webhooks.drain()
+        with app.app_context():
+            self.assertEqual(Repository.query.filter_by(github_id=101).first().name, 'old-name')
+
+    def test_missing_signature_is_refused(self):
+        """Test that unsigned requests are refused outright"""
+        response = self.app.post('/api/webhooks/github', data=b'{}', headers={'X-GitHub-Event': 'ping'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_webhooks_disabled_without_secret(self):
+        """Test that the endpoint is unavailable when no secret is configured"""
+        with patch.object(webhooks, 'secret', None):
+            response = self.deliver('ping', {'zen': 'hi'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_redelivery_is_applied_once(self):
+        """Test that a redelivered event with the same delivery id is skipped"""
+        payload = {'action': 'edited', 'repository': repo_payload(101, 'edited')}
+        self.deliver('repository', payload, delivery='same-delivery')
+        self.deliver('repository', payload, delivery='same-delivery')
+        duplicates = webhooks.stats()['duplicate']
+        webhooks.drain()
+        self.assertEqual(webhooks.stats()['duplicate'], duplicates + 1)
+
+    def test_full_queue_answers_503(self):
+        """Test that deliveries beyond the queue bound are refused so GitHub retries"""
+        small = WebhookProcessor(app, SECRET, maxsize=1)
+        with patch('app.webhooks', small):
+            self.assertEqual(self.deliver('ping', {}).status_code, 202)
+            self.assertEqual(self.deliver('ping', {}).status_code, 503)
+
+    def test_queue_is_bounded_by_bytes(self):
+        """Test that queued bodies beyond max_bytes are refused until the backlog drains"""
+        small = WebhookProcessor(app, SECRET, max_bytes=1024)
+        payload = {'zen': 'x' * 600}
+        with patch('app.webhooks', small):
+            self.assertEqual(self.deliver('ping', payload).status_code, 202)
+            self.assertEqual(self.deliver('ping', payload).status_code, 503)
+            small.drain()
+            self.assertEqual(small.stats()['backlog_bytes'], 0)
+            self.assertEqual(self.deliver('ping', payload).status_code, 202)
+
+if __name__ == '__main__':
+    unittest.main()
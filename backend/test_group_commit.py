@@ -0,0 +1,80 @@
+import threading
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+from sqlalchemy.exc import IntegrityError
+from app import app, db, BugReport, submission_limiter
+from group_commit import GroupCommitWriter, PendingInsert
+
+class TestGroupCommitWriter(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        self.writer = GroupCommitWriter(app, BugReport, max_delay=0.05, max_batch=50)
+
+    def tearDown(self):
+        self.writer.stop()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_concurrent_inserts_share_commits(self):
+        """Test that rows from many threads are committed in a few batches, each caller getting its id"""
+        self.writer.start()
+        ids = []
+        def submit(i):
+            ids.append(self.writer.insert({'title': f'Bug {i}', 'description': 'd'}))
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(ids)), 20)
+        stats = self.writer.stats()
+        self.assertEqual(stats['inserted'], 20)
+        self.assertLess(stats['batches'], 20)
+        with app.app_context():
+            titles = {db.session.get(BugReport, i).title for i in ids}
+        self.assertEqual(titles, {f'Bug {i}' for i in range(20)})
+
+    def test_failed_row_does_not_fail_its_batch(self):
+        """Test that a row rejected by the database only errors for its own caller"""
+        batch = [PendingInsert({'title': 'ok', 'description': 'd'}),
+                 PendingInsert({'title': None, 'description': 'd'}),
+                 PendingInsert({'title': 'also ok', 'description': 'd'})]
+        self.writer.write(batch)
+
+        self.assertIsNotNone(batch[0].result())
+        with self.assertRaises(IntegrityError):
+            batch[1].result()
+        self.assertIsNotNone(batch[2].result())
+        with app.app_context():
+            self.assertEqual(BugReport.query.count(), 2)
+        self.assertEqual(self.writer.stats()['batches'], 1)
+
+    def test_insert_without_writer_thread(self):
+        """Test that inserts still work, one per commit, when the thread is not running"""
+        report_id = self.writer.insert({'title': 'inline', 'description': 'd'})
+        with app.app_context():
+            self.assertEqual(db.session.get(BugReport, report_id).title, 'inline')
+
+    def test_endpoint_uses_group_commit_when_enabled(self):
+        """Test that /api/bug-report returns the id assigned by the writer"""
+        submission_limiter.clear()
+        with patch('app.BUG_REPORT_GROUP_COMMIT', True), patch('app.bug_report_writer', self.writer):
+            self.writer.start()
+            response = app.test_client().post('/api/bug-report', content_type='multipart/form-data', data={
+                'title': 'Grouped', 'description': 'Test Description',
+                'screenshot': (BytesIO(b'fake image data'), 'screenshot.png'),
+            })
+        self.assertEqual(response.status_code, 201)
+        with app.app_context():
+            report = db.session.get(BugReport, response.get_json()['bug_report_id'])
+            self.assertEqual(report.title, 'Grouped')
+            self.assertIsNotNone(report.screenshot_path)
+        self.assertEqual(self.writer.stats()['inserted'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
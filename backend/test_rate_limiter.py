@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from rate_limiter import RateLimiter, SlidingWindowRateLimiter, SQLiteRateLimiter, create_rate_limiter
+
+class TestSlidingWindowRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.now = 36000.0
+        self.limiter = SlidingWindowRateLimiter(5, 3600, max_keys=3, clock=lambda: self.now)
+
+    def test_limit_is_reached_per_key(self):
+        """Test that the limit applies to each key separately"""
+        for _ in range(5):
+            self.assertFalse(self.limiter.is_limited('a'))
+            self.limiter.hit('a')
+        self.assertTrue(self.limiter.is_limited('a'))
+        self.assertFalse(self.limiter.is_limited('b'))
+        self.assertEqual(self.limiter.stats()['rejected'], 1)
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        """Test that hits from the previous window fade out as it slides past"""
+        for _ in range(5):
+            self.limiter.hit('a', now=self.now + 3000)
+        self.now += 3600 + 1800  # halfway into the next window
+        self.assertAlmostEqual(self.limiter.count('a'), 2.5)
+        self.assertFalse(self.limiter.is_limited('a'))
+        self.now += 1800
+        self.assertEqual(self.limiter.count('a'), 0)
+
+    def test_tracked_keys_are_capped(self):
+        """Test that the least recently hit key is evicted beyond max_keys"""
+        for key in ('a', 'b', 'c'):
+            self.limiter.hit(key)
+        self.limiter.hit('a')
+        self.limiter.hit('d')
+        self.assertEqual(len(self.limiter), 3)
+        self.assertEqual(self.limiter.count('b'), 0)
+        self.assertEqual(self.limiter.count('a'), 2)
+        self.assertEqual(self.limiter.stats()['evictions'], 1)
+
+    def test_idle_keys_expire(self):
+        """Test that keys idle for two windows are dropped as new keys arrive"""
+        self.limiter.hit('a')
+        self.limiter.hit('b')
+        self.now += 2 * 3600
+        self.limiter.hit('c')
+        self.assertEqual(len(self.limiter), 1)
+        self.assertEqual(self.limiter.stats()['expirations'], 2)
+
+class TestSQLiteRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'ratelimit.db')
+        self.now = 36000.0
+        self.limiter = self.open_limiter()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def open_limiter(self, **kwargs):
+        return SQLiteRateLimiter(self.path, 5, 3600, clock=lambda: self.now, **kwargs)
+
+    def test_limit_is_shared_between_instances(self):
+        """Test that hits recorded by one worker count against another"""
+        other = self.open_limiter()
+        for _ in range(3):
+            self.limiter.hit('a')
+        for _ in range(2):
+            other.hit('a')
+        self.assertTrue(self.limiter.is_limited('a'))
+        self.assertTrue(other.is_limited('a'))
+        self.assertFalse(other.is_limited('b'))
+
+    def test_window_rolls_over_in_the_upsert(self):
+        """Test that the first hit in a new window carries the old count as previous"""
+        for _ in range(4):
+            self.limiter.hit('a', now=self.now + 3000)
+        self.now += 3600 + 1800
+        self.assertAlmostEqual(self.limiter.hit('a'), 3.0)
+        self.now += 7200
+        self.assertEqual(self.limiter.hit('a'), 1)
+
+    def test_concurrent_hits_are_not_lost(self):
+        """Test that hits from several connections at once are all counted"""
+        def worker():
+            limiter = self.open_limiter()
+            for _ in range(50):
+                limiter.hit('a')
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.limiter.count('a'), 200)
+
+    def test_prune_expires_and_caps_keys(self):
+        """Test that idle keys are deleted and the table is kept under max_keys"""
+        limiter = self.open_limiter(max_keys=2, prune_every=1000)
+        limiter.hit('idle', now=self.now - 7200)
+        for key in ('a', 'b', 'c'):
+            limiter.hit(key)
+        self.assertEqual(limiter.prune(), 2)
+        self.assertEqual(len(limiter), 2)
+        self.assertEqual(limiter.stats()['expirations'], 1)
+        self.assertEqual(limiter.stats()['evictions'], 1)
+
+class TestCreateRateLimiter(unittest.TestCase):
+    def test_backend_strings(self):
+        """Test that the backend string selects the limiter implementation"""
+        self.assertIsInstance(create_rate_limiter('memory', 5, 60), SlidingWindowRateLimiter)
+        with tempfile.TemporaryDirectory() as tmp:
+            limiter = create_rate_limiter(f'sqlite:///{tmp}/limits.db', 5, 60)
+            self.assertIsInstance(limiter, SQLiteRateLimiter)
+            self.assertEqual(limiter.stats()['backend'], 'sqlite')
+        with self.assertRaises(ValueError):
+            create_rate_limiter('redis://localhost', 5, 60)
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test that a backend missing part of the interface fails when created, not when used"""
+        class CountOnly(RateLimiter):
+            backend = 'partial'
+
+            def count(self, key, now=None):
+                return 0
+
+        with self.assertRaises(TypeError):
+            CountOnly(5, 60)
+
+if __name__ == '__main__':
+    unittest.main()
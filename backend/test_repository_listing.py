@@ -0,0 +1,126 @@
+import unittest
+import json
+from datetime import datetime, timezone
+from app import app, db, User, Repository
+from repository_sync import store_repository_page
+from repository_listing import parse_listing_args, ListingError, encode_cursor
+
+class TestRepositoryListing(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            user = User(github_id=12345, username='testuser', access_token='test_token',
+                        repos_synced_at=datetime.now(timezone.utc))
+            db.session.add(user)
+            db.session.commit()
+            # Inserted in one batch, so every row shares the same created_at
+            db.session.add_all([Repository(
+                github_id=1000 + i,
+                name=f'repo-{i:02d}',
+                full_name=f'testuser/repo-{i:02d}',
+                description='x' * 200,
+                html_url=f'https://github.com/testuser/repo-{i:02d}',
+                language='Python',
+                user_id=user.id,
+                users=[user]
+            ) for i in range(25)])
+            db.session.commit()
+
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = 'test_token'
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def collect(self, query):
+        """Follow next_cursor until the listing is exhausted"""
+        pages = []
+        url = f'/api/repositories?{query}'
+        while True:
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            pages.append(data['repositories'])
+            if not data['next_cursor']:
+                return pages
+            url = f"/api/repositories?{query}&cursor={data['next_cursor']}"
+
+    def test_keyset_pages_cover_every_repository_once(self):
+        """Test that paging by name returns each repository exactly once, in order"""
+        pages = self.collect('sort=name&limit=10')
+        names = [repo['name'] for page in pages for repo in page]
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(names, [f'repo-{i:02d}' for i in range(25)])
+
+    def test_keyset_pages_with_tied_sort_keys(self):
+        """Test that rows sharing a timestamp are split across pages without repeats"""
+        pages = self.collect('sort=updated&limit=7')
+        ids = [repo['id'] for page in pages for repo in page]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+
+    def test_tied_sort_keys_keep_id_order(self):
+        """Test that rows sharing a sort key are listed in id order, across pages too"""
+        expected = [f'repo-{i:02d}' for i in range(25)]
+        data = json.loads(self.app.get('/api/repositories').data)
+        self.assertEqual([repo['name'] for repo in data['repositories']], expected)
+        pages = self.collect('sort=updated&limit=7')
+        self.assertEqual([repo['name'] for page in pages for repo in page], expected)
+
+    def test_fields_projection(self):
+        """Test that fields= limits the keys returned"""
+        response = self.app.get('/api/repositories?fields=id,name,full_name&limit=5')
+        full = self.app.get('/api/repositories?limit=5')
+
+        repos = json.loads(response.data)['repositories']
+        self.assertEqual(set(repos[0]), {'id', 'name', 'full_name'})
+        self.assertLess(len(response.data) * 3, len(full.data))
+
+    def test_without_limit_returns_everything(self):
+        """Test that the default listing is unpaginated"""
+        data = json.loads(self.app.get('/api/repositories').data)
+        self.assertEqual(data['count'], 25)
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['repositories'][0]['owner'], {'login': 'testuser'})
+
+    def test_invalid_parameters_are_rejected(self):
+        """Test that unknown fields, sorts and malformed cursors answer 400"""
+        for query in ('fields=id,secret', 'sort=stars', 'limit=abc', 'limit=0', 'cursor=not-a-cursor'):
+            with self.subTest(query=query):
+                self.assertEqual(self.app.get(f'/api/repositories?{query}').status_code, 400)
+
+    def test_cursor_keys_must_be_text(self):
+        """Test that a crafted cursor whose key is not a string answers 400 rather than reaching SQLite"""
+        for key in ([1, 2], {'a': 1}, 3):
+            with self.subTest(key=key):
+                cursor = encode_cursor('updated', key, 1)
+                self.assertEqual(self.app.get(f'/api/repositories?limit=5&cursor={cursor}').status_code, 400)
+
+    def test_updated_sort_follows_github_timestamps(self):
+        """Test that sort=updated orders by GitHub's updated_at/pushed_at, whatever order rows were written in"""
+        with app.app_context():
+            user = User.query.one()
+            repos = [{'id': 2000 + i, 'name': f'gh-{i}', 'full_name': f'testuser/gh-{i}',
+                      'html_url': f'https://github.com/testuser/gh-{i}', 'private': False,
+                      'updated_at': f'2024-01-0{i}T00:00:00Z', 'pushed_at': None} for i in range(1, 6)]
+            repos[1]['pushed_at'] = '2024-02-01T00:00:00Z'
+            # Pages can be committed in any order
+            store_repository_page(user.id, [repos[0], repos[3]])
+            store_repository_page(user.id, [repos[4], repos[1], repos[2]])
+            db.session.commit()
+        pages = self.collect('sort=updated&limit=2')
+        names = [repo['name'] for page in pages for repo in page]
+        self.assertEqual(names[:5], ['gh-2', 'gh-5', 'gh-4', 'gh-3', 'gh-1'])
+        self.assertEqual(len(names), 30)
+
+    def test_cursor_must_match_sort(self):
+        """Test that a cursor from one sort order is refused for another"""
+        with self.assertRaises(ListingError):
+            parse_listing_args({'sort': 'name', 'cursor': encode_cursor('updated', '2025-01-01 00:00:00', 3)})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import json
 from unittest.mock import patch
-from app import app, db, User, Repository
+from app import app, db, User, Repository, github_calls, profile_cache
 
 class TestRepositoryManagement(unittest.TestCase):
     def setUp(self):
@@ -15,6 +15,10 @@ class TestRepositoryManagement(unittest.TestCase):
         with app.app_context():
             db.create_all()
 
+        # Don't let coalesced results from a previous test leak into this one
+        github_calls.clear()
+        profile_cache.clear()
+
     def tearDown(self):
         with app.app_context():
             db.session.remove()
@@ -39,8 +43,8 @@ class TestRepositoryManagement(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertEqual(response_data['error'], 'User not found')
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_github_api_failure(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_github_api_failure(self, mock_request):
         """Test /api/repositories endpoint when GitHub API fails"""
         # Create user in database
         with app.app_context():
@@ -53,7 +57,7 @@ class TestRepositoryManagement(unittest.TestCase):
             db.session.commit()
 
         # Mock GitHub API failure
-        mock_get.return_value.status_code = 500
+        mock_request.return_value.status_code = 500
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -64,8 +68,8 @@ class TestRepositoryManagement(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertEqual(response_data['error'], 'Failed to fetch repositories')
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_creates_new_repositories(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_creates_new_repositories(self, mock_request):
         """Test /api/repositories endpoint creates new repositories in database"""
         # Create user in database
         with app.app_context():
@@ -101,8 +105,8 @@ class TestRepositoryManagement(unittest.TestCase):
                 'private': True
             }
         ]
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_repos_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_repos_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -133,8 +137,8 @@ class TestRepositoryManagement(unittest.TestCase):
             self.assertEqual(repo2.language, 'JavaScript')
             self.assertTrue(repo2.is_private)
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_updates_existing_repositories(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_updates_existing_repositories(self, mock_request):
         """Test /api/repositories endpoint updates existing repositories"""
         # Create user and existing repository in database
         with app.app_context():
@@ -173,8 +177,8 @@ class TestRepositoryManagement(unittest.TestCase):
                 'private': False
             }
         ]
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_repos_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_repos_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -193,8 +197,8 @@ class TestRepositoryManagement(unittest.TestCase):
             self.assertEqual(repo.language, 'Python')
             self.assertFalse(repo.is_private)
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_handles_empty_response(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_handles_empty_response(self, mock_request):
         """Test /api/repositories endpoint handles empty repository list"""
         # Create user in database
         with app.app_context():
@@ -207,8 +211,8 @@ class TestRepositoryManagement(unittest.TestCase):
             db.session.commit()
 
         # Mock GitHub API response with empty list
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = []
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = []
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -220,8 +224,8 @@ class TestRepositoryManagement(unittest.TestCase):
         self.assertEqual(response_data['count'], 0)
         self.assertEqual(len(response_data['repositories']), 0)
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_handles_missing_fields(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_handles_missing_fields(self, mock_request):
         """Test /api/repositories endpoint handles repositories with missing optional fields"""
         # Create user in database
         with app.app_context():
@@ -245,8 +249,8 @@ class TestRepositoryManagement(unittest.TestCase):
                 # Missing: description, clone_url, language
             }
         ]
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_repos_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_repos_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -264,8 +268,8 @@ class TestRepositoryManagement(unittest.TestCase):
             self.assertIsNone(repo.clone_url)
             self.assertIsNone(repo.language)
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_handles_api_exception(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_handles_api_exception(self, mock_request):
         """Test /api/repositories endpoint handles general exceptions"""
         # Create user in database
         with app.app_context():
@@ -278,7 +282,7 @@ class TestRepositoryManagement(unittest.TestCase):
             db.session.commit()
 
         # Mock exception during API call
-        mock_get.side_effect = Exception('Connection timeout')
+        mock_request.side_effect = Exception('Connection timeout')
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -289,8 +293,8 @@ class TestRepositoryManagement(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertIn('error', response_data)
 
-    @patch('app.requests.get')
-    def test_get_user_repositories_correct_api_call(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_repositories_correct_api_call(self, mock_request):
         """Test /api/repositories endpoint makes correct API call to GitHub"""
         # Create user in database
         with app.app_context():
@@ -302,8 +306,8 @@ class TestRepositoryManagement(unittest.TestCase):
             db.session.add(user)
             db.session.commit()
 
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = []
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = []
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -311,10 +315,11 @@ class TestRepositoryManagement(unittest.TestCase):
         response = self.app.get('/api/repositories')
         
         # Verify correct API call was made
-        mock_get.assert_called_once_with(
-            'https://api.github.com/user/repos?per_page=100&sort=updated',
-            headers={'Authorization': 'token test_token'}
-        )
+        mock_request.assert_called_once()
+        args, kwargs = mock_request.call_args
+        self.assertEqual(args, ('GET', 'https://api.github.com/user/repos?per_page=100&sort=updated'))
+        self.assertEqual(kwargs['headers']['Authorization'], 'token test_token')
+        self.assertIn('timeout', kwargs)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,211 @@
+import unittest
+import json
+import threading
+import time
+from unittest.mock import patch, MagicMock
+from sqlalchemy import event
+from app import app, db, User, Repository, github_calls, repository_worker, write_counters
+from repository_sync import (
+    parse_link_header, page_number, fetch_repository_pages, store_repository_page, RepositoryFetchError
+)
+
+def make_repo(repo_id):
+    return {
+        'id': repo_id,
+        'name': f'repo-{repo_id}',
+        'full_name': f'testuser/repo-{repo_id}',
+        'html_url': f'https://github.com/testuser/repo-{repo_id}',
+        'private': False
+    }
+
+def link_header(last_page):
+    base = 'https://api.github.com/user/repos?per_page=100&sort=updated'
+    return f'<{base}&page=2>; rel="next", <{base}&page={last_page}>; rel="last"'
+
+class FakePagedClient:
+    """Serves `pages` pages of `per_page` repos and tracks concurrent fetches"""
+
+    def __init__(self, pages, per_page=3, fail_page=None, delay=0.0):
+        self.pages = pages
+        self.per_page = per_page
+        self.fail_page = fail_page
+        self.delay = delay
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, token=None, priority=None):
+        page = page_number(path) or 1
+        with self._lock:
+            self.requested.append(page)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        response = MagicMock()
+        response.status_code = 500 if page == self.fail_page else 200
+        start = (page - 1) * self.per_page
+        response.json.return_value = [make_repo(start + i + 1) for i in range(self.per_page)]
+        response.headers = {'Link': link_header(self.pages)} if page == 1 and self.pages > 1 else {}
+        return response
+
+class TestLinkHeaderParsing(unittest.TestCase):
+    def test_parse_link_header(self):
+        """Test that rel names are mapped to their URLs"""
+        links = parse_link_header(link_header(7))
+        self.assertEqual(page_number(links['next']), 2)
+        self.assertEqual(page_number(links['last']), 7)
+
+    def test_parse_link_header_handles_missing_value(self):
+        """Test that a missing Link header yields no links"""
+        self.assertEqual(parse_link_header(None), {})
+        self.assertEqual(parse_link_header(''), {})
+
+class TestFetchRepositoryPages(unittest.TestCase):
+    def test_single_page_makes_one_request(self):
+        """Test that an account with one page of repos is fetched with one call"""
+        client = FakePagedClient(pages=1)
+        pages = list(fetch_repository_pages(client, 'token'))
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(client.requested, [1])
+
+    def test_all_pages_are_fetched(self):
+        """Test that every page up to rel="last" is requested exactly once"""
+        client = FakePagedClient(pages=10)
+        pages = list(fetch_repository_pages(client, 'token', max_workers=3))
+        repo_ids = sorted(repo['id'] for page in pages for repo in page)
+        self.assertEqual(repo_ids, list(range(1, 31)))
+        self.assertEqual(sorted(client.requested), list(range(1, 11)))
+
+    def test_concurrent_fetches_are_bounded(self):
+        """Test that no more than max_workers pages are in flight at once"""
+        client = FakePagedClient(pages=12, delay=0.01)
+        list(fetch_repository_pages(client, 'token', max_workers=3))
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLessEqual(client.max_in_flight, 3)
+
+    def test_failed_page_raises(self):
+        """Test that a failing page aborts the sync"""
+        client = FakePagedClient(pages=4, fail_page=3)
+        with self.assertRaises(RepositoryFetchError):
+            list(fetch_repository_pages(client, 'token', max_workers=2))
+
+class TestStoreRepositoryPage(unittest.TestCase):
+    def setUp(self):
+        with app.app_context():
+            db.create_all()
+            user = User(github_id=12345, username='testuser', access_token='test_token')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def count_statements(self, repos_data):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            store_repository_page(self.user_id, repos_data)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return [s for s in statements if not s.startswith(('BEGIN', 'COMMIT'))]
+
+    def test_page_is_written_in_constant_statements(self):
+        """Test that a page costs one lookup and batched writes, not a query per repo"""
+        with app.app_context():
+            statements = self.count_statements([make_repo(i) for i in range(1, 101)])
+            # Lookup, repository insert, repository_access insert
+            self.assertEqual(len(statements), 3)
+            self.assertEqual(Repository.query.count(), 100)
+
+    def test_existing_rows_are_updated_in_one_batch(self):
+        """Test that a mixed page updates known repos and inserts new ones"""
+        with app.app_context():
+            store_repository_page(self.user_id, [make_repo(i) for i in range(1, 51)])
+            db.session.commit()
+
+            page = [make_repo(i) for i in range(1, 101)]
+            page[0]['name'] = 'renamed'
+            statements = self.count_statements(page)
+
+            self.assertEqual(len(statements), 4)
+            self.assertEqual(Repository.query.count(), 100)
+            self.assertEqual(Repository.query.filter_by(github_id=1).first().name, 'renamed')
+
+    def test_unchanged_rows_are_skipped(self):
+        """Test that a page identical to what is stored costs only the lookup"""
+        with app.app_context():
+            page = [make_repo(i) for i in range(1, 101)]
+            store_repository_page(self.user_id, page)
+            db.session.commit()
+
+            write_counters.reset()
+            statements = self.count_statements(page)
+
+            self.assertEqual(len(statements), 1)
+            self.assertEqual(write_counters.snapshot()['repository'], {'written': 0, 'skipped': 100})
+
+class TestPaginatedRepositorySync(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            user = User(github_id=12345, username='testuser', access_token='test_token')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        github_calls.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_all_pages_are_stored(self):
+        """Test that /api/repositories stores repositories beyond the first page"""
+        client = FakePagedClient(pages=5, per_page=100)
+
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = 'test_token'
+
+        with patch.object(repository_worker, 'client', client):
+            response = self.app.get('/api/repositories')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['count'], 500)
+        with app.app_context():
+            self.assertEqual(Repository.query.filter_by(user_id=self.user_id).count(), 500)
+
+    def test_shared_repositories_are_listed_for_every_user(self):
+        """Test that a repository two users can see is listed for both, not just its first syncer"""
+        with app.app_context():
+            db.session.add(User(github_id=67890, username='otheruser', access_token='other_token'))
+            db.session.commit()
+
+        listings = {}
+        for token in ('test_token', 'other_token'):
+            with self.app.session_transaction() as sess:
+                sess['github_token'] = token
+            with patch.object(repository_worker, 'client', FakePagedClient(pages=1, per_page=5)):
+                response = self.app.get('/api/repositories')
+            self.assertEqual(response.status_code, 200)
+            listings[token] = [repo['id'] for repo in json.loads(response.data)['repositories']]
+
+        self.assertEqual(len(listings['test_token']), 5)
+        self.assertEqual(sorted(listings['other_token']), sorted(listings['test_token']))
+        with app.app_context():
+            self.assertEqual(Repository.query.count(), 5)
+
+if __name__ == '__main__':
+    unittest.main()
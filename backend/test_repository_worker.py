@@ -0,0 +1,150 @@
+import unittest
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+from app import app, db, User, Repository, github_calls, repository_worker
+from github_ratelimit import PRIORITY_LOW
+from repository_sync import page_number, sync_changed_repositories
+from repository_worker import RepositorySyncWorker
+
+def make_repo(repo_id, updated_at):
+    return {
+        'id': repo_id,
+        'name': f'repo-{repo_id}',
+        'full_name': f'testuser/repo-{repo_id}',
+        'html_url': f'https://github.com/testuser/repo-{repo_id}',
+        'private': False,
+        'updated_at': updated_at,
+        'pushed_at': updated_at
+    }
+
+class ListingClient:
+    """Serves /user/repos newest first, `per_page` at a time, following rel="next" """
+
+    def __init__(self, repos, per_page=2):
+        self.repos = repos
+        self.per_page = per_page
+        self.requested = []
+        self.priorities = []
+
+    def get(self, path, token=None, priority=None):
+        page = page_number(path) or 1
+        self.requested.append(page)
+        self.priorities.append(priority)
+        ordered = sorted(self.repos, key=lambda r: r['updated_at'], reverse=True)
+        start = (page - 1) * self.per_page
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = ordered[start:start + self.per_page]
+        response.headers = {}
+        if start + self.per_page < len(ordered):
+            response.headers['Link'] = f'<https://api.github.com/user/repos?page={page + 1}>; rel="next"'
+        return response
+
+class RepositoryWorkerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            user = User(github_id=12345, username='testuser', access_token='test_token')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        github_calls.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+class TestIncrementalSync(RepositoryWorkerTestCase):
+    def test_first_sync_stores_everything_and_sets_watermark(self):
+        """Test that a sync without a watermark stores all repos and records the newest change"""
+        client = ListingClient([make_repo(i, f'2025-01-0{i}T00:00:00Z') for i in range(1, 6)])
+        with app.app_context():
+            count, watermark = sync_changed_repositories(client, self.user_id, 'test_token')
+            self.assertEqual(count, 5)
+            self.assertEqual(watermark, '2025-01-05T00:00:00Z')
+            self.assertEqual(Repository.query.count(), 5)
+
+    def test_only_changed_repositories_are_processed(self):
+        """Test that a sync with a watermark stops paging once it reaches older repos"""
+        repos = [make_repo(i, f'2025-01-0{i}T00:00:00Z') for i in range(1, 8)]
+        client = ListingClient(repos)
+        with app.app_context():
+            count, watermark = sync_changed_repositories(client, self.user_id, 'test_token',
+                                                         since='2025-01-05T00:00:00Z')
+            self.assertEqual(count, 2)
+            self.assertEqual(watermark, '2025-01-07T00:00:00Z')
+            self.assertEqual(client.requested, [1, 2])
+            self.assertEqual(sorted(r.github_id for r in Repository.query.all()), [6, 7])
+
+    def test_nothing_changed_keeps_watermark(self):
+        """Test that an unchanged listing costs one page and keeps the watermark"""
+        client = ListingClient([make_repo(i, f'2025-01-0{i}T00:00:00Z') for i in range(1, 4)])
+        with app.app_context():
+            count, watermark = sync_changed_repositories(client, self.user_id, 'test_token',
+                                                         since='2025-01-03T00:00:00Z')
+            self.assertEqual((count, watermark), (0, '2025-01-03T00:00:00Z'))
+            self.assertEqual(client.requested, [1])
+
+class TestRepositorySyncWorker(RepositoryWorkerTestCase):
+    def test_run_once_syncs_due_users_incrementally(self):
+        """Test that scheduled runs sync at low priority and advance the watermark"""
+        client = ListingClient([make_repo(1, '2025-01-01T00:00:00Z')])
+        worker = RepositorySyncWorker(app, client, interval=0)
+
+        self.assertEqual(worker.run_once(), 1)
+        client.repos.append(make_repo(2, '2025-02-01T00:00:00Z'))
+        client.requested.clear()
+        self.assertEqual(worker.run_once(), 1)
+
+        self.assertEqual(client.requested, [1])
+        self.assertEqual(set(client.priorities), {PRIORITY_LOW})
+        with app.app_context():
+            user = db.session.get(User, self.user_id)
+            self.assertEqual(user.repos_watermark, '2025-02-01T00:00:00Z')
+            self.assertEqual(Repository.query.count(), 2)
+        self.assertEqual(worker.stats()['synced_users'], 2)
+
+    def test_recently_synced_users_are_not_due(self):
+        """Test that users synced within the interval are skipped"""
+        worker = RepositorySyncWorker(app, ListingClient([]), interval=300)
+        with app.app_context():
+            user = db.session.get(User, self.user_id)
+            user.repos_synced_at = datetime.now(timezone.utc) - timedelta(seconds=10)
+            db.session.commit()
+        self.assertEqual(worker.due_users(), [])
+
+    def test_sync_does_not_refresh_profile_timestamp(self):
+        """Test that recording a sync leaves User.updated_at alone"""
+        worker = RepositorySyncWorker(app, ListingClient([make_repo(1, '2025-01-01T00:00:00Z')]))
+        with app.app_context():
+            before = db.session.get(User, self.user_id).updated_at
+        worker.sync_user(self.user_id)
+        with app.app_context():
+            user = db.session.get(User, self.user_id)
+            self.assertIsNotNone(user.repos_synced_at)
+            self.assertEqual(user.updated_at, before)
+
+class TestRepositoriesEndpoint(RepositoryWorkerTestCase):
+    def test_synced_user_is_served_from_database(self):
+        """Test that /api/repositories does not call GitHub once the user has been synced"""
+        client = ListingClient([make_repo(1, '2025-01-01T00:00:00Z')])
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = 'test_token'
+
+        with patch.object(repository_worker, 'client', client):
+            first = self.app.get('/api/repositories')
+            second = self.app.get('/api/repositories')
+
+        self.assertEqual(client.requested, [1])
+        self.assertEqual(first.status_code, 200)
+        data = json.loads(second.data)
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['repositories'][0]['id'], 1)
+        self.assertEqual(data['repositories'][0]['owner']['login'], 'testuser')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from sqlalchemy import inspect, text
+from app import app, db, User, Repository
+from repository_listing import user_repositories
+from github_cache import hash_token
+from schema import upgrade_schema
+
+class TestUpgradeSchema(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.drop_all()
+            # The user table as created before token hashes and repository sync state
+            db.session.execute(text(
+                'CREATE TABLE user (id INTEGER PRIMARY KEY, github_id INTEGER NOT NULL UNIQUE, '
+                'username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120), avatar_url VARCHAR(255), '
+                'access_token VARCHAR(255), created_at DATETIME, updated_at DATETIME)'))
+            db.session.execute(text(
+                "INSERT INTO user (github_id, username, access_token) VALUES (12345, 'testuser', 'old_token')"))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_missing_columns_are_added_and_backfilled(self):
+        """Test that an old database gains the current columns and token hashes"""
+        with app.app_context():
+            added = upgrade_schema()
+            self.assertIn('user.access_token_hash', added)
+            columns = {column['name'] for column in inspect(db.engine).get_columns('user')}
+            self.assertTrue({'access_token_hash', 'content_hash', 'repos_watermark'} <= columns)
+            indexes = [index['column_names'] for index in inspect(db.engine).get_indexes('user')]
+            self.assertIn(['access_token_hash'], indexes)
+            self.assertEqual(User.query.one().access_token_hash, hash_token('old_token'))
+
+            self.assertEqual(upgrade_schema(), [])
+
+    def test_adding_changed_at_resets_sync_watermarks(self):
+        """Test that repositories get GitHub timestamps by a full sync once the column is added"""
+        with app.app_context():
+            upgrade_schema()
+            User.query.one().repos_watermark = '2024-05-01T00:00:00Z'
+            db.session.commit()
+            db.session.execute(text('ALTER TABLE repository DROP COLUMN changed_at'))
+            db.session.commit()
+
+            self.assertEqual(upgrade_schema(), ['repository.changed_at'])
+            self.assertIsNone(User.query.one().repos_watermark)
+
+    def test_synced_repositories_are_listed_for_their_user(self):
+        """Test that repositories stored before repository_access stay listed for their user"""
+        with app.app_context():
+            upgrade_schema()
+            user = User.query.one()
+            db.session.add(Repository(github_id=1, name='repo', full_name='testuser/repo',
+                                      html_url='https://github.com/testuser/repo', user_id=user.id))
+            db.session.commit()
+            self.assertEqual(user_repositories(user.id)[0], [])
+
+            upgrade_schema()
+            self.assertEqual([repo['name'] for repo in user_repositories(user.id)[0]], ['repo'])
+            upgrade_schema()
+            self.assertEqual(len(user.listed_repositories), 1)
+
+if __name__ == '__main__':
+    unittest.main()
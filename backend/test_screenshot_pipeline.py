@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import uuid
+from io import BytesIO
+from PIL import Image
+from app import app, db, BugReport, screenshots, screenshot_pipeline, submission_limiter
+from screenshot_pipeline import ScreenshotPipeline, render_derivatives
+from screenshot_store import LocalScreenshotStore
+
+def png_bytes(size=(1200, 800), color=(200, 30, 30)):
+    image = Image.new('RGB', size, color)
+    exif = Image.Exif()
+    exif[0x0110] = 'Secret Phone Model'
+    exif[0x010e] = uuid.uuid4().hex  # unique bytes, so nothing is already rendered in the store
+    output = BytesIO()
+    image.save(output, 'PNG', exif=exif)
+    return output.getvalue()
+
+class TestRenderDerivatives(unittest.TestCase):
+    def test_webp_and_thumbnail_without_metadata(self):
+        """Test that both variants are WebP, the thumbnail is bounded and EXIF is gone"""
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.png')
+            with open(source, 'wb') as output:
+                output.write(png_bytes())
+            webp, thumbnail = os.path.join(tmp, 'full.webp'), os.path.join(tmp, 'thumb.webp')
+            render_derivatives(source, webp, thumbnail, thumbnail_size=320)
+
+            with Image.open(webp) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (1200, 800)))
+                self.assertNotIn('exif', image.info)
+            with Image.open(thumbnail) as image:
+                self.assertEqual(image.size, (320, 213))
+            self.assertEqual(sorted(os.listdir(tmp)), ['full.webp', 'source.png', 'thumb.webp'])
+
+class TestScreenshotPipeline(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        submission_limiter.clear()
+        screenshot_pipeline.drain()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def submit(self, content):
+        response = self.app.post('/api/bug-report', content_type='multipart/form-data', data={
+            'title': 'Test Bug',
+            'description': 'Test Description',
+            'screenshot': (BytesIO(content), 'screenshot.png'),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['bug_report_id']
+
+    def test_submit_does_not_wait_for_rendering(self):
+        """Test that the report is saved first and derived paths are recorded when the job runs"""
+        report_id = self.submit(png_bytes(color=(10, 20, 30)))
+        with app.app_context():
+            self.assertIsNone(db.session.get(BugReport, report_id).thumbnail_path)
+
+        screenshot_pipeline.drain()
+        with app.app_context():
+            report = db.session.get(BugReport, report_id)
+            self.assertTrue(screenshots.exists(report.thumbnail_path))
+            self.assertTrue(report.screenshot_webp_path.endswith('.opt.webp'))
+        listing = self.app.get('/api/bug-reports').get_json()['bug_reports']
+        self.assertTrue(listing[0]['has_thumbnail'])
+
+    def test_rendered_screenshot_is_reused(self):
+        """Test that a second report with the same screenshot gets the derived paths at once"""
+        content = png_bytes(color=(40, 50, 60))
+        self.submit(content)
+        screenshot_pipeline.drain()
+        queued = screenshot_pipeline.stats()['queued']
+
+        report_id = self.submit(content)
+        self.assertEqual(screenshot_pipeline.stats()['queued'], queued)
+        with app.app_context():
+            self.assertIsNotNone(db.session.get(BugReport, report_id).thumbnail_path)
+
+    def test_undecodable_screenshot_is_left_as_is(self):
+        """Test that a file Pillow cannot read is counted as failed and keeps the original only"""
+        failed = screenshot_pipeline.stats()['failed']
+        report_id = self.submit(b'fake image data')
+        screenshot_pipeline.drain()
+        self.assertEqual(screenshot_pipeline.stats()['failed'], failed + 1)
+        with app.app_context():
+            report = db.session.get(BugReport, report_id)
+            self.assertIsNotNone(report.screenshot_path)
+            self.assertIsNone(report.thumbnail_path)
+
+    def test_process_pool_renders_in_background(self):
+        """Test the pool-backed path end to end"""
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        store = LocalScreenshotStore(root)
+        pipeline = ScreenshotPipeline(app, store, max_workers=1)
+        key = store.put(BytesIO(png_bytes(color=(70, 80, 90))), 'png')
+        with app.app_context():
+            db.session.add(BugReport(title='t', description='d', screenshot_path=key))
+            db.session.commit()
+
+        pipeline.start()
+        self.addCleanup(pipeline.stop)
+        pipeline.submit(key)
+        deadline = time.monotonic() + 30
+        while pipeline.stats()['rendered'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pipeline.stats()['rendered'], 1)
+        with app.app_context():
+            self.assertIsNotNone(BugReport.query.filter_by(screenshot_path=key).first().thumbnail_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import hashlib
+import unittest
+import uuid
+from io import BytesIO
+from unittest.mock import patch
+from PIL import Image
+from app import app, db, User, Repository, BugReport, screenshot_pipeline, submission_limiter
+from user_lookup import token_users
+
+def png_bytes():
+    output = BytesIO()
+    Image.new('RGB', (640, 480), (10, 120, 200)).save(output, 'PNG')
+    return output.getvalue() + uuid.uuid4().bytes  # trailing bytes keep the hash unique
+
+class TestScreenshotServing(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            reporter = User(github_id=1, username='reporter', access_token='reporter_token')
+            owner = User(github_id=2, username='owner', access_token='owner_token')
+            stranger = User(github_id=3, username='stranger', access_token='stranger_token')
+            db.session.add_all([reporter, owner, stranger])
+            db.session.commit()
+            repository = Repository(github_id=99, name='app', full_name='owner/app',
+                                    html_url='https://github.com/owner/app', user_id=owner.id, users=[owner])
+            db.session.add(repository)
+            db.session.commit()
+            self.repository_id = repository.id
+        token_users.clear()
+        submission_limiter.clear()
+        screenshot_pipeline.drain()
+
+        self.content = png_bytes()
+        self.login('reporter_token')
+        response = self.app.post('/api/bug-report', content_type='multipart/form-data', data={
+            'title': 'Test Bug',
+            'description': 'Test Description',
+            'repository_id': str(self.repository_id),
+            'screenshot': (BytesIO(self.content), 'screenshot.png'),
+        })
+        self.report_id = response.get_json()['bug_report_id']
+        self.url = f'/api/bug-reports/{self.report_id}/screenshot'
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def login(self, token):
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = token
+
+    def test_reporter_gets_screenshot_with_immutable_caching(self):
+        """Test that the original is served with a content-hash ETag and immutable caching"""
+        response = self.app.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.content)
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertEqual(response.get_etag()[0], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(response.headers['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(response.headers['X-Content-Type-Options'], 'nosniff')
+
+    def test_if_none_match_and_range(self):
+        """Test that a cached copy gets 304 and a byte range gets 206"""
+        etag = self.app.get(self.url).headers['ETag']
+        self.assertEqual(self.app.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+
+        response = self.app.get(self.url, headers={'Range': 'bytes=0-7'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, self.content[:8])
+        self.assertEqual(response.headers['Content-Range'], f'bytes 0-7/{len(self.content)}')
+
+    def test_access_is_limited_to_reporter_and_repository_owner(self):
+        """Test that anonymous users get 401 and unrelated users cannot tell the report exists"""
+        self.login('owner_token')
+        self.assertEqual(self.app.get(self.url).status_code, 200)
+        self.login('stranger_token')
+        self.assertEqual(self.app.get(self.url).status_code, 404)
+        with self.app.session_transaction() as sess:
+            sess.clear()
+        self.assertEqual(self.app.get(self.url).status_code, 401)
+
+    def test_access_follows_repository_listing_not_first_syncer(self):
+        """Test that users the repository is listed for can view, and its first syncer alone cannot"""
+        with app.app_context():
+            repository = db.session.get(Repository, self.repository_id)
+            stranger = User.query.filter_by(username='stranger').one()
+            repository.users = [stranger]
+            db.session.commit()
+        self.login('stranger_token')
+        self.assertEqual(self.app.get(self.url).status_code, 200)
+        self.login('owner_token')
+        self.assertEqual(self.app.get(self.url).status_code, 404)
+
+    def test_thumbnail_is_served_once_rendered(self):
+        """Test that the thumbnail is 404 until the pipeline has run, then a WebP"""
+        thumbnail_url = f'/api/bug-reports/{self.report_id}/thumbnail'
+        self.assertEqual(self.app.get(thumbnail_url).status_code, 404)
+        screenshot_pipeline.drain()
+
+        response = self.app.get(thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/webp')
+        self.assertTrue(response.get_etag()[0].endswith('-thumbnail'))
+        listing = self.app.get('/api/bug-reports').get_json()['bug_reports']
+        self.assertEqual(listing[0]['thumbnail_url'], thumbnail_url)
+
+    def test_proxy_offload(self):
+        """Test that X-Accel-Redirect hands the file to the proxy without a body"""
+        with patch('app.SCREENSHOT_OFFLOAD', 'x-accel-redirect'):
+            response = self.app.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'')
+        with app.app_context():
+            key = db.session.get(BugReport, self.report_id).screenshot_path
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-screenshots/{key}')
+        self.assertEqual(response.headers['Cache-Control'], 'private, max-age=31536000, immutable')
+
+if __name__ == '__main__':
+    unittest.main()
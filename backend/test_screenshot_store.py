@@ -0,0 +1,145 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+from app import app, db, BugReport, screenshots, submission_limiter
+from screenshot_store import ScreenshotStore, LocalScreenshotStore, screenshot_key, key_digest, release_screenshots
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x01' * 32
+
+class TestLocalScreenshotStore(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = LocalScreenshotStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_put_is_content_addressed_and_sharded(self):
+        """Test that the key is derived from the SHA-256 and laid out in shard directories"""
+        digest = hashlib.sha256(PNG).hexdigest()
+        key = self.store.put(BytesIO(PNG), 'png')
+        self.assertEqual(key, f"{digest[:2]}/{digest[2:4]}/{digest}.png")
+        self.assertEqual(key_digest(key), digest)
+        with self.store.open(key) as stored:
+            self.assertEqual(stored.read(), PNG)
+
+    def test_identical_content_is_stored_once(self):
+        """Test that a second copy of the same bytes reuses the stored file"""
+        first = self.store.put(BytesIO(PNG), 'png')
+        second = self.store.put(BytesIO(PNG), 'png')
+        self.assertEqual(first, second)
+        self.store.settle([first, second])
+        files = [name for _, _, names in os.walk(self.root) for name in names]
+        self.assertEqual(files, [os.path.basename(first)])
+
+    def test_settle_restores_a_file_released_before_commit(self):
+        """Test that a held upload is put back if another worker deleted its file before the commit"""
+        key = self.store.put(BytesIO(PNG), 'png')
+        self.assertTrue(self.store.holds(key))
+        self.store.delete(key)
+        self.store.settle([key])
+        self.assertFalse(self.store.holds(key))
+        with self.store.open(key) as stored:
+            self.assertEqual(stored.read(), PNG)
+        files = [name for _, _, names in os.walk(self.root) for name in names]
+        self.assertEqual(files, [os.path.basename(key)])
+
+    def test_incomplete_backend_cannot_be_created(self):
+        """Test that a backend missing part of the interface fails when created"""
+        class ReadOnlyStore(ScreenshotStore):
+            def open(self, key):
+                return BytesIO(PNG)
+
+        with self.assertRaises(TypeError):
+            ReadOnlyStore()
+
+    def test_keys_cannot_escape_the_root(self):
+        """Test that a crafted key is refused rather than resolved outside the store"""
+        with self.assertRaises(ValueError):
+            self.store.local_path('../../etc/passwd')
+        self.assertIsNone(key_digest('1700000000_screenshot.png'))
+
+class TestScreenshotReferences(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        submission_limiter.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def submit(self, content):
+        response = self.app.post('/api/bug-report', content_type='multipart/form-data', data={
+            'title': 'Test Bug',
+            'description': 'Test Description',
+            'screenshot': (BytesIO(content), 'screenshot.png'),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['bug_report_id']
+
+    def test_duplicate_uploads_share_a_file(self):
+        """Test that two reports with the same screenshot point at one stored key"""
+        first, second = self.submit(PNG), self.submit(PNG)
+        with app.app_context():
+            keys = {db.session.get(BugReport, report_id).screenshot_path for report_id in (first, second)}
+        self.assertEqual(keys, {screenshot_key(hashlib.sha256(PNG).hexdigest(), 'png')})
+        self.assertFalse(screenshots.holds(keys.pop()))
+
+    def test_file_is_released_with_its_last_reference(self):
+        """Test that deleting reports removes the screenshot only when none refer to it"""
+        first, second = self.submit(PNG), self.submit(PNG)
+        with app.app_context():
+            key = db.session.get(BugReport, first).screenshot_path
+            db.session.delete(db.session.get(BugReport, first))
+            db.session.commit()
+            self.assertTrue(screenshots.exists(key))
+            db.session.delete(db.session.get(BugReport, second))
+            db.session.commit()
+            self.assertFalse(screenshots.exists(key))
+
+    def test_upload_awaiting_commit_survives_release(self):
+        """Test that deleting the last report keeps a file an uncommitted upload was deduplicated onto"""
+        report_id = self.submit(PNG)
+        with app.app_context():
+            key = screenshots.put(BytesIO(PNG), 'png')
+            db.session.delete(db.session.get(BugReport, report_id))
+            db.session.commit()
+            self.assertTrue(screenshots.exists(key))
+
+            db.session.add(BugReport(title='t', description='d', screenshot_path=key))
+            db.session.commit()
+            screenshots.settle([key])
+            self.assertTrue(screenshots.exists(key))
+            self.assertEqual(release_screenshots(screenshots, [key]), 0)
+
+    def test_failed_insert_releases_its_screenshot(self):
+        """Test that a screenshot whose report was never saved is not left behind"""
+        key = screenshot_key(hashlib.sha256(PNG).hexdigest(), 'png')
+        with patch('app.encode_device_info', side_effect=RuntimeError('database is locked')):
+            response = self.app.post('/api/bug-report', content_type='multipart/form-data', data={
+                'title': 'Test Bug',
+                'description': 'Test Description',
+                'screenshot': (BytesIO(PNG), 'screenshot.png'),
+            })
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(screenshots.holds(key))
+        self.assertFalse(screenshots.exists(key))
+
+    def test_release_skips_referenced_keys(self):
+        """Test that release_screenshots leaves files that are still referenced"""
+        report_id = self.submit(PNG)
+        with app.app_context():
+            key = db.session.get(BugReport, report_id).screenshot_path
+            self.assertEqual(release_screenshots(screenshots, [key]), 0)
+            self.assertTrue(screenshots.exists(key))
+
+if __name__ == '__main__':
+    unittest.main()
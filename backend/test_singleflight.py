@@ -0,0 +1,84 @@
+import unittest
+import threading
+import time
+from singleflight import SingleFlight
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        """Test that callers arriving while a call is in flight wait for its result"""
+        group = SingleFlight(grace=0)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'login': 'octocat'}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(group.do('key', work)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(group.do('key', work))) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while group.stats()['collapsed'] < 4 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(group.stats(), {'in_flight': 0, 'executed': 1, 'collapsed': 4})
+
+    def test_result_is_reused_within_grace_window(self):
+        """Test that a caller arriving just after completion gets the same result"""
+        clock = FakeClock()
+        group = SingleFlight(grace=1.0, clock=clock)
+        calls = []
+
+        group.do('key', lambda: calls.append(1) or len(calls))
+        clock.now = 0.5
+        self.assertEqual(group.do('key', lambda: calls.append(1) or len(calls)), 1)
+        clock.now = 1.5
+        self.assertEqual(group.do('key', lambda: calls.append(1) or len(calls)), 2)
+
+    def test_different_keys_are_not_coalesced(self):
+        """Test that each key runs its own call"""
+        group = SingleFlight()
+        self.assertEqual(group.do('a', lambda: 'a'), 'a')
+        self.assertEqual(group.do('b', lambda: 'b'), 'b')
+        self.assertEqual(group.stats()['collapsed'], 0)
+
+    def test_errors_are_not_kept_for_grace_window(self):
+        """Test that a failed call is retried by the next caller"""
+        group = SingleFlight(grace=60)
+
+        def fail():
+            raise ValueError('upstream down')
+
+        with self.assertRaises(ValueError):
+            group.do('key', fail)
+        self.assertEqual(group.do('key', lambda: 'ok'), 'ok')
+
+    def test_forget_drops_completed_result(self):
+        """Test that a completed result can be invalidated explicitly"""
+        group = SingleFlight(grace=60)
+        group.do('key', lambda: 'old')
+        group.forget('key')
+        self.assertEqual(group.do('key', lambda: 'new'), 'new')
+
+if __name__ == '__main__':
+    unittest.main()
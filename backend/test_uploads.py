@@ -0,0 +1,91 @@
+import hashlib
+import os
+import unittest
+from io import BytesIO
+from unittest.mock import patch
+from app import app, db, BugReport, UPLOAD_FOLDER, submission_limiter, screenshots
+from uploads import StreamingUpload, UploadTooLarge, sniff_content_type, looks_dangerous
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+
+def leftover_uploads():
+    return [name for name in os.listdir(UPLOAD_FOLDER) if name.startswith('.upload-')]
+
+class TestStreamingUpload(unittest.TestCase):
+    def test_write_hashes_and_sniffs(self):
+        """Test that size, SHA-256 and the sniffed type are known once the body is written"""
+        upload = StreamingUpload(UPLOAD_FOLDER)
+        upload.write(PNG[:4])
+        upload.write(PNG[4:])
+        self.assertEqual(upload.size, len(PNG))
+        self.assertEqual(upload.sha256, hashlib.sha256(PNG).hexdigest())
+        self.assertEqual(upload.content_type, 'image/png')
+        upload.seek(0)
+        self.assertEqual(upload.read(), PNG)
+        upload.close()
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_write_past_limit_aborts_and_cleans_up(self):
+        """Test that going over max_size raises and removes the partial file"""
+        upload = StreamingUpload(UPLOAD_FOLDER, max_size=10)
+        upload.write(b'x' * 8)
+        with self.assertRaises(UploadTooLarge):
+            upload.write(b'x' * 8)
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_sniffing(self):
+        """Test that image signatures are recognised and executables or markup flagged"""
+        self.assertEqual(sniff_content_type(b'RIFF\x00\x00\x00\x00WEBPVP8 '), 'image/webp')
+        self.assertEqual(sniff_content_type(b'GIF89a'), 'image/gif')
+        self.assertIsNone(sniff_content_type(b'fake image data'))
+        self.assertTrue(looks_dangerous(b'MZ\x90\x00'))
+        self.assertTrue(looks_dangerous(b'  <SCRIPT>alert(1)</script>'))
+        self.assertFalse(looks_dangerous(PNG))
+
+class TestStreamingBugReportUpload(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        submission_limiter.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def post(self, content, filename='screenshot.png'):
+        return self.app.post('/api/bug-report', content_type='multipart/form-data', data={
+            'title': 'Test Bug',
+            'description': 'Test Description',
+            'screenshot': (BytesIO(content), filename),
+        })
+
+    def test_screenshot_is_moved_into_place(self):
+        """Test that an accepted upload is renamed into the screenshot store intact"""
+        response = self.post(PNG)
+        self.assertEqual(response.status_code, 201)
+        with app.app_context():
+            report = db.session.get(BugReport, response.get_json()['bug_report_id'])
+            with screenshots.open(report.screenshot_path) as stored:
+                self.assertEqual(stored.read(), PNG)
+        self.assertEqual(leftover_uploads(), [])
+
+    def test_oversized_file_is_aborted_while_streaming(self):
+        """Test that the per-file limit applies even when the request size limit would allow it"""
+        with patch('app.MAX_BUG_REPORT_REQUEST_SIZE', 64 * 1024 * 1024):
+            response = self.post(b'x' * (5 * 1024 * 1024 + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], 'File size too large. Maximum size is 5MB.')
+        self.assertEqual(leftover_uploads(), [])
+
+    def test_disguised_executable_is_rejected(self):
+        """Test that the sniffed bytes, not just the extension, decide"""
+        response = self.post(b'MZ\x90\x00' + b'\x00' * 60)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], 'Invalid file type. Only image files are allowed.')
+        self.assertEqual(leftover_uploads(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import patch
+from sqlalchemy import inspect
+from app import app, db, User, github_calls, profile_cache, profile_writes, store_user_profile
+from models import content_hash
+from github_cache import hash_token
+from user_lookup import user_for_token, token_users
+
+class TestUserLookup(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            user = User(github_id=12345, username='testuser', access_token='old_token')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        token_users.clear()
+        github_calls.clear()
+        profile_cache.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_token_hash_is_indexed_and_kept_in_sync(self):
+        """Test that access_token_hash follows access_token and is indexed"""
+        with app.app_context():
+            user = db.session.get(User, self.user_id)
+            self.assertEqual(user.access_token_hash, hash_token('old_token'))
+            user.access_token = 'new_token'
+            self.assertEqual(user.access_token_hash, hash_token('new_token'))
+
+            indexes = inspect(db.engine).get_indexes('user')
+            self.assertIn(['access_token_hash'], [index['column_names'] for index in indexes])
+
+    def test_lookup_is_cached(self):
+        """Test that a resolved token is remembered by hash"""
+        with app.app_context():
+            self.assertEqual(user_for_token('old_token').id, self.user_id)
+        self.assertEqual(token_users.get(hash_token('old_token')), self.user_id)
+        with app.app_context():
+            self.assertIsNone(user_for_token('unknown_token'))
+
+    def test_stale_mapping_is_not_trusted(self):
+        """Test that a cached id whose row no longer holds the token is dropped"""
+        token_users.set(hash_token('old_token'), self.user_id)
+        with app.app_context():
+            user = db.session.get(User, self.user_id)
+            user.access_token = 'rotated_elsewhere'
+            db.session.commit()
+            self.assertIsNone(user_for_token('old_token'))
+        self.assertNotIn(hash_token('old_token'), token_users)
+
+    @patch('github_client.requests.Session.request')
+    def test_token_rotation_invalidates_old_token(self, mock_request):
+        """Test that /api/user storing a new token stops the old one resolving"""
+        with app.app_context():
+            user_for_token('old_token')
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'id': 12345, 'login': 'testuser'}
+
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = 'new_token'
+        self.assertEqual(self.app.get('/api/user').status_code, 200)
+
+        self.assertNotIn(hash_token('old_token'), token_users)
+        with app.app_context():
+            self.assertIsNone(user_for_token('old_token'))
+            self.assertEqual(user_for_token('new_token').id, self.user_id)
+
+    def clear_token_hash(self):
+        """Make the row look like one stored before access_token_hash existed"""
+        with app.app_context():
+            db.session.execute(User.__table__.update().values(access_token_hash=None))
+            db.session.commit()
+
+    def test_rows_without_hash_still_resolve(self):
+        """Test that a row with no token hash is found by its token and gets its hash written"""
+        self.clear_token_hash()
+        with app.app_context():
+            self.assertEqual(user_for_token('old_token').id, self.user_id)
+            self.assertEqual(db.session.get(User, self.user_id).access_token_hash, hash_token('old_token'))
+            self.assertIsNone(user_for_token('unknown_token'))
+
+    def test_unchanged_profile_refresh_writes_missing_hash(self):
+        """Test that a profile refresh matching the content hash still fills in the token hash"""
+        with app.app_context():
+            user = db.session.get(User, self.user_id)
+            user.content_hash = content_hash({'username': 'testuser', 'email': None, 'avatar_url': None,
+                                              'access_token': 'old_token'})
+            db.session.commit()
+        self.clear_token_hash()
+        with app.app_context():
+            store_user_profile({'id': 12345, 'login': 'testuser'}, 'old_token')
+            profile_writes.flush()
+            self.assertEqual(db.session.get(User, self.user_id).access_token_hash, hash_token('old_token'))
+
+if __name__ == '__main__':
+    unittest.main()
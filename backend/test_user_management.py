@@ -1,7 +1,9 @@
 import unittest
 import json
+import time
 from unittest.mock import patch, MagicMock
-from app import app, db, User, Repository
+from app import app, db, User, Repository, github_calls, profile_cache, write_counters
+from github_ratelimit import RateLimitExceeded
 
 class TestUserManagement(unittest.TestCase):
     def setUp(self):
@@ -15,6 +17,10 @@ class TestUserManagement(unittest.TestCase):
         with app.app_context():
             db.create_all()
 
+        # Don't let coalesced results from a previous test leak into this one
+        github_calls.clear()
+        profile_cache.clear()
+
     def tearDown(self):
         with app.app_context():
             db.session.remove()
@@ -28,11 +34,11 @@ class TestUserManagement(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertEqual(response_data['error'], 'Not authenticated')
 
-    @patch('app.requests.get')
-    def test_get_current_user_github_api_failure(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_current_user_github_api_failure(self, mock_request):
         """Test /api/user endpoint when GitHub API fails"""
         # Mock GitHub API failure
-        mock_get.return_value.status_code = 401
+        mock_request.return_value.status_code = 401
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -43,8 +49,8 @@ class TestUserManagement(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertEqual(response_data['error'], 'Failed to fetch user data')
 
-    @patch('app.requests.get')
-    def test_get_current_user_creates_new_user(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_current_user_creates_new_user(self, mock_request):
         """Test /api/user endpoint creates new user in database"""
         # Mock GitHub API response
         mock_user_data = {
@@ -53,8 +59,8 @@ class TestUserManagement(unittest.TestCase):
             'email': 'test@example.com',
             'avatar_url': 'https://github.com/images/error/testuser_happy.gif'
         }
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_user_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_user_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -74,8 +80,8 @@ class TestUserManagement(unittest.TestCase):
             self.assertEqual(user.email, 'test@example.com')
             self.assertEqual(user.access_token, 'test_token')
 
-    @patch('app.requests.get')
-    def test_get_current_user_updates_existing_user(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_current_user_updates_existing_user(self, mock_request):
         """Test /api/user endpoint updates existing user"""
         # Create existing user
         with app.app_context():
@@ -96,8 +102,8 @@ class TestUserManagement(unittest.TestCase):
             'email': 'new@example.com',
             'avatar_url': 'new_avatar.gif'
         }
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_user_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_user_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'new_token'
@@ -115,8 +121,8 @@ class TestUserManagement(unittest.TestCase):
             self.assertEqual(user.avatar_url, 'new_avatar.gif')
             self.assertEqual(user.access_token, 'new_token')
 
-    @patch('app.requests.get')
-    def test_get_current_user_handles_missing_email(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_current_user_handles_missing_email(self, mock_request):
         """Test /api/user endpoint handles missing email field"""
         mock_user_data = {
             'id': 12345,
@@ -124,8 +130,8 @@ class TestUserManagement(unittest.TestCase):
             'avatar_url': 'avatar.gif'
             # No email field
         }
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_user_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_user_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -140,6 +146,19 @@ class TestUserManagement(unittest.TestCase):
             self.assertIsNotNone(user)
             self.assertIsNone(user.email)
 
+    @patch('app.github.get')
+    def test_get_current_user_rate_limited(self, mock_github_get):
+        """Test /api/user endpoint returns 429 when the token's GitHub budget is exhausted"""
+        mock_github_get.side_effect = RateLimitExceeded('exhausted', retry_at=time.time() + 120)
+
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = 'test_token'
+
+        response = self.app.get('/api/user')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers['Retry-After']), 0)
+
     def test_get_user_info_not_authenticated(self):
         """Test /me endpoint when user is not authenticated"""
         response = self.app.get('/me')
@@ -147,10 +166,10 @@ class TestUserManagement(unittest.TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect
         self.assertIn('/login/github', response.location)
 
-    @patch('app.requests.get')
-    def test_get_user_info_github_api_failure(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_info_github_api_failure(self, mock_request):
         """Test /me endpoint when GitHub API fails"""
-        mock_get.return_value.status_code = 401
+        mock_request.return_value.status_code = 401
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -160,16 +179,16 @@ class TestUserManagement(unittest.TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect
         self.assertIn('error=failed_to_fetch_user', response.location)
 
-    @patch('app.requests.get')
-    def test_get_user_info_success(self, mock_get):
+    @patch('github_client.requests.Session.request')
+    def test_get_user_info_success(self, mock_request):
         """Test /me endpoint returns user data successfully"""
         mock_user_data = {
             'id': 12345,
             'login': 'testuser',
             'email': 'test@example.com'
         }
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = mock_user_data
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = mock_user_data
 
         with self.app.session_transaction() as sess:
             sess['github_token'] = 'test_token'
@@ -180,5 +199,109 @@ class TestUserManagement(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertEqual(response_data['login'], 'testuser')
 
+class TestProfileCache(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+        github_calls.clear()
+        profile_cache.clear()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def mock_profile(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {
+            'id': 12345,
+            'login': 'testuser',
+            'email': 'test@example.com',
+            'avatar_url': 'avatar.gif'
+        }
+
+    def login(self, token='test_token'):
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = token
+
+    @patch('github_client.requests.Session.request')
+    def test_api_user_is_served_from_cache(self, mock_request):
+        """Test that repeated /api/user calls only reach GitHub once"""
+        self.mock_profile(mock_request)
+        self.login()
+
+        first = self.app.get('/api/user')
+        github_calls.clear()
+        second = self.app.get('/api/user')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(second.data)['user']['login'], 'testuser')
+        self.assertEqual(mock_request.call_count, 1)
+
+    @patch('github_client.requests.Session.request')
+    def test_api_user_stores_profile_cached_by_me(self, mock_request):
+        """Test that /api/user writes the User row for a profile first fetched by /me"""
+        self.mock_profile(mock_request)
+        self.login()
+
+        self.app.get('/me')
+        response = self.app.get('/api/user')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 1)
+        with app.app_context():
+            self.assertIsNotNone(User.query.filter_by(github_id=12345).first())
+
+    @patch('github_client.requests.Session.request')
+    def test_me_is_served_from_fresh_user_row(self, mock_request):
+        """Test that /me answers from a recently written User row without calling GitHub"""
+        with app.app_context():
+            db.session.add(User(github_id=12345, username='testuser', avatar_url='avatar.gif', access_token='test_token'))
+            db.session.commit()
+        self.login()
+
+        response = self.app.get('/me')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['login'], 'testuser')
+        mock_request.assert_not_called()
+
+    @patch('github_client.requests.Session.request')
+    def test_unchanged_profile_is_not_rewritten(self, mock_request):
+        """Test that refreshing an unchanged profile skips the User write"""
+        self.mock_profile(mock_request)
+        self.login()
+        self.app.get('/api/user')
+        with app.app_context():
+            updated_at = User.query.filter_by(github_id=12345).first().updated_at
+
+        write_counters.reset()
+        github_calls.clear()
+        profile_cache.clear()
+        with patch('app.cached_profile', return_value=None):
+            response = self.app.get('/api/user')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(write_counters.snapshot()['user'], {'written': 0, 'skipped': 1})
+        with app.app_context():
+            self.assertEqual(User.query.filter_by(github_id=12345).first().updated_at, updated_at)
+
+    @patch('github_client.requests.Session.request')
+    def test_logout_invalidates_cached_profile(self, mock_request):
+        """Test that logging out drops the cached profile for the session token"""
+        self.mock_profile(mock_request)
+        self.login('short_lived_token')
+        self.app.get('/me')
+
+        response = self.app.get('/logout')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(profile_cache), 0)
+        with self.app.session_transaction() as sess:
+            self.assertNotIn('github_token', sess)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import json
+from unittest.mock import patch, MagicMock
+from app import app, db, User, github_calls, profile_cache, profile_writes, store_user_profile
+from write_behind import WriteBehindBuffer
+
+class TestWriteBehindBuffer(unittest.TestCase):
+    def test_updates_for_same_key_are_coalesced(self):
+        """Test that only the latest values per key are written, in one batch"""
+        batches = []
+        buffer = WriteBehindBuffer(app, lambda batch: batches.append(dict(batch)))
+        buffer.put(1, {'login': 'a'})
+        buffer.put(1, {'login': 'b'})
+        buffer.put(2, {'login': 'c'})
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(batches, [{1: {'login': 'b'}, 2: {'login': 'c'}}])
+        self.assertEqual(buffer.stats()['coalesced'], 1)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_failed_flush_keeps_updates(self):
+        """Test that a failed batch is retried without overwriting newer values"""
+        apply = MagicMock(side_effect=[RuntimeError('database is locked'), None])
+        buffer = WriteBehindBuffer(app, apply)
+        buffer.put(1, {'login': 'a'})
+
+        with self.assertRaises(RuntimeError):
+            buffer.flush()
+        buffer.put(2, {'login': 'b'})
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(buffer.stats()['failed'], 1)
+
+    def test_size_threshold_wakes_flusher(self):
+        """Test that reaching max_pending triggers a flush without waiting for the timer"""
+        written = []
+        buffer = WriteBehindBuffer(app, lambda batch: written.extend(batch), flush_interval=60, max_pending=3)
+        buffer.start()
+        try:
+            for key in range(3):
+                buffer.put(key, {})
+            for _ in range(200):
+                if len(written) == 3:
+                    break
+                buffer._stop.wait(0.01)
+            self.assertEqual(sorted(written), [0, 1, 2])
+        finally:
+            buffer.stop()
+
+    def test_stop_flushes_pending_updates(self):
+        """Test that shutting down writes whatever is still buffered"""
+        written = []
+        buffer = WriteBehindBuffer(app, lambda batch: written.extend(batch))
+        buffer.put('key', {})
+        buffer.stop()
+        self.assertEqual(written, ['key'])
+
+class TestProfileWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(github_id=12345, username='testuser', access_token='test_token'))
+            db.session.commit()
+        github_calls.clear()
+        profile_cache.clear()
+        profile_writes.flush()
+
+    def tearDown(self):
+        profile_writes.flush()
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    @patch('github_client.requests.Session.request')
+    def test_profile_change_is_written_behind(self, mock_request):
+        """Test that /api/user answers before the changed profile reaches the database"""
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'id': 12345, 'login': 'renamed', 'email': 'new@example.com'}
+        with self.app.session_transaction() as sess:
+            sess['github_token'] = 'test_token'
+
+        with patch('app.cached_profile', return_value=None):
+            response = self.app.get('/api/user')
+
+        self.assertEqual(json.loads(response.data)['user']['login'], 'renamed')
+        with app.app_context():
+            self.assertEqual(User.query.filter_by(github_id=12345).first().username, 'testuser')
+        self.assertEqual(profile_writes.flush(), 1)
+        with app.app_context():
+            user = User.query.filter_by(github_id=12345).first()
+            self.assertEqual(user.username, 'renamed')
+            self.assertEqual(user.email, 'new@example.com')
+            self.assertIsNotNone(user.updated_at)
+
+    def test_token_change_is_written_immediately(self):
+        """Test that a rotated token is stored at once and supersedes a pending update"""
+        with app.app_context():
+            store_user_profile({'id': 12345, 'login': 'renamed'}, 'test_token')
+            store_user_profile({'id': 12345, 'login': 'renamed'}, 'rotated_token')
+            self.assertEqual(User.query.filter_by(github_id=12345).first().access_token, 'rotated_token')
+        self.assertEqual(profile_writes.flush(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
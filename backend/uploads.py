@@ -0,0 +1,145 @@
+"""
+Streaming handling of multipart file uploads.
+
+Werkzeug hands each uploaded file part to Request._get_file_stream() and then
+writes the body into it chunk by chunk as it parses the request. UploadRequest
+returns a StreamingUpload there instead of the default spooled buffer: chunks
+go straight to a temporary file next to the upload folder while a SHA-256 is
+updated and the first bytes are kept for sniffing, and the part is abandoned
+with UploadTooLarge as soon as it passes MAX_FILE_SIZE. Memory per upload is
+one parser chunk, whatever the payload size, and an accepted file is moved
+into place with a rename rather than copied.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+SNIFF_BYTES = 64
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+# Content that must never be stored behind an image extension
+BLOCKED_SIGNATURES = (
+    b'MZ', b'\x7fELF', b'\xca\xfe\xba\xbe', b'\xcf\xfa\xed\xfe', b'#!', b'PK\x03\x04', b'%PDF',
+)
+BLOCKED_MARKUP = (b'<?php', b'<script', b'<html', b'<!doctype', b'<svg', b'<?xml')
+
+
+class UploadTooLarge(RequestEntityTooLarge):
+    """A single uploaded file went over MAX_FILE_SIZE while streaming"""
+
+
+def sniff_content_type(header):
+    """The image type named by the leading bytes, or None if unrecognised"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def looks_dangerous(header):
+    """True if the leading bytes are an executable, archive or markup document"""
+    if header.startswith(BLOCKED_SIGNATURES):
+        return True
+    return header.lstrip().lower().startswith(BLOCKED_MARKUP)
+
+
+class StreamingUpload:
+    """Writable, readable temporary file that hashes and sizes what is written"""
+
+    def __init__(self, directory=None, max_size=None):
+        os.makedirs(directory or tempfile.gettempdir(), exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False)
+        self.path = self._file.name
+        self.max_size = max_size
+        self.size = 0
+        self.header = b''
+        self._hash = hashlib.sha256()
+        self._moved = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()
+            raise UploadTooLarge()
+        if len(self.header) < SNIFF_BYTES:
+            self.header += data[:SNIFF_BYTES - len(self.header)]
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def content_type(self):
+        return sniff_content_type(self.header)
+
+    def move_to(self, path):
+        """Atomically place the upload at path instead of copying it"""
+        self._file.flush()
+        os.replace(self.path, path)
+        self._moved = True
+        self.path = path
+        return path
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        """Close the file and delete it unless it was moved into place"""
+        if not self._file.closed:
+            self._file.close()
+        if not self._moved:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self._moved = True  # nothing left to clean up
+
+
+class UploadRequest(Request):
+    """Request whose file parts are streamed through StreamingUpload"""
+
+    # Per-request override of MAX_FILE_SIZE, set before the form is parsed
+    max_file_size = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        max_size = self.max_file_size if self.max_file_size is not None else config.get('MAX_FILE_SIZE')
+        return StreamingUpload(config.get('UPLOAD_FOLDER'), max_size)
@@ -0,0 +1,50 @@
+"""
+Session token -> User resolution.
+
+Requests identify their user by GitHub token. The User table keeps an indexed
+SHA-256 of the token (User.access_token_hash), and a bounded LRU in front of
+it maps token hashes to user ids, so most requests resolve their user with a
+primary-key read. The row's hash is always checked, so a mapping left behind
+by a token rotation in another process is never trusted.
+"""
+import os
+
+from cache_utils import LRUCache
+from github_cache import hash_token
+from models import db, User
+
+token_users = LRUCache(maxsize=int(os.environ.get('USER_LOOKUP_CACHE_SIZE', 10000)))
+
+
+def user_for_token(token):
+    """The User holding this access token, or None"""
+    if not token:
+        return None
+    token_key = hash_token(token)
+
+    user_id = token_users.get(token_key)
+    if user_id is not None:
+        user = db.session.get(User, user_id)
+        if user is not None and user.access_token_hash == token_key:
+            return user
+        token_users.pop(token_key)
+
+    user = User.query.filter_by(access_token_hash=token_key).first()
+    if user is None:
+        # Rows written before the hash column existed (or by raw SQL) have no
+        # hash yet; only those rows are searched, through the same index
+        user = (User.query
+                .filter(User.access_token_hash.is_(None), User.access_token == token)
+                .first())
+        if user is not None:
+            user.access_token_hash = token_key
+            db.session.commit()
+    if user is not None:
+        token_users.set(token_key, user.id)
+    return user
+
+
+def forget_token(token):
+    """Drop the cached mapping for a token that was rotated out"""
+    if token:
+        token_users.pop(hash_token(token))
@@ -0,0 +1,125 @@
+"""
+Write-behind buffer for deferred row updates.
+
+Updates whose result the response does not depend on are parked here keyed by
+row, so repeated updates to the same row collapse into one, and a background
+thread writes them in a single transaction every `flush_interval` seconds or
+as soon as `max_pending` rows are waiting. Whatever is still buffered is
+flushed when the process exits.
+"""
+import atexit
+import threading
+import time
+
+from models import db
+
+
+class WriteBehindBuffer:
+    """Coalesces pending updates by key and applies them in batches"""
+
+    def __init__(self, app, apply, flush_interval=1.0, max_pending=500, name='write-behind'):
+        self.app = app
+        self.apply = apply  # called with {key: values} inside an app context, then committed
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.name = name
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        self.queued = 0
+        self.coalesced = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.last_flush_seconds = None
+
+    def put(self, key, values):
+        """Queue values for a row, replacing anything still pending for it"""
+        with self._lock:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = values
+            self.queued += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def discard(self, key):
+        """Drop a pending update, e.g. because the row was just written directly"""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    def flush(self):
+        """Write everything pending in one transaction; returns the number of rows"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            with self.app.app_context():
+                try:
+                    self.apply(batch)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    with self._lock:
+                        self.failed += 1
+                        # Put the batch back unless newer values arrived meanwhile
+                        for key, values in batch.items():
+                            self._pending.setdefault(key, values)
+                    raise
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+                self.last_flush_seconds = time.perf_counter() - started
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("%s flush failed", self.name)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout=5.0):
+        """Stop the flush thread and write out anything still buffered"""
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'queued': self.queued,
+                'coalesced': self.coalesced,
+                'written': self.written,
+                'batches': self.batches,
+                'failed': self.failed,
+                'last_flush_seconds': self.last_flush_seconds,
+            }